@@ -0,0 +1,246 @@
+"""
+Synthetic audio fixtures for the benchmarks.
+
+Everything is generated locally: the audio streams are written by hand (silent MPEG
+Layer III frames, verbatim FLAC frames carrying a sine tone, and the same FLAC frames
+in an Ogg container), and tags and embedded pictures are added with mutagen.
+"""
+import base64
+import math
+import os
+import struct
+
+import numpy as np
+from mutagen.flac import FLAC, Picture
+from mutagen.id3 import APIC, ID3, TALB, TIT2, TPE1
+from mutagen.oggflac import OggFLAC
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 4096
+COVER_SIZES = (300, 1000, 3000)
+
+
+# --- Cover images ---
+
+def make_cover(size, seed, fmt="JPG"):
+    """Renders a noisy gradient cover (so it compresses like a photo) and returns its bytes."""
+    from PySide6.QtCore import QBuffer, QIODevice
+    from PySide6.QtGui import QImage
+
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    gradient = (ramp[:, None] + ramp[None, :]) / 2
+    start, end = rng.uniform(40, 215, 3), rng.uniform(40, 215, 3)
+    pixels = np.empty((size, size, 4), dtype=np.uint8)
+    for channel in range(3):  # B, G, R
+        values = start[channel] + (end[channel] - start[channel]) * gradient
+        values += rng.normal(0, 12, (size, size))
+        pixels[:, :, channel] = np.clip(values, 0, 255)
+    pixels[:, :, 3] = 255
+
+    image = QImage(pixels.data, size, size, size * 4, QImage.Format.Format_RGB32).copy()
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, fmt, 85)
+    return bytes(buffer.data())
+
+
+# --- MP3 ---
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo, no CRC, no padding
+_MP3_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+_MP3_FRAME_SIZE = 144 * 128000 // 44100
+_MP3_SAMPLES_PER_FRAME = 1152
+
+
+def write_mp3(path, seconds):
+    """Writes silent MP3 frames (all-zero side info decodes to silence)."""
+    frame = _MP3_HEADER + bytes(_MP3_FRAME_SIZE - len(_MP3_HEADER))
+    frames = int(seconds * SAMPLE_RATE / _MP3_SAMPLES_PER_FRAME) + 1
+    with open(path, "wb") as f:
+        f.write(frame * frames)
+
+
+# --- FLAC ---
+
+def _crc_table(poly, width):
+    top = 1 << (width - 1)
+    mask = (1 << width) - 1
+    table = []
+    for byte in range(256):
+        crc = byte << (width - 8)
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & mask if crc & top else (crc << 1) & mask
+        table.append(crc)
+    return table
+
+
+_CRC8 = _crc_table(0x07, 8)
+_CRC16 = _crc_table(0x8005, 16)
+_CRC32_OGG = _crc_table(0x04C11DB7, 32)
+
+
+def _crc8(data):
+    crc = 0
+    for byte in data:
+        crc = _CRC8[crc ^ byte]
+    return crc
+
+
+def _crc16(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16[(crc >> 8) ^ byte]
+    return crc
+
+
+def _utf8_number(value):
+    """FLAC's UTF-8-like coding of frame numbers."""
+    if value < 0x80:
+        return bytes([value])
+    length = 2
+    while value >= 1 << (5 * length + 1):
+        length += 1
+    out = []
+    for _ in range(length - 1):
+        out.append(0x80 | (value & 0x3F))
+        value >>= 6
+    out.append(((0xFF << (8 - length)) & 0xFF) | value)
+    return bytes(reversed(out))
+
+
+def _sine_block(frame_index, frequency=440.0):
+    start = frame_index * BLOCK_SIZE
+    samples = (int(12000 * math.sin(2 * math.pi * frequency * (start + i) / SAMPLE_RATE)) for i in range(BLOCK_SIZE))
+    return struct.pack(f">{BLOCK_SIZE}h", *samples)
+
+
+def _flac_frames(seconds):
+    """Yields mono 16-bit FLAC frames with verbatim subframes."""
+    count = max(1, int(seconds * SAMPLE_RATE) // BLOCK_SIZE)
+    block = {}
+    for index in range(count):
+        # The tone repeats every few frames; reuse the packed samples
+        samples = block.setdefault(index % 8, _sine_block(index % 8))
+        # Sync + fixed blocking, block size 4096 (0b1100) / 44.1 kHz (0b1001), mono, 16 bit
+        header = bytes([0xFF, 0xF8, 0xC9, 0x08]) + _utf8_number(index)
+        header += bytes([_crc8(header)])
+        frame = header + bytes([0x02]) + samples  # 0x02: VERBATIM subframe
+        yield frame + struct.pack(">H", _crc16(frame))
+
+
+def _streaminfo(total_samples, last):
+    packed = (SAMPLE_RATE << 44) | (0 << 41) | (15 << 36) | total_samples
+    body = struct.pack(">HH", BLOCK_SIZE, BLOCK_SIZE) + bytes(6) + struct.pack(">Q", packed) + bytes(16)
+    return bytes([(0x80 if last else 0) | 0]) + len(body).to_bytes(3, "big") + body
+
+
+def write_flac(path, seconds):
+    frames = list(_flac_frames(seconds))
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + _streaminfo(len(frames) * BLOCK_SIZE, last=True))
+        for frame in frames:
+            f.write(frame)
+
+
+# --- Ogg FLAC ---
+
+def _ogg_crc(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC32_OGG[(crc >> 24) ^ byte]
+    return crc
+
+
+def _ogg_page(packet, serial, sequence, granule, header_type):
+    segments = [255] * (len(packet) // 255) + [len(packet) % 255]
+    header = struct.pack("<4sBBqIII", b"OggS", 0, header_type, granule, serial, sequence, 0)
+    header += bytes([len(segments)]) + bytes(segments)
+    page = bytearray(header + packet)
+    page[22:26] = struct.pack("<I", _ogg_crc(page))
+    return bytes(page)
+
+
+def write_ogg_flac(path, seconds):
+    """Writes FLAC frames in an Ogg container (one frame per page)."""
+    frames = list(_flac_frames(seconds))
+    serial = 0x4C505931
+    vendor = b"liquid-player benchmarks"
+    comment = struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+    comment_block = bytes([0x84]) + len(comment).to_bytes(3, "big") + comment  # last, VORBIS_COMMENT
+
+    first = b"\x7fFLAC" + bytes([1, 0]) + struct.pack(">H", 1) + b"fLaC" + _streaminfo(len(frames) * BLOCK_SIZE, last=False)
+    with open(path, "wb") as f:
+        f.write(_ogg_page(first, serial, 0, 0, 0x02))
+        f.write(_ogg_page(comment_block, serial, 1, 0, 0x00))
+        for index, frame in enumerate(frames):
+            last = index == len(frames) - 1
+            f.write(_ogg_page(frame, serial, index + 2, (index + 1) * BLOCK_SIZE, 0x04 if last else 0x00))
+
+
+# --- Tagging ---
+
+def _picture(cover, mime):
+    picture = Picture()
+    picture.type = 3  # Front cover
+    picture.mime = mime
+    picture.data = cover
+    return picture
+
+
+def tag_file(path, title, artist, album, cover=None, mime="image/jpeg"):
+    ext = os.path.splitext(path)[1]
+    if ext == ".mp3":
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text=title))
+        tags.add(TPE1(encoding=3, text=artist))
+        tags.add(TALB(encoding=3, text=album))
+        if cover:
+            tags.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=cover))
+        tags.save(path)
+    elif ext == ".flac":
+        audio = FLAC(path)
+        audio["title"], audio["artist"], audio["album"] = title, artist, album
+        if cover:
+            audio.add_picture(_picture(cover, mime))
+        audio.save()
+    else:
+        audio = OggFLAC(path)
+        audio["title"], audio["artist"], audio["album"] = title, artist, album
+        if cover:
+            audio["metadata_block_picture"] = [base64.b64encode(_picture(cover, mime).write()).decode("ascii")]
+        audio.save()
+
+
+WRITERS = {".mp3": write_mp3, ".flac": write_flac, ".ogg": write_ogg_flac}
+
+
+def generate(directory, seconds=8, cover_sizes=COVER_SIZES, album_tracks=4):
+    """
+    Generates the fixture set in ``directory`` (reusing files from an earlier run) and
+    returns a dict with the list of ``tracks`` and the ``album`` tracks sharing one cover.
+    For each format there is one track per cover size and one without art.
+    """
+    os.makedirs(directory, exist_ok=True)
+    covers = {size: make_cover(size, size) for size in cover_sizes}
+    tracks = []
+    album = []
+
+    def make(name, cover, title, album_name):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            WRITERS[os.path.splitext(name)[1]](path, seconds)
+            tag_file(path, title, "Fixture Artist", album_name, cover)
+        return path
+
+    for ext in WRITERS:
+        for size in cover_sizes:
+            tracks.append(make(f"cover{size}{ext}", covers[size], f"Cover {size}", f"Album {size}"))
+        tracks.append(make(f"noart{ext}", None, "No Art", "No Art"))
+
+    shared = covers[cover_sizes[len(cover_sizes) // 2]]
+    for index in range(album_tracks):
+        ext = list(WRITERS)[index % len(WRITERS)]
+        album.append(make(f"album{index:02d}{ext}", shared, f"Album Track {index}", "Shared Album"))
+
+    return {"tracks": tracks, "album": album, "covers": {size: len(data) for size, data in covers.items()}}
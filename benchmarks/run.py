@@ -0,0 +1,968 @@
+"""
+Benchmarks for the player's hot paths.
+
+    python -m benchmarks.run [--output results.json] [--compare baseline.json] [name ...]
+
+Fixture media is generated into a scratch directory (see benchmarks.fixtures), Qt runs
+on the offscreen platform, and the results are written as JSON so two runs can be
+compared with ``--compare``. Benchmarks that need something missing here (e.g. libVLC)
+are reported as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARKS = {}
+
+
+class Skip(Exception):
+    """Raised by a benchmark that cannot run in this environment."""
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def summarize(samples, unit="ms"):
+    """Reduces a list of durations in seconds to summary statistics in ``unit``."""
+    scale = {"ms": 1e3, "us": 1e6}[unit]
+    values = sorted(s * scale for s in samples)
+    return {
+        f"median_{unit}": statistics.median(values),
+        f"mean_{unit}": statistics.fmean(values),
+        f"min_{unit}": values[0],
+        f"p90_{unit}": values[min(len(values) - 1, int(len(values) * 0.9))],
+        "samples": len(values),
+    }
+
+
+def wait_until(app, predicate, timeout=5.0):
+    """Runs the Qt event loop until ``predicate()`` holds; returns False on timeout."""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.0005)
+    return True
+
+
+# --- Benchmarks ---
+
+@benchmark("album_art")
+def bench_album_art(ctx):
+    """get_album_art throughput: cold (tags parsed, art stored) and warm (per-track memo)."""
+    from core.art_cache import ArtCache
+    from core.metadata import get_album_art
+
+    tracks = ctx.fixtures["tracks"] + ctx.fixtures["album"]
+    cold, warm = [], []
+    for _ in range(ctx.repeat):
+        cache = ArtCache(tempfile.mkdtemp(dir=ctx.scratch))
+        started = time.perf_counter()
+        found = sum(1 for path in tracks if get_album_art(path, cache))
+        cold.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        for path in tracks:
+            get_album_art(path, cache)
+        warm.append(time.perf_counter() - started)
+
+    return {
+        "tracks": len(tracks),
+        "tracks_with_art": found,
+        "cold": dict(summarize(cold), tracks_per_second=len(tracks) / statistics.median(cold)),
+        "warm": dict(summarize(warm), tracks_per_second=len(tracks) / statistics.median(warm)),
+    }
+
+
+@benchmark("art_reader")
+def bench_art_reader(ctx):
+    """
+    Embedded picture lookup per format: core.art_reader (memory-mapped, no copy) against
+    a full mutagen parse, and the easy-mode parse get_album_art used to rely on.
+    """
+    import mutagen
+    from core.art_reader import read_art
+    from core.metadata import _mutagen_art
+
+    def reader(path):
+        art = read_art(path)
+        if art is None:
+            return 0
+        with art:
+            return len(art.data)
+
+    def full(path):
+        art = _mutagen_art(path)
+        return len(art.data) if art is not None else 0
+
+    def easy(path):
+        audio = mutagen.File(path, easy=True)
+        if 'APIC:' in audio:
+            return len(audio['APIC:'].data)
+        return len(audio.pictures[0].data) if getattr(audio, 'pictures', None) else 0
+
+    tracks = ctx.fixtures["tracks"] + ctx.fixtures["album"]
+    result = {}
+    for ext in sorted({os.path.splitext(path)[1] for path in tracks}):
+        paths = [path for path in tracks if path.endswith(ext)]
+        result[ext.lstrip(".")] = entry = {"tracks": len(paths)}
+        for name, read in (("art_reader", reader), ("mutagen", full), ("mutagen_easy", easy)):
+            samples = []
+            for _ in range(ctx.repeat):
+                started = time.perf_counter()
+                found = [read(path) for path in paths]
+                samples.append((time.perf_counter() - started) / len(paths))
+            entry[name] = dict(summarize(samples, "us"), with_art=sum(1 for size in found if size))
+        entry["speedup"] = entry["mutagen"]["median_us"] / entry["art_reader"]["median_us"]
+    return result
+
+
+@benchmark("track_switch")
+def bench_track_switch(ctx):
+    """Player.next() until libVLC reports MediaPlayerPlaying."""
+    import vlc
+    from core.art_cache import ArtCache
+    from core.player import Player
+
+    vlc_args = ("--aout=dummy", "--vout=dummy", "--no-video", "--quiet")
+    try:
+        if vlc.Instance(*vlc_args) is None:
+            raise Skip("libVLC could not be initialized")
+    except (NameError, OSError, AttributeError) as e:
+        raise Skip(f"libVLC is not available ({e})")
+
+    tracks = ctx.fixtures["tracks"]
+    player = Player(tracks, art_cache=ArtCache(tempfile.mkdtemp(dir=ctx.scratch)), vlc_args=vlc_args)
+    try:
+        player.play_pause()
+        if not wait_until(ctx.app, player.is_playing):
+            raise Skip("playback did not start")
+        switches = max(ctx.repeat * 4, len(tracks))
+        timeouts = 0
+        for _ in range(switches):
+            measured = len(player.switch_latencies)
+            player.next()
+            if not wait_until(ctx.app, lambda: len(player.switch_latencies) > measured):
+                timeouts += 1
+        latencies = [ms / 1e3 for ms in player.switch_latencies]
+        if not latencies:
+            raise Skip("no track switch reached the playing state")
+        return dict(summarize(latencies), timeouts=timeouts)
+    finally:
+        player.player.stop()
+        player.extractor.shutdown()
+
+
+@benchmark("position_update")
+def bench_position_update(ctx):
+    """
+    Cost of a MediaPlayerTimeChanged event on libVLC's thread (the event bridge's
+    callback), of draining the bridge and of one coalesced position update reaching
+    ProgressSlider.update_progress.
+    """
+    from PySide6.QtGui import QColor
+    from core.event_bridge import EventBridge
+    from core.position import PositionClock
+    from ui.widgets.progress_slider import ProgressSlider
+
+    class EventManager:
+        def event_attach(self, event_type, callback, *args):
+            self.callback = (callback, args)
+
+        def event_detach(self, event_type):
+            pass
+
+    clock = PositionClock(max_rate=1000)
+    slider = ProgressSlider(QColor(255, 255, 255, 30))
+    slider.setFixedWidth(200)
+    slider.show()
+    clock.position_changed.connect(slider.update_progress)
+    clock.update_length(240_000)
+    clock.set_playing(True)
+    ctx.app.processEvents()
+
+    # The same registration as Player._attach_deck_events uses for time updates
+    bridge = EventBridge()
+    manager = EventManager()
+    bridge.attach(manager, "MediaPlayerTimeChanged", lambda update: clock.update_time(*update), owner=clock,
+                  value=lambda event: (event.u.new_time, time.monotonic()), coalesce=True)
+    callback, args = manager.callback
+
+    events = 20_000
+    event = SimpleNamespace(u=SimpleNamespace(new_time=0))
+    started = time.perf_counter()
+    for i in range(events):
+        event.u.new_time = i * 10
+        callback(event, *args)
+    vlc_event = (time.perf_counter() - started) / events
+    started = time.perf_counter()
+    ctx.app.processEvents()
+    drain = time.perf_counter() - started
+
+    # One UI update per step, each advancing the position by a frame's worth of playback
+    samples = []
+    for i in range(ctx.repeat * 200):
+        clock.update_time(i * 37)
+        started = time.perf_counter()
+        clock._emit_position()
+        samples.append(time.perf_counter() - started)
+
+    repaint = []
+    for i in range(ctx.repeat * 50):
+        started = time.perf_counter()
+        slider.update_progress(i * 1000, 240_000)
+        slider.repaint()
+        repaint.append(time.perf_counter() - started)
+
+    clock.set_playing(False)
+    slider.close()
+    stats = bridge.stats()
+    return {
+        "vlc_event_us": vlc_event * 1e6,
+        "drain_us": drain * 1e6,
+        "bridge_coalesced": stats["coalesced"],
+        "bridge_drains": stats["drains"],
+        "ui_update": summarize(samples, "us"),
+        "ui_update_with_paint": summarize(repaint, "us"),
+    }
+
+
+@benchmark("album_art_widget")
+def bench_album_art_widget(ctx):
+    """AlbumArtWidget: cover decode/scale per source size, and set_album_art until shown."""
+    from core.art_cache import ArtCache, set_default_cache
+    from core.metadata import get_album_art
+    from ui.widgets.album_art_widget import AlbumArtWidget
+
+    cache = ArtCache(tempfile.mkdtemp(dir=ctx.scratch))
+    set_default_cache(cache)
+    urls = {}
+    for path in ctx.fixtures["tracks"]:
+        name = os.path.basename(path)
+        if name.startswith("cover") and name.endswith(".flac"):
+            urls[int(name[len("cover"):-len(".flac")])] = get_album_art(path, cache)
+
+    widget = AlbumArtWidget()
+    widget.setFixedSize(200, 200)
+    widget.show()
+    ctx.app.processEvents()
+    dpr = widget.devicePixelRatioF()
+    side = round(200 * dpr)
+
+    results = {}
+    for size, url in sorted(urls.items()):
+        decode, shown = [], []
+        for _ in range(ctx.repeat):
+            cache.clear_images()
+            started = time.perf_counter()
+            cache.scaled_image(url, side, side, dpr)
+            decode.append(time.perf_counter() - started)
+
+            cache.clear_images()
+            widget.set_album_art(None)
+            before = widget.album_art_label.pixmap().cacheKey()
+            started = time.perf_counter()
+            widget.set_album_art(url)
+            wait_until(ctx.app, lambda: widget.album_art_label.pixmap().cacheKey() != before)
+            shown.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        widget.set_album_art(None)
+        widget.set_album_art(url)
+        cached = time.perf_counter() - started
+        results[str(size)] = {
+            "decode": summarize(decode),
+            "set_album_art_to_shown": summarize(shown),
+            "set_album_art_cached_ms": cached * 1e3,
+        }
+
+    widget.close()
+    return results
+
+
+@benchmark("tint")
+def bench_tint(ctx):
+    """set_tint_color per animation frame, alone and including the window repaint."""
+    from PySide6.QtGui import QColor
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    window.show()
+    ctx.app.processEvents()
+
+    frames = ctx.repeat * 60
+    colors = [QColor.fromHsv(i * 360 // frames, 160, 200, 120) for i in range(frames)]
+    calls, painted = [], []
+    for color in colors:
+        started = time.perf_counter()
+        window.set_tint_color(color)
+        calls.append(time.perf_counter() - started)
+    for color in colors:
+        started = time.perf_counter()
+        window.set_tint_color(color)
+        window.repaint()
+        painted.append(time.perf_counter() - started)
+
+    window.close()
+    return {"set_tint_color": summarize(calls, "us"), "frame_with_paint": summarize(painted, "us")}
+
+
+@benchmark("loudness")
+def bench_loudness(ctx):
+    """Loudness/true-peak analysis speed (times real time, one core), plus decoding when libVLC is available."""
+    import numpy as np
+    from core.decode import CHUNK_FRAMES, DecodeError, decode
+    from core.loudness import LoudnessMeter, analyze
+
+    rate, seconds = 48000, 60
+    rng = np.random.default_rng(0)
+    samples = (rng.normal(0, 0.1, (rate * seconds, 2))).astype(np.float32)
+    timings = []
+    for _ in range(ctx.repeat):
+        started = time.perf_counter()
+        analyze(samples, rate)
+        timings.append(time.perf_counter() - started)
+    result = {"analysis": dict(summarize(timings), realtime_factor=seconds / statistics.median(timings))}
+
+    # Fed in decoder-sized chunks, memory stays at a few chunks whatever the track length
+    import tracemalloc
+    tracemalloc.start()
+    meter = LoudnessMeter(rate, 2)
+    for start in range(0, len(samples), CHUNK_FRAMES):
+        meter.add(samples[start:start + CHUNK_FRAMES])
+    meter.result()
+    result["chunked_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    result["track_mb"] = samples.nbytes / 1e6
+
+    track = next(path for path in ctx.fixtures["tracks"] if path.endswith(".flac"))
+    try:
+        started = time.perf_counter()
+        decoded, decoded_rate = decode(track)
+        elapsed = time.perf_counter() - started
+        result["decode"] = {"ms": elapsed * 1e3, "realtime_factor": len(decoded) / decoded_rate / elapsed}
+    except DecodeError as e:
+        result["decode"] = {"skipped": str(e)}
+    return result
+
+
+@benchmark("waveform")
+def bench_waveform(ctx):
+    """
+    Peak generation speed (times real time) for a 5 minute track, loading cached peaks,
+    and a progress tick on a waveform seek bar (dirty strip only vs. a full repaint).
+    """
+    import numpy as np
+    from PySide6.QtGui import QColor
+    from core.waveform import Waveform, compute_levels, write_peaks
+    from ui.widgets.progress_slider import ProgressSlider
+
+    rate, seconds = 48000, 300
+    rng = np.random.default_rng(0)
+    chunk = rng.uniform(-0.5, 0.5, (1 << 16, 2)).astype(np.float32)
+    chunks = rate * seconds // len(chunk)
+
+    generate = []
+    for _ in range(ctx.repeat):
+        started = time.perf_counter()
+        levels, _, frames = compute_levels((chunk, rate) for _ in range(chunks))
+        generate.append(time.perf_counter() - started)
+    path = os.path.join(ctx.scratch, "bench.peaks")
+    write_peaks(path, levels, rate, frames)
+
+    load = []
+    for _ in range(ctx.repeat * 20):
+        started = time.perf_counter()
+        waveform = Waveform(path)
+        waveform.columns(600)
+        load.append(time.perf_counter() - started)
+
+    slider = ProgressSlider(QColor(40, 40, 40))
+    slider.setFixedWidth(600)
+    slider.set_waveform(waveform)
+    slider.show()
+    ctx.app.processEvents()
+    duration = seconds * 1000
+    tick, full = [], []
+    for i in range(ctx.repeat * 50):
+        started = time.perf_counter()
+        slider.update_progress(i * 500, duration)
+        ctx.app.processEvents()
+        tick.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        slider.slider.repaint()
+        full.append(time.perf_counter() - started)
+    slider.close()
+
+    audio_seconds = chunks * len(chunk) / rate
+    return {
+        "generate": dict(summarize(generate), realtime_factor=audio_seconds / statistics.median(generate)),
+        "load": summarize(load, "us"),
+        "tick": summarize(tick, "us"),
+        "full_repaint": summarize(full, "us"),
+        "levels": len(levels),
+        "file_bytes": os.path.getsize(path),
+    }
+
+
+@benchmark("search")
+def bench_search(ctx):
+    """
+    Search index over 200k synthetic tracks: build time, memory, and query latency for
+    typed prefixes, whole words, several words and misspellings (a frame is ~16 ms).
+    """
+    import random
+    from core.search import SearchIndex
+
+    rng = random.Random(0)
+    letters = "eeeeaaaoooiiinnnsssrrrtttlllddcumhgpbkvyfwzjxqéèüöñçå"
+    words = ["".join(rng.choices(letters, k=rng.randint(2, 9))) for _ in range(30000)]
+    artists = [" ".join(rng.choices(words, k=rng.randint(1, 2))).title() for _ in range(8000)]
+    albums = [" ".join(rng.choices(words, k=rng.randint(1, 3))).title() for _ in range(20000)]
+
+    rows = []
+    for i in range(200_000):
+        title = " ".join(rng.choices(words, k=rng.randint(1, 5))).title()
+        artist, album = rng.choice(artists), rng.choice(albums)
+        rows.append((f"/music/{artist}/{album}/{i % 20 + 1:02d} {title}.flac", title, artist, album))
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.add_many(rows)
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    for row in rows[:1000]:
+        index.add(row[0] + "~", *row[1:])
+    incremental = (time.perf_counter() - started) / 1000
+
+    def misspell(word):
+        i = rng.randrange(len(word))
+        return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+    queries = {
+        "prefix_1": lambda row: row[1][:1],
+        "prefix_3": lambda row: row[1][:3],
+        "word": lambda row: row[1].split()[0],
+        "title_artist": lambda row: f"{row[1]} {row[2].split()[0]}",
+        "misspelled": lambda row: f"{misspell(row[1])} {row[2].split()[0]}",
+    }
+    result = {"build_s": build, "incremental_us": incremental * 1e6, **index.stats()}
+    result["bytes_per_track"] = result["nbytes"] / result["documents"]
+    for name, make in queries.items():
+        samples, found = [], 0
+        for row in rng.sample(rows, ctx.repeat * 20):
+            query = make(row)
+            started = time.perf_counter()
+            results = index.search(query, limit=50)
+            samples.append(time.perf_counter() - started)
+            found += any(key == row[0] for key, _ in results)
+        result[name] = dict(summarize(samples), found=found / len(samples))
+    return result
+
+
+@benchmark("session")
+def bench_session(ctx):
+    """Session snapshot of a 200k-track playlist: capture, write and load, plus a position-only delta."""
+    from core import session
+    from core.playlist import Playlist
+
+    playlist = Playlist(f"/music/Artist {i % 800}/Album {i % 9000}/{i % 20 + 1:02d} Track {i}.flac"
+                        for i in range(200_000))
+    playlist.set_shuffle(True)
+    player = SimpleNamespace(
+        playlist=playlist, current_track_index=1234, volume=lambda: 70, is_muted=lambda: False,
+        is_playing=lambda: True, position_clock=SimpleNamespace(position=lambda: (61_500, 240_000)),
+    )
+    path = os.path.join(ctx.scratch, "session.bin")
+
+    capture, write, load, delta = [], [], [], []
+    for generation in range(1, ctx.repeat + 1):
+        started = time.perf_counter()
+        state = session.capture(player)
+        capture.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        size = session.write_snapshot(path, state, generation)
+        write.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        loaded = session.load_session(path)
+        load.append(time.perf_counter() - started)
+    assert len(loaded["playlist"]) == len(playlist)
+
+    with open(os.path.join(ctx.scratch, "session.pos"), "wb") as f:
+        for i in range(ctx.repeat * 100):
+            started = time.perf_counter()
+            session.write_position(f, ctx.repeat, i * 1000, True)
+            delta.append(time.perf_counter() - started)
+    return {
+        "capture": summarize(capture),
+        "write": summarize(write),
+        "load": summarize(load),
+        "delta": summarize(delta, "us"),
+        "snapshot_bytes": size,
+        "resumed_position_ms": session.load_session(path)["position_ms"],
+    }
+
+
+@benchmark("watcher")
+def bench_watcher(ctx):
+    """
+    Folder watching: an album copied rsync-style (temporary names renamed into place)
+    must reach a 200k-track playlist as one batch; reports batches, event-to-applied
+    latency per backend, and the cost of removing an album and renaming a folder there.
+    """
+    from core.playlist import Playlist
+    from core.watcher import FileWatcher
+
+    playlist = Playlist(f"/music/Artist {i % 800}/Album {i % 9000}/{i % 20 + 1:02d} Track {i}.flac"
+                        for i in range(200_000))
+
+    def apply(changes):
+        playlist.rename(changes.moved)
+        playlist.remove_paths(changes.removed, [directory + os.sep for directory in changes.removed_dirs])
+        playlist.extend(changes.added)
+        changes.applied_at = time.monotonic()
+
+    result = {}
+    for backend in ("inotify", "polling"):
+        root = os.path.join(ctx.scratch, f"watched-{backend}")
+        os.makedirs(root)
+        watcher = FileWatcher([root], debounce_ms=100, poll_interval=0.25, polling=backend == "polling")
+        watcher.changed.connect(apply)
+        watcher.start()
+        time.sleep(0.3)
+        if watcher.stats()["backend"] != backend:
+            watcher.stop()
+            continue
+        for run in range(ctx.repeat):
+            album = os.path.join(root, f"Album {run}")
+            os.makedirs(album)
+            for track in range(100):
+                temporary = os.path.join(album, f".{track:02d}.flac.tmp")
+                with open(temporary, "wb") as f:
+                    f.write(b"\0" * 4096)
+                os.replace(temporary, os.path.join(album, f"{track:02d} Track.flac"))
+            wait_until(ctx.app, lambda: watcher.stats()["changes"] >= 100 * (run + 1), timeout=10)
+            wait_until(ctx.app, lambda: watcher.stats().get("latency_ms") and watcher._recent[-1].applied_at)
+        stats = watcher.stats()
+        watcher.stop()
+        result[backend] = {key: stats.get(key) for key in ("batches", "events", "largest_batch", "latency_ms")}
+
+    removals, renames = [], []
+    for album in range(ctx.repeat):
+        # The tracks of one album folder (every 36000th track shares it)
+        paths = [f"/music/Artist {i % 800}/Album {i % 9000}/{i % 20 + 1:02d} Track {i}.flac"
+                 for i in range(album, 200_000, 36_000)]
+        started = time.perf_counter()
+        playlist.remove_paths(paths)
+        removals.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        playlist.rename([(f"/music/Artist {album}/", f"/music/Renamed {album}/")], prefix=True)
+        renames.append(time.perf_counter() - started)
+    result["remove_album"] = summarize(removals)
+    result["rename_folder"] = summarize(renames)
+    return result
+
+
+@benchmark("readahead")
+def bench_readahead(ctx):
+    """
+    Time to open a track and read its first MiB (what starting playback waits for) with
+    the file evicted from the page cache, and after ReadAhead warmed it; plus how fast
+    warming proceeds under its bandwidth budget.
+    """
+    from core.readahead import MiB, ReadAhead
+
+    if not hasattr(os, "posix_fadvise"):
+        raise Skip("needs posix_fadvise to evict files from the page cache")
+    paths = []
+    for i in range(8):
+        path = os.path.join(ctx.scratch, f"readahead-{i}.flac")
+        with open(path, "wb") as f:
+            f.write(os.urandom(8 * MiB))
+            f.flush()
+            os.fsync(f.fileno())
+        paths.append(path)
+
+    def evict():
+        for path in paths:
+            with open(path, "rb") as f:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+    def first_read(path):
+        started = time.perf_counter()
+        with open(path, "rb", buffering=0) as f:
+            f.read(MiB)
+        return time.perf_counter() - started
+
+    cold, warm, warming = [], [], []
+    readahead = ReadAhead(bandwidth=64 * MiB)
+    for _ in range(ctx.repeat):
+        evict()
+        cold.extend(first_read(path) for path in paths)
+        evict()
+        readahead.warm([])
+        started = time.perf_counter()
+        readahead.warm(paths[:3])
+        deadline = time.perf_counter() + 10
+        while not all(readahead.is_warm(path) for path in paths[:3]) and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        warming.append(time.perf_counter() - started)
+        warm.extend(first_read(path) for path in paths[:3])
+    stats = readahead.stats()
+    readahead.close()
+    return {
+        "cold_first_mib": summarize(cold),
+        "warm_first_mib": summarize(warm),
+        "warm_3_tracks": summarize(warming),
+        "raw_read_mb_per_s": stats["bytes_read"] / MiB / max(stats["read_s"], 1e-9),
+        "bandwidth_budget_mb_per_s": 64,
+    }
+
+
+@benchmark("visualizer")
+def bench_visualizer(ctx):
+    """
+    Spectrum visualizer on a synthetic signal: copying one libVLC audio buffer into the
+    ring, the analyzer's CPU time per frame (steady and after a stall, when a backlog of
+    windows is batched), and one SpectrumWidget repaint.
+    """
+    import numpy as np
+    from core.visualizer import DEFAULT_FPS, SAMPLE_RATE, PcmRing, SpectrumAnalyzer
+    from ui.widgets.spectrum_widget import SpectrumWidget
+
+    rng = np.random.default_rng(0)
+    t = np.arange(SAMPLE_RATE * 4) / SAMPLE_RATE
+    signal = (0.4 * np.sin(2 * np.pi * 440 * t) + 0.1 * rng.standard_normal(len(t))).astype(np.float32)
+    per_frame = SAMPLE_RATE // DEFAULT_FPS
+    buffer = 1024  # Samples per audio callback, as libVLC typically delivers them
+
+    ring = PcmRing(SAMPLE_RATE)
+    analyzer = SpectrumAnalyzer()
+    writes, steady, stalled = [], [], []
+    position = 0
+    for _ in range(ctx.repeat * 20):
+        for _ in range(per_frame // buffer + 1):
+            chunk = signal[position:position + buffer]
+            position = (position + buffer) % (len(signal) - buffer)
+            started = time.perf_counter()
+            ring.write_array(chunk)
+            writes.append(time.perf_counter() - started)
+        started = time.thread_time()
+        analyzer.analyze(ring)
+        steady.append(time.thread_time() - started)
+    for _ in range(ctx.repeat):
+        ring.write_array(signal[:SAMPLE_RATE // 2])
+        started = time.thread_time()
+        analyzer.analyze(ring)
+        stalled.append(time.thread_time() - started)
+
+    widget = SpectrumWidget()
+    widget.setFixedSize(200, 28)
+    widget.show()
+    ctx.app.processEvents()
+    frame = {"seq": 0, "bands": analyzer.bands.copy(), "rms": analyzer.rms, "peak": analyzer.peak,
+             "peak_hold": analyzer.peak_hold, "silent": False}
+    widget._frame = frame
+    paint = []
+    for _ in range(ctx.repeat * 5):
+        started = time.perf_counter()
+        widget.repaint()
+        paint.append(time.perf_counter() - started)
+    widget.close()
+    return {
+        "ring_write": summarize(writes, "us"),
+        "analyze_cpu_per_frame": summarize(steady),
+        "analyze_cpu_after_stall": summarize(stalled),
+        "widget_repaint": summarize(paint),
+        "fps": DEFAULT_FPS,
+    }
+
+
+@benchmark("visualizer_decoder")
+def bench_visualizer_decoder(ctx):
+    """
+    What --visualizer adds to playback: process CPU (all threads, libVLC's included) while
+    a track plays, without and with an AudioTap, which takes the decks' PCM through
+    libVLC's callbacks, plays it through a QAudioSink and analyzes it, in percent of one
+    core. Without the tap VLC's dummy output is used, so the difference is an upper bound.
+    """
+    import vlc
+    from core.art_cache import ArtCache
+    from core.player import Player
+    from core.visualizer import AudioTap
+    try:
+        from PySide6.QtMultimedia import QAudioSink  # noqa: F401
+    except ImportError as e:
+        raise Skip(f"QtMultimedia is not available ({e})")
+
+    vlc_args = ("--aout=dummy", "--vout=dummy", "--no-video", "--quiet")
+    try:
+        if vlc.Instance(*vlc_args) is None:
+            raise Skip("libVLC could not be initialized")
+    except (NameError, OSError, AttributeError) as e:
+        raise Skip(f"libVLC is not available ({e})")
+
+    track = next(path for path in ctx.fixtures["tracks"] if path.endswith(".flac"))
+    player = Player([track], art_cache=ArtCache(tempfile.mkdtemp(dir=ctx.scratch)), vlc_args=vlc_args,
+                    waveforms=False, readahead_tracks=0)
+
+    def cpu_while_playing(seconds=3.0):
+        player.play_index(0)
+        if not wait_until(ctx.app, player.is_playing):
+            raise Skip("playback did not start")
+        cpu, started = time.process_time(), time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            ctx.app.processEvents()
+            time.sleep(0.005)
+        return (time.process_time() - cpu) / (time.perf_counter() - started) * 100
+
+    tap = None
+    try:
+        runs = max(1, ctx.repeat // 2)
+        playing = statistics.median(cpu_while_playing() for _ in range(runs))
+        tap = AudioTap(player)
+        with_tap = statistics.median(cpu_while_playing() for _ in range(runs))
+        stats = tap.stats()
+        return {
+            "cpu_percent_playing": playing,
+            "cpu_percent_with_tap": with_tap,
+            "added_percent_of_core": with_tap - playing,
+            "tap_callbacks": stats["callbacks"],
+            "tap_underruns": stats["underruns"],
+            "tap_dropped_ms": stats["dropped_ms"],
+            "analysis_cpu_ms_per_frame": stats.get("cpu_ms_per_frame"),
+        }
+    finally:
+        if tap is not None:
+            tap.stop()
+        player.player.stop()
+        player.extractor.shutdown()
+
+
+@benchmark("dedupe")
+def bench_dedupe(ctx):
+    """
+    Duplicate detection: payload hashing of tagged files, fingerprinting a decoded WAV,
+    grouping 100k fingerprints through the LSH index (pairs compared vs. all pairs), and
+    resuming a library hash run that was interrupted halfway.
+    """
+    import shutil
+    import wave
+
+    import numpy as np
+    from benchmarks.fixtures import tag_file, write_flac
+    from core.dedupe import DuplicateIndex, fingerprint, payload_hash
+    from core.library import Library
+
+    folder = os.path.join(ctx.scratch, "dedupe")
+    os.makedirs(folder, exist_ok=True)
+    original = os.path.join(folder, "original.flac")
+    write_flac(original, 60)
+    copies = []
+    for i in range(ctx.repeat * 4):
+        path = os.path.join(folder, f"copy-{i}.flac")
+        shutil.copy(original, path)
+        tag_file(path, f"Title {i}", "Artist", "Album")
+        copies.append(path)
+    hashing = []
+    for path in copies:
+        started = time.perf_counter()
+        payload_hash(path)
+        hashing.append(time.perf_counter() - started)
+    matched = len({payload_hash(path) for path in copies}) == 1
+
+    rate = 44100
+    rng = np.random.default_rng(0)
+    t = np.arange(rate * 60) / rate
+    signal = np.sin(2 * np.pi * 330 * t) * 0.3 * np.repeat(rng.uniform(0.1, 1, 240), len(t) // 240)
+    wav_path = os.path.join(folder, "tone.wav")
+    with wave.open(wav_path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((signal * 32767).astype("<i2").tobytes())
+    fingerprinting = []
+    for _ in range(ctx.repeat):
+        started = time.perf_counter()
+        fingerprint(wav_path)
+        fingerprinting.append(time.perf_counter() - started)
+
+    # Random fingerprints, a tenth of them with a near-duplicate (up to 24 bits flipped)
+    count = 100_000
+    prints = rng.integers(0, 256, (count, 32), dtype=np.uint8)
+    twins = rng.choice(count, count // 10, replace=False)
+    noisy = prints[twins].copy()
+    flips = rng.integers(0, 256, (len(twins), 24))
+    for bit in range(flips.shape[1]):
+        noisy[np.arange(len(twins)), flips[:, bit] // 8] ^= (1 << (flips[:, bit] % 8)).astype(np.uint8)
+    grouping = []
+    for _ in range(max(1, ctx.repeat // 2)):
+        index = DuplicateIndex()
+        for i in range(count):
+            index.add(f"/music/{i}.flac", fingerprint=prints[i].tobytes(), duration=180.0)
+        for n, i in enumerate(twins.tolist()):
+            index.add(f"/music/copy/{i}.flac", fingerprint=noisy[n].tobytes(), duration=181.0)
+        started = time.perf_counter()
+        index.groups()
+        grouping.append(time.perf_counter() - started)
+    stats = index.stats()
+
+    library = Library(os.path.join(folder, "library.sqlite3"))
+    for i in range(400):
+        shutil.copy(copies[i % len(copies)], os.path.join(folder, f"track-{i}.flac"))
+
+    class Interrupted(Exception):
+        pass
+
+    def interrupt(done, total):
+        if done == total // 2:
+            raise Interrupted
+
+    library.scan([folder])
+    try:
+        library.hash_audio(batch_size=50, progress=interrupt)
+    except Interrupted:
+        pass
+    resumed = library.hash_audio(batch_size=50)
+    library.close()
+    return {
+        "payload_hash_60s_flac": summarize(hashing),
+        "tag_only_copies_match": matched,
+        "fingerprint_60s_wav": summarize(fingerprinting),
+        "group_110k_fingerprints": summarize(grouping),
+        "pairs_compared": stats["compared"],
+        "all_pairs": stats["all_pairs"],
+        "near_duplicates_found": stats["fingerprint_matches"],
+        "near_duplicates_planted": len(twins),
+        "resume": {"done_before": resumed["done_before"], "hashed": resumed["hashed"]},
+    }
+
+
+@benchmark("startup")
+def bench_startup(ctx):
+    """
+    main.py to first frame and to a ready player, in fresh processes. The first run
+    starts with empty caches (icons are rasterized); the others reuse them.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+               XDG_CACHE_HOME=tempfile.mkdtemp(dir=ctx.scratch), XDG_DATA_HOME=tempfile.mkdtemp(dir=ctx.scratch))
+    report_path = os.path.join(ctx.scratch, "startup.json")
+    runs = []
+    for _ in range(ctx.repeat + 1):
+        subprocess.run([sys.executable, os.path.join(root, "main.py"), "--exit-after-startup",
+                        f"--startup-report={report_path}"], env=env, cwd=root, timeout=60,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            with open(report_path, encoding="utf-8") as f:
+                runs.append(json.load(f))
+            os.remove(report_path)
+        except OSError:
+            raise Skip("main.py did not write a startup report")
+
+    cold, warm = runs[0], runs[1:]
+    result = {"budget_ms": cold["budget_ms"], "cold": cold["marks"]}
+    for name in warm[0]["marks"]:
+        result[name] = summarize([run["marks"][name] / 1e3 for run in warm if name in run["marks"]])
+    result["within_budget"] = all(run["within_budget"] for run in warm)
+    return result
+
+
+# --- Running and comparing ---
+
+def _flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(baseline, current):
+    """Prints the relative change of every timing metric present in both runs."""
+    old = dict(_flatten(baseline.get("results", {})))
+    for name, value in _flatten(current.get("results", {})):
+        if name in old and name.rsplit(".", 1)[-1].startswith(("median_", "mean_", "p90_")) and old[name]:
+            change = (value - old[name]) / old[name] * 100
+            print(f"{name:60s} {old[name]:12.3f} -> {value:12.3f}  {change:+6.1f}%")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.run", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", "-o", help="write the JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per measurement")
+    parser.add_argument("--fixtures", help="directory for the generated fixtures (kept between runs)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        sys.exit(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    from PySide6 import __version__ as pyside_version
+    from PySide6.QtWidgets import QApplication
+    from benchmarks import fixtures
+
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    scratch = tempfile.mkdtemp(prefix="liquid-player-bench-")
+    try:
+        fixture_dir = args.fixtures or os.path.join(scratch, "fixtures")
+        started = time.perf_counter()
+        ctx = SimpleNamespace(app=app, scratch=scratch, repeat=max(1, args.repeat),
+                              fixtures=fixtures.generate(fixture_dir))
+        print(f"Fixtures ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        results = {}
+        for name in args.names or BENCHMARKS:
+            print(f"Running {name}...", file=sys.stderr)
+            try:
+                results[name] = BENCHMARKS[name](ctx)
+            except Skip as e:
+                results[name] = {"skipped": str(e)}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pyside": pyside_version,
+            "platform": platform.platform(),
+            "qt_platform": app.platformName(),
+            "repeat": ctx.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote
+
+from core.paths import user_cache_dir
+
+MIME_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/bmp": "bmp",
+    "image/webp": "webp",
+}
+
+
+class ArtCache:
+    """
+    Content-addressed store for album art.
+
+    Images are keyed by the SHA-1 of their bytes, so every track that shares a cover
+    shares one file on disk. The disk store is kept under ``max_disk_bytes`` by evicting
+    the least recently used files. Decoded images are kept at the size they are shown at,
+    in an in-memory LRU bounded by ``max_image_bytes``. The color palette of each image
+    is computed once and stored next to it, counted against the disk budget and evicted
+    together with its image.
+    """
+
+    def __init__(self, directory=None, max_disk_bytes=64 * 1024 * 1024, max_image_bytes=8 * 1024 * 1024):
+        self.directory = directory or user_cache_dir("art")
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_image_bytes = max_image_bytes
+
+        self._lock = threading.RLock()
+        self._files = OrderedDict()   # key -> (filename, size), least recently used first
+        self._disk_bytes = 0
+        self._images = OrderedDict()  # (key, width, height, dpr) -> QImage, least recently used first
+        self._image_bytes = 0
+        self._palette_dir = os.path.join(self.directory, "palettes")
+        os.makedirs(self._palette_dir, exist_ok=True)
+        self._palettes = OrderedDict()  # key -> palette dict, least recently used first
+        self._palette_files = set()  # Keys whose palette file is counted in _disk_bytes
+        self._tracks = OrderedDict()  # (path, mtime, size) -> key, or None if the track has no art
+        self._max_tracks = 4096
+        self._stats = {
+            "hits": 0,           # decoded image served from memory
+            "misses": 0,         # image had to be decoded from disk
+            "disk_hits": 0,      # stored art was already on disk
+            "disk_misses": 0,    # stored art had to be written
+            "track_hits": 0,     # track art resolved without re-extracting it
+            "evictions": 0,      # files removed from disk to stay within the budget
+            "image_evictions": 0,
+        }
+        self._scan()
+
+    def _scan(self):
+        """Indexes files left over from earlier runs, oldest first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, name, size in sorted(entries):
+            key = name.split(".", 1)[0]
+            self._files[key] = (name, size)
+            self._disk_bytes += size
+
+        # Palettes count toward their image's size; those whose image is gone are removed
+        for entry in os.scandir(self._palette_dir):
+            key = entry.name.split(".", 1)[0]
+            try:
+                if key in self._files and entry.name.endswith(".json"):
+                    self._add_bytes(key, entry.stat().st_size)
+                    self._palette_files.add(key)
+                else:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+        self._evict_disk()
+
+    def _add_bytes(self, key, size):
+        """Counts ``size`` more bytes on disk for the entry ``key`` (e.g. its palette file)."""
+        name, stored = self._files[key]
+        self._files[key] = (name, stored + size)
+        self._disk_bytes += size
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _touch(self, key):
+        """Marks a stored file as recently used, also across restarts (via its mtime)."""
+        self._files.move_to_end(key)
+        try:
+            os.utime(self._path(self._files[key][0]))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self._disk_bytes > self.max_disk_bytes and len(self._files) > 1:
+            key, (name, size) = self._files.popitem(last=False)
+            self._disk_bytes -= size
+            self._stats["evictions"] += 1
+            self._palettes.pop(key, None)
+            self._palette_files.discard(key)
+            for path in (self._path(name), self._palette_path(key)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def store(self, data, mime=None):
+        """
+        Stores image bytes in the cache and returns their content key.
+        Storing the same bytes twice only refreshes the existing entry.
+        """
+        key = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            if key in self._files:
+                self._stats["disk_hits"] += 1
+                self._touch(key)
+                return key
+            self._stats["disk_misses"] += 1
+
+        ext = MIME_EXTENSIONS.get((mime or "").lower(), "img")
+        filename = f"{key}.{ext}"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, self._path(filename))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if key not in self._files:
+                self._files[key] = (filename, len(data))
+                self._disk_bytes += len(data)
+                self._evict_disk()
+        return key
+
+    def adopt(self, key):
+        """
+        Indexes the image another process stored for ``key`` in this cache's directory
+        (see core.library), so it is counted in the budget. Returns False if there is none.
+        """
+        with self._lock:
+            if key in self._files:
+                self._touch(key)
+                return True
+        for ext in sorted(set(MIME_EXTENSIONS.values())) + ["img"]:
+            filename = f"{key}.{ext}"
+            try:
+                size = os.path.getsize(self._path(filename))
+            except OSError:
+                continue
+            with self._lock:
+                if key not in self._files:
+                    self._files[key] = (filename, size)
+                    self._disk_bytes += size
+                    self._evict_disk()
+            return True
+        return False
+
+    def path_for(self, key):
+        """Returns the on-disk path of a stored image, or None if it is not cached."""
+        with self._lock:
+            entry = self._files.get(key)
+        return self._path(entry[0]) if entry else None
+
+    def url_for(self, key):
+        path = self.path_for(key)
+        if not path:
+            return None
+        return "file:///" + path.replace('\\', '/')
+
+    def key_for_url(self, url):
+        """Returns the content key behind a ``file:///`` URL produced by this cache."""
+        if not url or not url.startswith('file:///'):
+            return None
+        path = unquote(url[8:])
+        if os.path.normcase(os.path.dirname(os.path.abspath(path))) != os.path.normcase(os.path.abspath(self.directory)):
+            return None
+        key = os.path.basename(path).split(".", 1)[0]
+        with self._lock:
+            return key if key in self._files else None
+
+    # --- Per-track lookups ---
+
+    def _track_signature(self, track_path):
+        try:
+            stat = os.stat(track_path)
+        except OSError:
+            return None
+        return (track_path, stat.st_mtime_ns, stat.st_size)
+
+    def lookup_track(self, track_path):
+        """
+        Returns ``(found, key)`` for a track whose art was already extracted and has not
+        changed since. ``key`` is None for tracks known to have no art.
+        """
+        signature = self._track_signature(track_path)
+        with self._lock:
+            if signature is None or signature not in self._tracks:
+                return False, None
+            key = self._tracks[signature]
+            if key is not None and key not in self._files:
+                del self._tracks[signature]
+                return False, None
+            self._tracks.move_to_end(signature)
+            self._stats["track_hits"] += 1
+            if key is not None:
+                self._touch(key)
+            return True, key
+
+    def remember_track(self, track_path, key):
+        signature = self._track_signature(track_path)
+        if signature is None:
+            return
+        with self._lock:
+            self._tracks[signature] = key
+            self._tracks.move_to_end(signature)
+            while len(self._tracks) > self._max_tracks:
+                self._tracks.popitem(last=False)
+
+    # --- Decoded images ---
+
+    def _image_key(self, url, width, height, dpr):
+        return (self.key_for_url(url) or url, width, height, dpr)
+
+    def cached_image(self, url, width, height, dpr=1.0):
+        """Returns the decoded image for ``url`` at the given device-pixel size, if cached."""
+        if not url or not url.startswith('file:///'):
+            return None
+        image_key = self._image_key(url, width, height, dpr)
+        with self._lock:
+            image = self._images.get(image_key)
+            if image is not None:
+                self._images.move_to_end(image_key)
+                self._stats["hits"] += 1
+            return image
+
+    def scaled_image(self, url, width, height, dpr=1.0):
+        """
+        Returns a QImage for a ``file:///`` URL that fits ``width`` x ``height`` device
+        pixels, or None if it cannot be decoded. Large images are decoded directly at the
+        target size instead of being decoded at full resolution and scaled afterwards.
+        Safe to call from worker threads.
+        """
+        from PySide6.QtCore import QSize, Qt
+        from PySide6.QtGui import QImageReader
+
+        image = self.cached_image(url, width, height, dpr)
+        if image is not None or not url or not url.startswith('file:///'):
+            return image
+        with self._lock:
+            self._stats["misses"] += 1
+
+        reader = QImageReader(unquote(url[8:]))
+        reader.setAutoTransform(True)
+        target = QSize(width, height)
+        source = reader.size()
+        if source.isValid() and (source.width() > width or source.height() > height):
+            reader.setScaledSize(source.scaled(target, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return None
+        if image.width() != width and image.height() != height:
+            # Small covers are still scaled up to fill the target
+            image = image.scaled(target, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+        image_key = self._image_key(url, width, height, dpr)
+        with self._lock:
+            if image_key not in self._images:
+                self._images[image_key] = image
+                self._image_bytes += image.sizeInBytes()
+            while self._image_bytes > self.max_image_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._image_bytes -= evicted.sizeInBytes()
+                self._stats["image_evictions"] += 1
+        return image
+
+    def clear_images(self):
+        """Drops all decoded images; the files on disk are kept."""
+        with self._lock:
+            self._images.clear()
+            self._image_bytes = 0
+
+    # --- Palettes ---
+
+    def _palette_path(self, key):
+        return os.path.join(self._palette_dir, f"{key}.json")
+
+    def palette(self, key):
+        """
+        Returns the color palette (see ``core.palette``) of a stored image, computing and
+        persisting it on first use. Returns None if the image is unknown or undecodable.
+        """
+        with self._lock:
+            if key in self._palettes:
+                self._palettes.move_to_end(key)
+                return self._palettes[key]
+        path = self.path_for(key)
+        if path is None:
+            return None
+
+        palette_path = self._palette_path(key)
+        try:
+            with open(palette_path, encoding="utf-8") as f:
+                palette = json.load(f)
+        except (OSError, ValueError):
+            from core.palette import extract_palette
+            palette = extract_palette(path)
+            if palette is not None:
+                self._write_palette(key, palette)
+
+        with self._lock:
+            self._palettes[key] = palette
+            while len(self._palettes) > self._max_tracks:
+                self._palettes.popitem(last=False)
+        return palette
+
+    def _write_palette(self, key, palette):
+        """Persists a palette; it is still returned (from memory) if it can't be written."""
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self._palette_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+                json.dump(palette, tmp)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._palette_path(key))
+        except OSError as e:
+            print(f"Error caching palette: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            if key not in self._files:
+                orphaned = True  # The image was evicted meanwhile
+            else:
+                orphaned = False
+                if key not in self._palette_files:
+                    self._palette_files.add(key)
+                    self._add_bytes(key, size)
+                    self._evict_disk()
+        if orphaned:
+            try:
+                os.remove(self._palette_path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Returns a snapshot of the cache counters and current usage."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["disk_bytes"] = self._disk_bytes
+            stats["disk_files"] = len(self._files)
+            stats["images"] = len(self._images)
+            stats["image_bytes"] = self._image_bytes
+        return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Returns the process-wide art cache shared by the player and the widgets."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ArtCache()
+        return _default_cache
+
+
+def set_default_cache(cache):
+    """Replaces the process-wide art cache (e.g. to point it at a scratch directory)."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
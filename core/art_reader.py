@@ -0,0 +1,410 @@
+"""
+Embedded album art, read straight from the file.
+
+The file is memory mapped and only the structures leading to the picture are walked:
+ID3v2 frame headers (MP3), FLAC metadata blocks, the comment header of Ogg streams
+(Vorbis, Opus, Speex, FLAC) and the MP4 ``moov/udta/meta/ilst/covr`` atoms. Unless the
+container stores it encoded (Ogg's base64 ``METADATA_BLOCK_PICTURE``, unsynchronised or
+compressed ID3 frames), the picture is handed back as a ``memoryview`` into the mapping,
+without being copied, so the art cache hashes and stores it straight from the page cache.
+(PySide6's ``QImage.fromData`` still wants ``bytes(art.data)``.)
+
+Front covers are preferred over other pictures. Containers the reader doesn't know
+raise ``UnsupportedFormat`` so the caller can fall back to mutagen.
+"""
+import base64
+import binascii
+import mmap
+import zlib
+
+# ID3/FLAC picture type of the front cover
+FRONT_COVER = 3
+
+_ID3_FORMATS = {b"JPG": "image/jpeg", b"PNG": "image/png", b"GIF": "image/gif", b"BMP": "image/bmp"}
+_MP4_FORMATS = {13: "image/jpeg", 14: "image/png", 27: "image/bmp"}
+_PICTURE_KEY = b"metadata_block_picture="
+
+
+class UnsupportedFormat(Exception):
+    """The file is not in a container the art reader understands (or its tags are malformed)."""
+
+
+class EmbeddedArt:
+    """
+    A picture embedded in a file. ``data`` is a ``memoryview`` that may point into the
+    memory-mapped file, so it is only valid until ``close()`` (or the end of a ``with``
+    block); copy it with ``bytes(art.data)`` to keep it longer.
+    """
+
+    def __init__(self, data, mime, picture_type=FRONT_COVER, mapping=None):
+        self.data = data
+        self.mime = mime or _sniff(data)
+        self.picture_type = picture_type
+        self._mapping = mapping
+
+    def close(self):
+        self.data.release()
+        if self._mapping is not None:
+            _unmap(*self._mapping)
+            self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_art(path):
+    """
+    Returns the embedded picture of ``path`` as ``EmbeddedArt`` (to be closed), or None
+    if the file has none. Raises ``UnsupportedFormat`` for other containers.
+    """
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            raise UnsupportedFormat("empty file")
+    view = memoryview(mapped)
+    try:
+        picture = _parse(view)
+    except UnsupportedFormat:
+        _unmap(view, mapped)
+        raise
+    except (IndexError, ValueError, zlib.error, binascii.Error, StopIteration) as e:
+        _unmap(view, mapped)
+        raise UnsupportedFormat(f"malformed tags: {e}") from None
+    if picture is None:
+        _unmap(view, mapped)
+        return None
+    data, mime, picture_type = picture
+    return EmbeddedArt(data, mime, picture_type, (view, mapped))
+
+
+def _unmap(view, mapped):
+    view.release()
+    try:
+        mapped.close()
+    except BufferError:
+        pass  # Slices are still referenced (e.g. by a traceback); the mapping goes with them
+
+
+def _parse(view):
+    head = bytes(view[:12])
+    if head.startswith(b"ID3"):
+        picture = _id3(view)
+        if picture is not None:
+            return picture
+        # Some taggers put an ID3 tag in front of FLAC files
+        end = 10 + _syncsafe(view[6:10]) + (10 if view[5] & 0x10 else 0)
+        if bytes(view[end:end + 4]) == b"fLaC":
+            return _flac(view, end + 4)
+        return None
+    if head.startswith(b"fLaC"):
+        return _flac(view, 4)
+    if head.startswith(b"OggS"):
+        return _ogg(view)
+    if head[4:8] == b"ftyp":
+        return _mp4(view)
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return None  # Bare MPEG audio: no ID3v2 tag, so no picture
+    raise UnsupportedFormat("unknown container")
+
+
+def _slice(view, start, size):
+    """Returns ``size`` bytes of ``view`` from ``start``; raises ValueError if the file ends before."""
+    if start + size > len(view):
+        raise ValueError("truncated file")
+    return view[start:start + size]
+
+
+def _best(pictures):
+    """Returns the first front cover among ``(data, mime, type)`` pictures, else the first picture."""
+    first = None
+    for picture in pictures:
+        if picture[2] == FRONT_COVER:
+            return picture
+        if first is None:
+            first = picture
+    return first
+
+
+def _sniff(data):
+    head = bytes(data[:8])
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"GIF8"):
+        return "image/gif"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    return None
+
+
+def _find(view, pattern, start, align=1):
+    """Returns the offset of ``pattern`` in ``view`` at or after ``start`` (aligned to ``align`` from it), or -1."""
+    size = 256
+    while True:
+        chunk = bytes(view[start:start + size])
+        i = chunk.find(pattern)
+        while i != -1 and i % align:
+            i = chunk.find(pattern, i + 1)
+        if i != -1:
+            return start + i
+        if start + size >= len(view):
+            return -1
+        size *= 4
+
+
+# --- ID3v2 ---
+
+def _syncsafe(data):
+    value = 0
+    for byte in data:
+        value = (value << 7) | (byte & 0x7F)
+    return value
+
+
+def _resync(data):
+    """Undoes ID3 unsynchronisation (a 0x00 inserted after every 0xFF)."""
+    return memoryview(bytes(data).replace(b"\xff\x00", b"\xff"))
+
+
+def _id3(view):
+    major, flags = view[3], view[5]
+    if major not in (2, 3, 4):
+        raise UnsupportedFormat(f"ID3v2.{major}")
+    tag = _slice(view, 10, _syncsafe(view[6:10]))
+    if flags & 0x80 and major < 4:
+        tag = _resync(tag)  # The whole tag is unsynchronised before v2.4
+    pos = 0
+    if flags & 0x40 and major >= 3:
+        size = int.from_bytes(tag[0:4], "big")
+        pos = size + 4 if major == 3 else _syncsafe(tag[0:4])
+
+    id_size, header_size = (3, 6) if major == 2 else (4, 10)
+    pictures = []
+    while pos + header_size <= len(tag):
+        frame_id = bytes(tag[pos:pos + id_size])
+        if frame_id[0] == 0:
+            break  # Padding
+        if major == 2:
+            size, frame_flags = int.from_bytes(tag[pos + 3:pos + 6], "big"), 0
+        else:
+            size_bytes = tag[pos + 4:pos + 8]
+            size = _syncsafe(size_bytes) if major == 4 else int.from_bytes(size_bytes, "big")
+            frame_flags = int.from_bytes(tag[pos + 8:pos + 10], "big")
+            if major == 4 and flags & 0x80:
+                frame_flags |= 0x0002  # Tag-wide unsynchronisation applies to every frame
+        body = _slice(tag, pos + header_size, size)
+        pos += header_size + size
+        if frame_id in (b"APIC", b"PIC"):
+            body = _frame_body(body, major, frame_flags)
+            if body is not None:
+                picture = _apic(body, major)
+                if picture is not None and picture[2] == FRONT_COVER:
+                    return picture
+                pictures.append(picture)
+    return _best(p for p in pictures if p is not None)
+
+
+def _frame_body(body, major, flags):
+    """Strips a frame's extra header data and undoes unsync/compression. None if encrypted."""
+    if major == 3:
+        compressed, encrypted = flags & 0x0080, flags & 0x0040
+        skip = (4 if compressed else 0) + (1 if encrypted else 0) + (1 if flags & 0x0020 else 0)
+    elif major == 4:
+        compressed, encrypted = flags & 0x0008, flags & 0x0004
+        skip = (1 if flags & 0x0040 else 0) + (1 if encrypted else 0) + (4 if flags & 0x0001 else 0)
+        if flags & 0x0002:
+            body = _resync(body[skip:])
+            skip = 0
+    else:
+        return body
+    if encrypted:
+        return None
+    body = body[skip:]
+    if compressed:
+        body = memoryview(zlib.decompress(body))
+    return body
+
+
+def _apic(body, major):
+    encoding = body[0]
+    if major == 2:
+        mime = _ID3_FORMATS.get(bytes(body[1:4]).upper())
+        pos = 4
+    else:
+        end = _find(body, b"\0", 1)
+        if end == -1:
+            return None
+        mime = bytes(body[1:end]).decode("latin-1")
+        pos = end + 1
+    if mime == "-->":
+        return None  # A link to the picture, not the picture
+    picture_type = body[pos]
+    # The description is terminated by one NUL, or two (aligned) in UTF-16
+    width = 2 if encoding in (1, 2) else 1
+    end = _find(body, b"\0" * width, pos + 1, width)
+    if end == -1:
+        return None
+    return body[end + width:], mime or None, picture_type
+
+
+# --- FLAC ---
+
+def _flac(view, pos):
+    pictures = []
+    comment = None
+    while pos + 4 <= len(view):
+        header = view[pos]
+        length = int.from_bytes(view[pos + 1:pos + 4], "big")
+        block = _slice(view, pos + 4, length)
+        pos += 4 + length
+        if header & 0x7F == 6:  # PICTURE
+            picture = _flac_picture(block)
+            if picture[2] == FRONT_COVER:
+                return picture
+            pictures.append(picture)
+        elif header & 0x7F == 4:  # VORBIS_COMMENT
+            comment = block
+        if header & 0x80:
+            break  # Last metadata block
+    if not pictures and comment is not None:
+        return _vorbis_picture(comment)
+    return _best(pictures)
+
+
+def _flac_picture(block):
+    picture_type = int.from_bytes(block[0:4], "big")
+    mime_length = int.from_bytes(block[4:8], "big")
+    mime = bytes(block[8:8 + mime_length]).decode("ascii", "replace")
+    pos = 8 + mime_length
+    pos += 4 + int.from_bytes(block[pos:pos + 4], "big")  # Description
+    pos += 16  # Width, height, color depth, palette size
+    size = int.from_bytes(block[pos:pos + 4], "big")
+    return _slice(block, pos + 4, size), mime or None, picture_type
+
+
+def _vorbis_picture(comment):
+    """Finds METADATA_BLOCK_PICTURE entries in a Vorbis comment block (little-endian lengths)."""
+    pos = 4 + int.from_bytes(comment[0:4], "little")  # Vendor string
+    count = int.from_bytes(comment[pos:pos + 4], "little")
+    pos += 4
+    pictures = []
+    for _ in range(count):
+        length = int.from_bytes(comment[pos:pos + 4], "little")
+        entry = _slice(comment, pos + 4, length)
+        pos += 4 + length
+        if bytes(entry[:len(_PICTURE_KEY)]).lower() == _PICTURE_KEY:
+            decoded = memoryview(base64.b64decode(entry[len(_PICTURE_KEY):]))
+            picture = _flac_picture(decoded)
+            if picture[2] == FRONT_COVER:
+                return picture
+            pictures.append(picture)
+    return _best(pictures)
+
+
+# --- Ogg ---
+
+def _ogg_packets(view):
+    """Yields the packets of the first logical stream (copied, as they may span pages)."""
+    pos = 0
+    serial = None
+    packet = bytearray()
+    while pos + 27 <= len(view):
+        if bytes(view[pos:pos + 4]) != b"OggS":
+            raise ValueError("lost Ogg page sync")
+        page_serial = int.from_bytes(view[pos + 14:pos + 18], "little")
+        segments = view[pos + 26]
+        lacing = bytes(view[pos + 27:pos + 27 + segments])
+        body = pos + 27 + segments
+        pos = body + sum(lacing)
+        if serial is None:
+            serial = page_serial
+        elif page_serial != serial:
+            continue
+        start = body
+        for length in lacing:
+            body += length
+            if length < 255:
+                # Segments of a packet are contiguous within a page, so each run is copied once
+                packet += view[start:body]
+                yield memoryview(packet)
+                packet = bytearray()
+                start = body
+        packet += view[start:body]
+
+
+def _ogg(view):
+    packets = _ogg_packets(view)
+    first = bytes(next(packets)[:8])
+    if first.startswith(b"\x01vorbis"):
+        comment = next(packets)
+        return _vorbis_picture(comment[7:]) if bytes(comment[:7]) == b"\x03vorbis" else None
+    if first == b"OpusHead":
+        comment = next(packets)
+        return _vorbis_picture(comment[8:]) if bytes(comment[:8]) == b"OpusTags" else None
+    if first == b"Speex   ":
+        return _vorbis_picture(next(packets))
+    if first.startswith(b"\x7fFLAC"):
+        # Each following header packet is one FLAC metadata block
+        pictures = []
+        for block in packets:
+            kind = block[0] & 0x7F
+            if kind == 6:
+                pictures.append(_flac_picture(block[4:]))
+            elif kind == 4 and not pictures:
+                picture = _vorbis_picture(block[4:])
+                if picture is not None:
+                    pictures.append(picture)
+            if block[0] & 0x80:
+                break
+        return _best(pictures)
+    raise UnsupportedFormat("unknown Ogg codec")
+
+
+# --- MP4 ---
+
+def _atoms(view, start, end):
+    """Yields ``(type, body start, body end)`` of the atoms between ``start`` and ``end``."""
+    pos = start
+    while pos + 8 <= end:
+        size = int.from_bytes(view[pos:pos + 4], "big")
+        kind = bytes(view[pos + 4:pos + 8])
+        header = 8
+        if size == 1:
+            size = int.from_bytes(view[pos + 8:pos + 16], "big")
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ValueError(f"bad {kind!r} atom size")
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _child(view, start, end, kind):
+    for child, body, body_end in _atoms(view, start, end):
+        if child == kind:
+            return body, body_end
+    return None
+
+
+def _mp4(view):
+    span = (0, len(view))
+    for kind in (b"moov", b"udta", b"meta", b"ilst", b"covr"):
+        span = _child(view, *span, kind)
+        if span is None:
+            return None
+        if kind == b"meta" and bytes(view[span[0] + 4:span[0] + 8]) != b"hdlr":
+            # ISO meta is a full atom (version and flags before its children); QuickTime's is not
+            span = (span[0] + 4, span[1])
+    pictures = []
+    for kind, body, body_end in _atoms(view, *span):
+        if kind == b"data":
+            data_type = int.from_bytes(view[body:body + 4], "big") & 0xFFFFFF
+            # Type indicator and locale precede the image; MP4 covers carry no picture type
+            pictures.append((view[body + 8:body_end], _MP4_FORMATS.get(data_type), FRONT_COVER))
+    return _best(pictures)
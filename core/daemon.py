@@ -0,0 +1,467 @@
+"""
+Headless playback with a JSON-RPC 2.0 control API on a local socket.
+
+The player runs under a QCoreApplication, so neither QtGui nor any widgets are loaded.
+Clients connect to a Unix domain socket (a named pipe on Windows) and send requests as
+one JSON document per line; a line may hold a batch (a JSON array), which is answered
+with one write. Clients subscribe to topics and receive ``<topic>`` notifications:
+changes are coalesced to at most one notification per topic and interval, serialized
+once for all subscribers, and dropped for clients that stop reading.
+
+Example::
+
+    $ python main.py --headless --socket /tmp/liquid.sock ~/Music/live.m3u
+    $ printf '{"jsonrpc":"2.0","id":1,"method":"status"}\\n' | socat - UNIX-CONNECT:/tmp/liquid.sock
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, Qt
+from PySide6.QtNetwork import QLocalServer
+
+from core.decks import CURVES
+from core.paths import user_runtime_dir
+from core.playlist_io import PlaylistLoader, is_playlist
+
+TOPICS = ("state", "position", "track", "volume", "queue")
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def default_socket_path():
+    return os.path.join(user_runtime_dir(), "control.sock")
+
+
+class _Client:
+    __slots__ = ("socket", "buffer", "topics", "dropped")
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.buffer = bytearray()
+        self.topics = set()
+        self.dropped = 0
+
+
+class ControlServer(QObject):
+    """
+    Serves JSON-RPC requests for a Player on a QLocalServer.
+
+    Everything runs on the Qt event loop; libVLC's threads only feed the player's
+    position clock, so a large number of clients never delays audio.
+    """
+    # Lines longer than this close the connection
+    MAX_LINE_BYTES = 1 << 20
+
+    def __init__(self, player, socket_path=None, notify_interval_ms=200, max_pending_bytes=256 * 1024, watcher=None,
+                 parent=None):
+        super().__init__(parent)
+        self.player = player
+        self.watcher = watcher
+        self.socket_path = socket_path or default_socket_path()
+        self.max_pending_bytes = max_pending_bytes
+        self._server = QLocalServer(self)
+        self._server.newConnection.connect(self._on_new_connection)
+        self._clients = {}
+        self._track = {"title": None, "artist": None}
+        self._stats = {"requests": 0, "batches": 0, "errors": 0, "changes": 0, "notifications": 0, "dropped": 0}
+
+        self.methods = {
+            "status": self.status,
+            "play": self.play,
+            "pause": self.pause,
+            "play_pause": self.play_pause,
+            "next": self.next,
+            "previous": self.previous,
+            "seek": self.seek,
+            "set_volume": self.set_volume,
+            "mute": self.mute,
+            "add": self.add,
+            "enqueue": self.enqueue,
+            "queue": self.queue,
+            "subscribe": None,   # Need the calling client (see _call)
+            "unsubscribe": None,
+            "stats": self.stats,
+        }
+
+        # Changes only mark topics dirty; the timer publishes each dirty topic once
+        self._dirty = set()
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(notify_interval_ms)
+        self._flush_timer.timeout.connect(self._flush)
+        player.state_changed.connect(lambda playing: self._changed("state"))
+        player.position_changed.connect(lambda position, length: self._changed("position"))
+        player.track_info_changed.connect(self._on_track_info)
+        player.mute_changed.connect(lambda muted: self._changed("volume"))
+
+    def listen(self):
+        """Starts listening, replacing a stale socket file. Returns False on failure."""
+        QLocalServer.removeServer(self.socket_path)
+        self._server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        if not self._server.listen(self.socket_path):
+            print(f"Error listening on {self.socket_path}: {self._server.errorString()}")
+            return False
+        return True
+
+    def close(self):
+        for client in list(self._clients.values()):
+            client.socket.disconnectFromServer()
+        self._server.close()
+
+    # --- Connections ---
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._clients[socket] = _Client(socket)
+            socket.readyRead.connect(lambda socket=socket: self._on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self._on_disconnected(socket))
+
+    def _on_disconnected(self, socket):
+        self._clients.pop(socket, None)
+        socket.deleteLater()
+
+    def _on_ready_read(self, socket):
+        client = self._clients.get(socket)
+        if client is None:
+            return
+        client.buffer += socket.readAll().data()
+        *lines, rest = client.buffer.split(b"\n")
+        if len(rest) > self.MAX_LINE_BYTES:
+            socket.abort()
+            return
+        client.buffer = bytearray(rest)
+
+        # Everything that arrived in one read is answered with one write
+        replies = []
+        for line in lines:
+            if line.strip():
+                reply = self.handle(line, client)
+                if reply is not None:
+                    replies.append(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+        if replies:
+            socket.write(b"".join(replies))
+
+    # --- Requests ---
+
+    def handle(self, data, client=None):
+        """Handles one request or batch (JSON text); returns the response, or None if there is nothing to answer."""
+        try:
+            message = json.loads(data)
+        except ValueError:
+            self._stats["errors"] += 1
+            return _error(None, PARSE_ERROR, "Parse error")
+        if isinstance(message, list):
+            self._stats["batches"] += 1
+            if not message:
+                return _error(None, INVALID_REQUEST, "Empty batch")
+            responses = [response for response in (self._call(item, client) for item in message) if response is not None]
+            return responses or None
+        return self._call(message, client)
+
+    def _call(self, request, client):
+        self._stats["requests"] += 1
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            self._stats["errors"] += 1
+            return _error(request.get("id") if isinstance(request, dict) else None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params", {})
+        try:
+            if method not in self.methods:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+            if method in ("subscribe", "unsubscribe"):
+                handler = lambda topics=None: self._subscribe(client, topics, method == "subscribe")
+            else:
+                handler = self.methods[method]
+            if isinstance(params, list):
+                result = handler(*params)
+            elif isinstance(params, dict):
+                result = handler(**params)
+            else:
+                raise RpcError(INVALID_PARAMS, "params must be an array or an object")
+        except RpcError as e:
+            self._stats["errors"] += 1
+            return _error(request_id, e.code, str(e)) if "id" in request else None
+        except TypeError as e:
+            self._stats["errors"] += 1
+            return _error(request_id, INVALID_PARAMS, str(e)) if "id" in request else None
+        except Exception as e:
+            print(f"Error handling {method}: {e}")
+            self._stats["errors"] += 1
+            return _error(request_id, SERVER_ERROR, str(e)) if "id" in request else None
+        if "id" not in request:
+            return None  # A notification: no response
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def _require_tracks(self):
+        if not self.player.playlist:
+            raise RpcError(SERVER_ERROR, "The playlist is empty")
+
+    # --- Methods ---
+
+    def status(self):
+        status = {name: self._topic(name) for name in TOPICS}
+        status["playlist_length"] = len(self.player.playlist)
+        return status
+
+    def play(self):
+        self._require_tracks()
+        if not self.player.is_playing():
+            self.player.play_pause()
+        return True
+
+    def pause(self):
+        if self.player.is_playing():
+            self.player.play_pause()
+        return True
+
+    def play_pause(self):
+        self._require_tracks()
+        self.player.play_pause()
+        return True
+
+    def next(self):
+        self._require_tracks()
+        self.player.next()
+        self._changed("queue")
+        return self._topic("track")
+
+    def previous(self):
+        self._require_tracks()
+        self.player.previous()
+        return self._topic("track")
+
+    def seek(self, position=None, ms=None):
+        """Seeks to ``position`` (0..1) or to ``ms`` milliseconds."""
+        if ms is not None:
+            _, length = self.player.position_clock.position()
+            if length <= 0:
+                raise RpcError(SERVER_ERROR, "The track length is not known yet")
+            position = ms / length
+        if not isinstance(position, (int, float)) or not 0 <= position <= 1:
+            raise RpcError(INVALID_PARAMS, "position must be a number from 0 to 1")
+        self.player.seek(position)
+        return True
+
+    def set_volume(self, volume):
+        if not isinstance(volume, int) or not 0 <= volume <= 100:
+            raise RpcError(INVALID_PARAMS, "volume must be an integer from 0 to 100")
+        self.player.set_volume(volume)
+        self._changed("volume")
+        return volume
+
+    def mute(self, muted=None):
+        """Sets the mute state (toggles it without ``muted``)."""
+        self.player.set_mute(not self.player.is_muted() if muted is None else bool(muted))
+        return self.player.is_muted()
+
+    def add(self, paths, play=False):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.player.add_tracks(paths, autoplay=play)
+        return len(self.player.playlist)
+
+    def enqueue(self, index):
+        if not isinstance(index, int) or not 0 <= index < len(self.player.playlist):
+            raise RpcError(INVALID_PARAMS, "index out of range")
+        self.player.enqueue(index)
+        self._changed("queue")
+        return self.player.playlist.queue
+
+    def queue(self):
+        return self.player.playlist.queue
+
+    def stats(self):
+        stats = dict(self._stats, clients=len(self._clients),
+                     subscribers=sum(1 for client in self._clients.values() if client.topics))
+        stats["switch_latency_ms"] = self.player.switch_latency_stats()
+        if self.player.scheduler is not None:
+            stats["transitions"] = self.player.scheduler.stats()
+        if self.player.readahead is not None:
+            stats["readahead"] = self.player.readahead.stats()
+        if self.watcher is not None:
+            stats["watcher"] = self.watcher.stats()
+        return stats
+
+    def _subscribe(self, client, topics, subscribe):
+        if client is None:
+            raise RpcError(SERVER_ERROR, "Subscriptions need a connection")
+        topics = TOPICS if topics is None else ([topics] if isinstance(topics, str) else topics)
+        unknown = [topic for topic in topics if topic not in TOPICS]
+        if unknown:
+            raise RpcError(INVALID_PARAMS, f"Unknown topics: {', '.join(map(str, unknown))}")
+        if subscribe:
+            client.topics.update(topics)
+        else:
+            client.topics.difference_update(topics)
+        return sorted(client.topics)
+
+    # --- Notifications ---
+
+    def _topic(self, name):
+        player = self.player
+        if name == "state":
+            return {"playing": bool(player.is_playing())}
+        if name == "position":
+            position, length = player.position_clock.position()
+            return {"ms": position, "length_ms": length}
+        if name == "track":
+            if not player.playlist:
+                return None
+            return {"index": player.current_track_index, "path": player.playlist[player.current_track_index], **self._track}
+        if name == "volume":
+            return {"volume": player.volume(), "muted": player.is_muted()}
+        return {"queue": player.playlist.queue}
+
+    def _on_track_info(self, title, artist):
+        self._track = {"title": title, "artist": artist}
+        self._changed("track")
+        self._changed("queue")  # Moving on to a queued track consumes it
+
+    def _changed(self, topic):
+        self._stats["changes"] += 1
+        self._dirty.add(topic)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush(self):
+        dirty, self._dirty = self._dirty, set()
+        for topic in TOPICS:
+            if topic not in dirty:
+                continue
+            subscribers = [client for client in self._clients.values() if topic in client.topics]
+            if not subscribers:
+                continue
+            message = json.dumps({"jsonrpc": "2.0", "method": topic, "params": self._topic(topic)},
+                                 separators=(",", ":")).encode() + b"\n"
+            for client in subscribers:
+                # A client that stops reading only loses notifications; it never holds up the others
+                if client.socket.bytesToWrite() > self.max_pending_bytes:
+                    client.dropped += 1
+                    self._stats["dropped"] += 1
+                    continue
+                client.socket.write(message)
+                self._stats["notifications"] += 1
+
+
+def _error(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+# --- Entry point ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="liquid-player --headless",
+                                     description="Play without a window, controlled over a local socket.")
+    parser.add_argument("paths", nargs="*", help="audio files and playlists (M3U, M3U8, PLS, XSPF) to play")
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--socket", metavar="PATH", default=None,
+                        help=f"control socket (default: {os.path.join('$XDG_RUNTIME_DIR', 'liquid-player', 'control.sock')})")
+    parser.add_argument("--notify-interval", type=int, default=200, metavar="MS",
+                        help="minimum time between two notifications of the same topic")
+    parser.add_argument("--paused", action="store_true", help="don't start playing right away")
+    parser.add_argument("--gapless", action="store_true",
+                        help="start the next track exactly where the current one ends")
+    parser.add_argument("--crossfade", type=int, default=0, metavar="MS",
+                        help="crossfade consecutive tracks over MS milliseconds (implies --gapless)")
+    parser.add_argument("--crossfade-curve", choices=sorted(CURVES), default="equal_power",
+                        help="volume curve of the crossfade")
+    parser.add_argument("--no-session", action="store_true",
+                        help="neither resume the last session (when started without paths) nor save this one")
+    parser.add_argument("--no-library", action="store_true",
+                        help="don't open the music library (no loudness normalization or indexed tags)")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="play one copy of tracks known to be duplicates (see python -m core.dedupe)")
+    parser.add_argument("--readahead", type=int, default=3, metavar="N",
+                        help="pull the next N tracks into the page cache ahead of time (0 disables)")
+    parser.add_argument("--watch", action="append", default=[], metavar="DIR",
+                        help="keep the playlist in sync with files added, moved or deleted below DIR (repeatable)")
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    """Runs the headless player until it receives SIGINT/SIGTERM. Returns the exit status."""
+    args = parse_args(argv)
+    app = QCoreApplication(sys.argv[:1])
+
+    from core.player import Player
+    from core.dedupe import known_duplicates
+    from core.library import Library
+    from core import session
+
+    # The library supplies loudness gains (see Library.analyze_loudness) and indexed tags
+    library = None if args.no_library else Library()
+    # Absolute, like the paths from playlist files, the library and the file watcher
+    tracks = [os.path.abspath(path) for path in args.paths if not is_playlist(path)]
+    # Waveforms and palettes only matter to the window
+    player = Player(tracks, waveforms=False, palettes=False,
+                    library=library, vlc_args=("--no-video",), gapless=args.gapless,
+                    crossfade_ms=max(0, args.crossfade), crossfade_curve=args.crossfade_curve,
+                    readahead_tracks=max(0, args.readahead),
+                    duplicates=known_duplicates(library) if args.skip_duplicates else None)
+    player.end_reached.connect(player.next)
+
+    saved = session.load_session() if not args.paths and not args.no_session else None
+    if saved is not None:
+        player.set_volume(saved["volume"])
+        player.set_mute(saved["muted"])
+        player.resume(saved["playlist"], saved["index"], saved["position_ms"],
+                      play=saved["playing"] and not args.paused)
+    recorder = None
+    if not args.no_session:
+        recorder = session.SessionRecorder(player, generation=saved["generation"] if saved else 0)
+
+    watcher = None
+    if args.watch:
+        from core.watcher import FileWatcher
+        watcher = FileWatcher(args.watch, library=library)
+        watcher.changed.connect(player.apply_changes, Qt.ConnectionType.QueuedConnection)
+        watcher.start()
+
+    server = ControlServer(player, args.socket, args.notify_interval, watcher=watcher)
+    if not server.listen():
+        return 1
+    print(f"Listening on {server.socket_path}")
+
+    loaders = []
+    for path in args.paths:
+        if is_playlist(path):
+            loader = PlaylistLoader(path)
+            loader.entries_loaded.connect(lambda entries: player.add_tracks(entries, autoplay=not args.paused),
+                                          Qt.ConnectionType.QueuedConnection)
+            loaders.append(loader)
+            loader.start()
+    if player.playlist and saved is None and not args.paused:
+        player.play_pause()
+
+    # Python only sees signals while the interpreter runs, so wake it up regularly
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: app.quit())
+    wakeup = QTimer()
+    wakeup.timeout.connect(lambda: None)
+    wakeup.start(250)
+
+    status = app.exec()
+    if watcher is not None:
+        watcher.stop()
+    if recorder is not None:
+        recorder.close()
+    server.close()
+    if library is not None:
+        library.close()
+    return status
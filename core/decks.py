@@ -0,0 +1,200 @@
+"""
+Gapless and crossfaded transitions between two decks (libVLC media players).
+
+The standby deck is loaded with the next track ahead of time. A scheduler thread watches
+the active deck's interpolated position (see core.position) and starts the standby deck
+so its audio begins exactly where the active track ends, or ``crossfade_ms`` earlier,
+ramping both volumes along a crossfade curve. The start-up latency of a deck (from
+``play()`` to audible output) is measured and started ahead of time.
+"""
+import math
+import statistics
+import threading
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, Signal
+
+
+# --- Crossfade curves: position 0..1 to (outgoing, incoming) amplitude ---
+
+def _linear(p):
+    return 1 - p, p
+
+
+def _equal_power(p):
+    # Constant total power for uncorrelated material, so the mix doesn't dip in the middle
+    return math.cos(p * math.pi / 2), math.sin(p * math.pi / 2)
+
+
+def _s_curve(p):
+    s = p * p * (3 - 2 * p)
+    return 1 - s, s
+
+
+CURVES = {"linear": _linear, "equal_power": _equal_power, "s_curve": _s_curve}
+
+
+class DeckScheduler(QObject):
+    """
+    Starts the standby deck at the right moment before the active deck ends.
+
+    ``arm`` hands over the two decks and their volumes; ``started`` is emitted (from the
+    scheduler thread) as soon as the incoming deck has been started and ``finished``
+    once the outgoing deck has faded out or played to its end.
+    """
+    started = Signal(object)  # Incoming media player
+    finished = Signal(object)  # Outgoing media player, no longer audible
+
+    # Poll interval close to the switch point and during fades
+    TICK_S = 0.005
+    # Longest sleep while the switch point is far away (seeks wake the thread sooner)
+    IDLE_S = 0.25
+    # Start-up latency assumed until one has been measured
+    DEFAULT_LEAD_MS = 80
+    # A deck that hasn't stopped this long after its expected end is stopped
+    END_GRACE_MS = 2000
+
+    def __init__(self, clock, crossfade_ms=0, curve="equal_power", parent=None):
+        super().__init__(parent)
+        if curve not in CURVES:
+            raise ValueError(f"unknown crossfade curve {curve!r} (expected one of {', '.join(CURVES)})")
+        self.clock = clock
+        self.crossfade_ms = crossfade_ms
+        self.curve = curve
+        self._cond = threading.Condition()
+        self._armed = None       # (outgoing, incoming) waiting for the switch point
+        self._fade = None        # Transition in progress
+        self._levels = (0, 0)    # Full volumes of the (outgoing, incoming) decks
+        self._leads = deque(maxlen=20)
+        self._late = deque(maxlen=50)
+        self._transitions = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="deck-scheduler", daemon=True)
+        self._thread.start()
+
+    # --- Main thread ---
+
+    def arm(self, outgoing, incoming, out_volume, in_volume):
+        """Schedules ``incoming`` (with its media already set) to follow ``outgoing``."""
+        with self._cond:
+            if self._fade is not None:
+                return
+            self._armed = (outgoing, incoming)
+            self._levels = (out_volume, in_volume)
+            self._cond.notify()
+
+    def disarm(self):
+        """
+        Cancels the scheduled or running transition. Returns the outgoing deck of an
+        interrupted crossfade (still playing; the caller stops it), else None.
+        """
+        with self._cond:
+            self._armed = None
+            fade, self._fade = self._fade, None
+            self._cond.notify()
+        return fade["outgoing"] if fade is not None else None
+
+    def set_levels(self, out_volume, in_volume):
+        """Updates the full volumes of the outgoing and incoming deck (e.g. the user changed the volume)."""
+        with self._cond:
+            self._levels = (out_volume, in_volume)
+            if self._fade is not None:
+                self._fade["applied"] = None
+
+    @property
+    def outgoing(self):
+        """The deck currently being faded out (or playing its last moments), or None."""
+        fade = self._fade
+        return fade["outgoing"] if fade is not None else None
+
+    def lead_ms(self):
+        return statistics.median(self._leads) if self._leads else self.DEFAULT_LEAD_MS
+
+    def stats(self):
+        """Returns the number of transitions, the start-up lead and how late switches were started."""
+        late = sorted(self._late)
+        return {
+            "transitions": self._transitions,
+            "lead_ms": self.lead_ms(),
+            "late_median_ms": late[len(late) // 2] if late else None,
+            "late_max_ms": late[-1] if late else None,
+        }
+
+    def shutdown(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    # --- Scheduler thread ---
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                if self._fade is not None:
+                    timeout = self._step_fade()
+                elif self._armed is not None:
+                    timeout = self._wait_for_switch()
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+
+    def _wait_for_switch(self):
+        position, length = self.clock.position()
+        if length <= 0:
+            return self.IDLE_S
+        fade_ms = min(self.crossfade_ms, length // 2)
+        switch_at = length - fade_ms - self.lead_ms()
+        remaining_ms = switch_at - position
+        if remaining_ms > 0:
+            return max(self.TICK_S, min(self.IDLE_S, remaining_ms / 2000))
+
+        outgoing, incoming = self._armed
+        self._armed = None
+        # Gapless starts at full volume; a crossfade ramps up from silence
+        incoming.audio_set_volume(0 if fade_ms else self._levels[1])
+        incoming.play()
+        now = time.monotonic()
+        self._late.append(max(0, -remaining_ms))
+        self._transitions += 1
+        self._fade = {
+            "outgoing": outgoing, "incoming": incoming, "fade_ms": fade_ms,
+            "started": now, "last": now, "elapsed_ms": 0.0, "audible": False,
+            "applied": None, "end_by": now + (fade_ms + self.lead_ms() + self.END_GRACE_MS) / 1000,
+        }
+        self.started.emit(incoming)
+        return self.TICK_S
+
+    def _step_fade(self):
+        fade = self._fade
+        outgoing, incoming = fade["outgoing"], fade["incoming"]
+        now = time.monotonic()
+        playing = incoming.is_playing()
+        if playing and not fade["audible"]:
+            fade["audible"] = True
+            self._leads.append((now - fade["started"]) * 1000)
+        if playing:
+            # Only time the incoming deck actually plays counts, so pausing holds the fade
+            fade["elapsed_ms"] += (now - fade["last"]) * 1000
+        elif fade["audible"]:
+            fade["end_by"] += now - fade["last"]
+        fade["last"] = now
+
+        if fade["fade_ms"]:
+            p = min(1.0, fade["elapsed_ms"] / fade["fade_ms"])
+            out_gain, in_gain = CURVES[self.curve](p)
+            levels = (round(self._levels[0] * out_gain), round(self._levels[1] * in_gain))
+            if levels != fade["applied"]:
+                fade["applied"] = levels
+                outgoing.audio_set_volume(levels[0])
+                incoming.audio_set_volume(levels[1])
+            done = p >= 1.0
+        else:
+            # Gapless: the outgoing deck plays to its end
+            done = not outgoing.is_playing() and playing
+        if done or now > fade["end_by"]:
+            self._fade = None
+            outgoing.stop()
+            self.finished.emit(outgoing)
+            return None
+        return self.TICK_S
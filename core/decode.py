@@ -0,0 +1,156 @@
+"""
+Decoding tracks to PCM for analysis.
+
+Compressed formats are decoded by a headless libVLC instance that transcodes the track
+into a temporary WAV file. Output to a file is not paced by VLC's playback clock, so
+tracks decode as fast as the CPU allows, but the whole track is transcoded before any
+of it can be read, and the file takes as much disk space as the decoded audio (about
+11 MB per minute at 48 kHz stereo). WAV files are read directly. Decoded audio can be
+read back in chunks (``decode_chunks``) or returned whole (``decode``).
+"""
+import os
+import tempfile
+import threading
+import wave
+
+import numpy as np
+
+# Rate tracks are decoded at (the BS.1770 filters are specified at 48 kHz)
+SAMPLE_RATE = 48000
+# Base time limit for one decode in seconds (large files get longer, see decode())
+DECODE_TIMEOUT = 120
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+class DecodeError(Exception):
+    pass
+
+
+def _vlc_instance():
+    """Returns this process's headless libVLC instance (created on first use)."""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            try:
+                import vlc
+                _instance = vlc.Instance("--quiet", "--no-video", "--aout=dummy", "--no-media-library")
+            except (ImportError, NameError, OSError) as e:  # python-vlc without a usable libVLC
+                raise DecodeError(f"libVLC is not available: {e}") from e
+            if _instance is None:
+                raise DecodeError("libVLC could not be initialized")
+        return _instance
+
+
+# Frames per chunk when streaming
+CHUNK_FRAMES = 1 << 16
+
+
+def _open_wav(path):
+    try:
+        reader = wave.open(path, 'rb')
+    except (wave.Error, EOFError) as e:
+        raise DecodeError(f"invalid WAV file: {e}") from e
+    if reader.getsampwidth() != 2:
+        reader.close()
+        raise DecodeError(f"unsupported WAV sample width: {reader.getsampwidth() * 8} bits")
+    return reader
+
+
+def iter_wav(path, chunk_frames=CHUNK_FRAMES):
+    """Yields ``(samples, rate)`` chunks of a 16-bit PCM WAV file (see ``decode``)."""
+    reader = _open_wav(path)
+    with reader:
+        channels, rate = reader.getnchannels(), reader.getframerate()
+        while True:
+            try:
+                data = reader.readframes(chunk_frames)
+            except (wave.Error, EOFError) as e:
+                raise DecodeError(f"invalid WAV file: {e}") from e
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype='<i2')[:len(data) // (2 * channels) * channels]
+            yield samples.reshape(-1, channels).astype(np.float32) / 32768.0, rate
+
+
+def read_wav(path):
+    """Returns ``(samples, rate)`` of a 16-bit PCM WAV file, samples as float32 ``(frames, channels)``."""
+    chunks = list(iter_wav(path, chunk_frames=1 << 22))
+    if not chunks:
+        raise DecodeError("empty WAV file")
+    return np.concatenate([chunk for chunk, _ in chunks]), chunks[0][1]
+
+
+def _transcode(path, wav_path, rate, timeout):
+    import vlc
+
+    done = threading.Event()
+    failed = threading.Event()
+    media = _vlc_instance().media_new(path)
+    dst = wav_path.replace(os.sep, '/')
+    media.add_option(f':sout=#transcode{{acodec=s16l,samplerate={rate}}}:std{{access=file,mux=wav,dst="{dst}"}}')
+    media.add_option(':no-sout-video')
+    media.add_option(':no-sout-spu')
+
+    player = _vlc_instance().media_player_new()
+    player.set_media(media)
+    events = player.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerEndReached, lambda event: done.set())
+    events.event_attach(vlc.EventType.MediaPlayerEncounteredError, lambda event: (failed.set(), done.set()))
+    try:
+        if player.play() != 0:
+            raise DecodeError("libVLC could not start decoding")
+        if not done.wait(timeout):
+            raise DecodeError("decoding timed out")
+        if failed.is_set():
+            raise DecodeError("libVLC could not decode the file")
+    finally:
+        player.stop()
+        events.event_detach(vlc.EventType.MediaPlayerEndReached)
+        events.event_detach(vlc.EventType.MediaPlayerEncounteredError)
+        player.release()
+        media.release()
+
+
+def decode_chunks(path, rate=SAMPLE_RATE, chunk_frames=CHUNK_FRAMES, timeout=None):
+    """
+    Decodes an audio file and yields ``(samples, rate)`` chunks, ``samples`` being a
+    float32 array of shape ``(frames, channels)`` in -1..1, so a whole track never has
+    to be held in memory. Raises DecodeError on failure.
+
+    This is not streaming: other than 16-bit WAV files, the track is first transcoded
+    into a temporary WAV file, which is read back once decoding finished. The file is
+    removed when the generator is exhausted or closed, so callers that may stop early
+    should close it (e.g. with ``contextlib.closing``).
+    """
+    if os.path.splitext(path)[1].lower() == '.wav':
+        try:
+            _open_wav(path).close()
+        except DecodeError:
+            pass  # Not 16-bit PCM; let VLC convert it
+        else:
+            yield from iter_wav(path, chunk_frames)
+            return
+
+    fd, wav_path = tempfile.mkstemp(prefix="liquid-decode-", suffix=".wav")
+    os.close(fd)
+    try:
+        if timeout is None:
+            # Allow another minute per 10 MB on top of the base limit
+            timeout = DECODE_TIMEOUT + os.path.getsize(path) / 10e6 * 60
+        _transcode(path, wav_path, rate, timeout)
+        yield from iter_wav(wav_path, chunk_frames)
+    finally:
+        try:
+            os.remove(wav_path)
+        except OSError:
+            pass
+
+
+def decode(path, rate=SAMPLE_RATE, timeout=None):
+    """Decodes a whole audio file and returns ``(samples, rate)`` (see ``decode_chunks``)."""
+    chunks = list(decode_chunks(path, rate, chunk_frames=1 << 22, timeout=timeout))
+    if not chunks:
+        raise DecodeError("no audio decoded")
+    return np.concatenate([chunk for chunk, _ in chunks]), chunks[0][1]
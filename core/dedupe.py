@@ -0,0 +1,444 @@
+"""
+Duplicate tracks: the same recording under different paths and tags.
+
+Each file gets up to two signatures:
+
+- a payload hash, BLAKE2b over the audio data only. The file is memory mapped and the
+  tag containers are skipped (ID3v2, ID3v1 and APEv2 around MPEG and other raw
+  streams, FLAC metadata blocks, Ogg header pages, everything but ``mdat`` in MP4 and
+  the non-audio chunks of WAV/AIFF), so copies that differ only in tags or art match.
+- optionally, a coarse fingerprint of the decoded audio (see core.decode): the track,
+  with silence trimmed at both ends, is cut into 17 equal segments, and the signs of
+  the time and frequency differences of their log band energies give 256 bits. It
+  survives re-encoding, so the same recording in another format or bitrate matches.
+
+``Library.hash_audio`` computes them across a process pool and stores them with the
+track in batches, so an interrupted run resumes with the files that are left.
+``DuplicateIndex`` groups tracks without comparing all pairs: equal payload hashes meet
+in a dictionary, and fingerprints are split into 16 bands of 16 bits (locality-
+sensitive hashing), so only tracks sharing a band are compared bit by bit.
+"""
+import hashlib
+import mmap
+import time
+from contextlib import closing
+
+import numpy as np
+
+# Fingerprint: segments of the track and log-spaced bands (differences give 16 x 16 bits)
+SEGMENTS = 17
+FINGERPRINT_BANDS = 17
+MIN_FREQUENCY = 200.0
+MAX_FREQUENCY = 4000.0
+FRAME_SECONDS = 0.1
+# Frames quieter than this (mean square, about -60 dBFS) are trimmed at both ends
+SILENCE = 1e-6
+# Decoding at a low rate is enough for the bands above and much cheaper
+FINGERPRINT_RATE = 11025
+
+# LSH: fingerprints sharing any of their 16 two-byte bands are candidates, and those
+# within this many differing bits (of 256) are duplicates
+MAX_DISTANCE = 40
+# Fingerprinted candidates whose durations differ by more are never duplicates
+MAX_DURATION_DELTA = 3.0
+# Larger buckets hold a common pattern rather than one recording and are skipped
+MAX_BUCKET = 64
+
+_HASH_CHUNK = 1 << 20
+_NO_GRANULE = (1 << 64) - 1
+
+
+# --- Payload hash ---
+
+def _syncsafe(data):
+    value = 0
+    for byte in data:
+        value = (value << 7) | (byte & 0x7F)
+    return value
+
+
+def _strip_tags(view, start, end):
+    """Narrows ``start:end`` to exclude a leading ID3v2 tag and trailing ID3v1/APEv2 tags."""
+    if bytes(view[start:start + 3]) == b"ID3" and end - start >= 10:
+        start += 10 + _syncsafe(view[start + 6:start + 10]) + (10 if view[start + 5] & 0x10 else 0)
+    while end - start >= 32:
+        if end - 128 >= start and bytes(view[end - 128:end - 125]) == b"TAG":
+            end -= 128
+        elif bytes(view[end - 32:end - 24]) == b"APETAGEX":
+            size = int.from_bytes(view[end - 20:end - 16], "little")
+            has_header = view[end - 9] & 0x80
+            end -= size + (32 if has_header else 0)
+        else:
+            break
+    return start, max(start, end)
+
+
+def _flac_spans(view, pos):
+    """Skips the metadata blocks after ``fLaC``; the frames that follow are the audio."""
+    while pos + 4 <= len(view):
+        header = view[pos]
+        pos += 4 + int.from_bytes(view[pos + 1:pos + 4], "big")
+        if header & 0x80:
+            break
+    return [_strip_tags(view, pos, len(view))] if pos <= len(view) else []
+
+
+def _ogg_spans(view):
+    """
+    Returns the page bodies of the first logical stream from its first audio page on.
+    Header packets (comments, pictures) sit on pages with granule position 0, or none
+    while a large packet continues, and audio starts on a fresh page; the page headers
+    themselves (sequence numbers, checksums) change with the tags and are left out.
+    """
+    spans = []
+    pos = 0
+    serial = None
+    started = False
+    while pos + 27 <= len(view):
+        if bytes(view[pos:pos + 4]) != b"OggS":
+            raise ValueError("lost Ogg page sync")
+        granule = int.from_bytes(view[pos + 6:pos + 14], "little")
+        page_serial = int.from_bytes(view[pos + 14:pos + 18], "little")
+        segments = view[pos + 26]
+        body = pos + 27 + segments
+        pos = body + sum(view[pos + 27:body])
+        if serial is None:
+            serial = page_serial
+        elif page_serial != serial:
+            continue
+        started = started or granule not in (0, _NO_GRANULE)
+        if started:
+            spans.append((body, min(pos, len(view))))
+    return spans
+
+
+def _mp4_spans(view):
+    spans = []
+    pos = 0
+    while pos + 8 <= len(view):
+        size = int.from_bytes(view[pos:pos + 4], "big")
+        kind = bytes(view[pos + 4:pos + 8])
+        header = 8
+        if size == 1:
+            size = int.from_bytes(view[pos + 8:pos + 16], "big")
+            header = 16
+        elif size == 0:
+            size = len(view) - pos
+        if size < header:
+            raise ValueError(f"bad {kind!r} atom size")
+        if kind == b"mdat":
+            spans.append((pos + header, min(pos + size, len(view))))
+        pos += size
+    return spans
+
+
+def _chunk_spans(view, wanted, byteorder, pos):
+    """Returns the body of the ``wanted`` chunk of a RIFF/AIFF file (chunks are padded to even sizes)."""
+    while pos + 8 <= len(view):
+        kind = bytes(view[pos:pos + 4])
+        size = int.from_bytes(view[pos + 4:pos + 8], byteorder)
+        if kind == wanted:
+            return [(pos + 8, min(pos + 8 + size, len(view)))]
+        pos += 8 + size + (size & 1)
+    return []
+
+
+def payload_spans(view):
+    """Returns the ``(start, end)`` byte ranges of ``view`` (a mapped file) holding its audio data."""
+    head = bytes(view[:12])
+    if head.startswith(b"OggS"):
+        return _ogg_spans(view)
+    if head[4:8] == b"ftyp":
+        return _mp4_spans(view)
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return _chunk_spans(view, b"data", "little", 12)
+    if head.startswith(b"FORM") and head[8:12] in (b"AIFF", b"AIFC"):
+        return _chunk_spans(view, b"SSND", "big", 12)
+    start, end = _strip_tags(view, 0, len(view))
+    if bytes(view[start:start + 4]) == b"fLaC":
+        return _flac_spans(view, start + 4)
+    # MPEG, ADTS, WavPack, Monkey's Audio, ...: whatever is between the tags
+    return [(start, end)]
+
+
+def payload_hash(path):
+    """Returns the hex BLAKE2b digest of the audio data of ``path`` (tags excluded), or None if it has none."""
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return None
+    view = memoryview(mapped)
+    try:
+        digest = hashlib.blake2b(digest_size=16)
+        hashed = 0
+        for start, end in payload_spans(view):
+            for offset in range(start, end, _HASH_CHUNK):
+                chunk = view[offset:min(end, offset + _HASH_CHUNK)]
+                digest.update(chunk)
+                hashed += len(chunk)
+                chunk.release()
+        return digest.hexdigest() if hashed else None
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"malformed container: {e}") from None
+    finally:
+        view.release()
+        mapped.close()
+
+
+# --- Fingerprint ---
+
+def _band_edges(rate, frame):
+    frequencies = np.fft.rfftfreq(frame, 1.0 / rate)
+    edges = np.searchsorted(frequencies, np.geomspace(MIN_FREQUENCY, min(MAX_FREQUENCY, rate / 2),
+                                                      FINGERPRINT_BANDS + 1))
+    for i in range(1, len(edges)):
+        edges[i] = max(edges[i], edges[i - 1] + 1)
+    return np.minimum(edges, len(frequencies) - 1)
+
+
+def frame_energies(chunks):
+    """
+    Returns ``(band energies, frame energies)`` of 0.1 s frames of ``(samples, rate)``
+    chunks (see core.decode.decode_chunks), mixed to mono.
+    """
+    bands, totals = [], []
+    carry = np.empty(0, dtype=np.float32)
+    frame = edges = None
+    for samples, rate in chunks:
+        if frame is None:
+            frame = max(64, int(rate * FRAME_SECONDS))
+            edges = _band_edges(rate, frame)
+            window = np.hanning(frame).astype(np.float32)
+        mono = np.concatenate((carry, samples.mean(axis=1) if samples.ndim > 1 else samples))
+        count = len(mono) // frame
+        carry = mono[count * frame:]
+        if not count:
+            continue
+        frames = mono[:count * frame].reshape(count, frame)
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        bands.append(np.add.reduceat(power[:, edges[0]:edges[-1]], edges[:-1] - edges[0], axis=1))
+        totals.append((frames * frames).mean(axis=1))
+    if not bands:
+        return np.empty((0, FINGERPRINT_BANDS)), np.empty(0)
+    return np.concatenate(bands), np.concatenate(totals)
+
+
+def fingerprint_from_energies(bands, totals):
+    """Packs band energies like those of ``frame_energies`` into a 32-byte fingerprint, or None if too short."""
+    loud = np.flatnonzero(totals > SILENCE)
+    if len(loud) < SEGMENTS * 2:
+        return None
+    bands = bands[loud[0]:loud[-1] + 1]
+    segments = np.stack([part.mean(axis=0) for part in np.array_split(bands, SEGMENTS)])
+    energy = np.log(segments + 1e-12)
+    across = energy[:, :-1] - energy[:, 1:]      # Frequency differences per segment
+    bits = (across[1:] - across[:-1]) > 0        # ... and how they change over time
+    return np.packbits(bits).tobytes()
+
+
+def fingerprint(path):
+    """Decodes ``path`` and returns its 32-byte fingerprint, or None if it is (nearly) silent or too short."""
+    from core.decode import decode_chunks
+    with closing(decode_chunks(path, rate=FINGERPRINT_RATE)) as chunks:
+        return fingerprint_from_energies(*frame_energies(chunks))
+
+
+def hash_track(item):
+    """
+    Hashes one file, and fingerprints it if asked. Runs in the library's worker
+    processes, so it takes and returns plain tuples: ``(path, mtime_ns, size, fingerprints)``
+    -> ``(path, mtime_ns, size, payload hash, fingerprint, state)``, ``state`` being 2 if
+    it was fingerprinted (the fingerprint may still be None for a silent track), else 1.
+    """
+    path, mtime_ns, size, fingerprints = item
+    digest = signature = None
+    state = 1
+    try:
+        digest = payload_hash(path)
+    except (OSError, ValueError) as e:
+        print(f"Error hashing {path}: {e}")
+    if fingerprints:
+        from core.decode import DecodeError
+        try:
+            signature = fingerprint(path)
+            state = 2
+        except (OSError, DecodeError) as e:
+            print(f"Error fingerprinting {path}: {e}")
+    return (path, mtime_ns, size, digest, signature, state)
+
+
+# --- Grouping ---
+
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+# Candidate pairs compared at a time
+_PAIR_CHUNK = 1 << 18
+
+
+def _candidate_pairs(band_keys):
+    """
+    Returns the distinct ``(i, j)`` pairs (i < j) of rows of ``band_keys`` (one LSH key
+    per row and band) that share a key in some band, and the number of buckets skipped
+    for being larger than MAX_BUCKET. Within each band the keys are sorted, so rows with
+    equal keys are neighbors and the pairs of a bucket are those up to its size apart.
+    """
+    rows = len(band_keys)
+    found = []
+    skipped = 0
+    for band in range(band_keys.shape[1]):
+        order = np.argsort(band_keys[:, band], kind="stable")
+        keys = band_keys[order, band]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, rows])
+        oversized = sizes > MAX_BUCKET
+        skipped += int(oversized.sum())
+        usable = np.repeat(~oversized, sizes)
+        for distance in range(1, min(int(sizes[~oversized].max(initial=1)), rows)):
+            same = (keys[distance:] == keys[:-distance]) & usable[distance:]
+            if not same.any():
+                break
+            left = np.flatnonzero(same)
+            first, second = order[left], order[left + distance]
+            # Encoded as one integer per pair, so pairs found in several bands are dropped by one sort
+            found.append(np.minimum(first, second).astype(np.int64) * rows + np.maximum(first, second))
+    if not found:
+        return np.empty((0, 2), dtype=np.intp), skipped
+    pairs = np.sort(np.concatenate(found))
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]]
+    return np.stack(np.divmod(pairs, rows), axis=1).astype(np.intp), skipped
+
+
+class DuplicateIndex:
+    """
+    Groups tracks that share a payload hash, or whose fingerprints differ in at most
+    ``max_distance`` bits (and whose durations, where known, are close). Candidates come
+    from locality-sensitive hashing, never from comparing every pair.
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE, max_duration_delta=MAX_DURATION_DELTA):
+        self.max_distance = max_distance
+        self.max_duration_delta = max_duration_delta
+        self._paths = []
+        self._by_hash = {}
+        self._prints = []      # (track index, fingerprint bytes)
+        self._durations = []
+        self._stats = {}
+
+    def add(self, path, payload_hash=None, fingerprint=None, duration=None):
+        index = len(self._paths)
+        self._paths.append(path)
+        self._durations.append(duration if duration is not None else float("nan"))
+        if payload_hash is not None:
+            self._by_hash.setdefault(payload_hash, []).append(index)
+        if fingerprint is not None:
+            self._prints.append((index, fingerprint))
+
+    def __len__(self):
+        return len(self._paths)
+
+    def groups(self):
+        """Returns the groups of duplicates (two or more paths each, sorted), largest first."""
+        started = time.perf_counter()
+        parent = list(range(len(self._paths)))
+
+        def root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(a, b):
+            a, b = root(a), root(b)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+        same_hash = 0
+        for members in self._by_hash.values():
+            for other in members[1:]:
+                union(members[0], other)
+                same_hash += 1
+
+        compared = matched = skipped_buckets = 0
+        if self._prints:
+            tracks = [index for index, _ in self._prints]
+            prints = np.frombuffer(b"".join(data for _, data in self._prints), dtype=np.uint8).reshape(len(tracks), -1)
+            durations = np.array([self._durations[index] for index in tracks])
+            pairs, skipped_buckets = _candidate_pairs(prints.view(">u2"))
+            compared = len(pairs)
+            for chunk in range(0, len(pairs), _PAIR_CHUNK):
+                first, second = pairs[chunk:chunk + _PAIR_CHUNK].T
+                distance = _POPCOUNT[prints[first] ^ prints[second]].sum(axis=1)
+                close = distance <= self.max_distance
+                close &= ~(np.abs(durations[first] - durations[second]) > self.max_duration_delta)  # NaN passes
+                for a, b in zip(first[close].tolist(), second[close].tolist()):
+                    union(tracks[a], tracks[b])
+                    matched += 1
+
+        groups = {}
+        for i in range(len(self._paths)):
+            groups.setdefault(root(i), []).append(self._paths[i])
+        result = sorted((sorted(members) for members in groups.values() if len(members) > 1),
+                        key=lambda members: (-len(members), members[0]))
+        n = len(self._prints)
+        self._stats = {
+            "tracks": len(self._paths),
+            "fingerprinted": n,
+            "same_hash": same_hash,
+            "compared": compared,
+            "all_pairs": n * (n - 1) // 2,
+            "fingerprint_matches": matched,
+            "skipped_buckets": skipped_buckets,
+            "groups": len(result),
+            "duplicates": sum(len(members) - 1 for members in result),
+            "seconds": time.perf_counter() - started,
+        }
+        return result
+
+    def stats(self):
+        """Returns counts from the last ``groups()``: tracks, pairs compared (vs. all pairs), groups found."""
+        return dict(self._stats)
+
+
+def group_keys(groups):
+    """Maps every path of ``groups`` to its group's number, e.g. for ``Player(duplicates=...)``."""
+    return {path: number for number, members in enumerate(groups) for path in members}
+
+
+def known_duplicates(library=None):
+    """Returns ``group_keys`` of the duplicate groups in ``library`` (default: the user's), as hashed so far."""
+    from core.library import Library
+
+    owned = library is None
+    library = library or Library()
+    try:
+        return group_keys(library.duplicate_groups())
+    finally:
+        if owned:
+            library.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from core.library import Library
+
+    parser = argparse.ArgumentParser(prog="python -m core.dedupe",
+                                     description="Find duplicate tracks below the given folders.")
+    parser.add_argument("directories", nargs="*", default=[os.path.expanduser("~/Music")])
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="also compare decoded audio, to find re-encoded copies (much slower)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    library = Library()
+    result = library.hash_audio(args.directories, fingerprints=args.fingerprint, workers=args.workers)
+    print(f"Hashed {result['hashed']} tracks ({result['failed']} failed, {result['done_before']} done before) "
+          f"in {result['elapsed']:.2f}s, {result['mb_per_second']:.0f} MB/s")
+    groups = library.duplicate_groups(args.directories)
+    for members in groups:
+        print()
+        for path in members:
+            print(f"  {path}")
+    print(f"\n{sum(len(members) - 1 for members in groups)} duplicates in {len(groups)} groups")
+    library.close()
@@ -0,0 +1,146 @@
+"""
+Delivery of libVLC events to the Qt thread.
+
+libVLC calls event handlers on its own thread, where they must return quickly and must
+not call back into libVLC. ``EventBridge`` handlers therefore do almost nothing there:
+a value is extracted from the event (the event object is only valid during the
+callback) and appended to a bounded deque, or, for events where only the newest value
+matters (time, length), stored in a slot that the next event of the same kind
+overwrites. The first event after a drain posts one wake-up to the Qt thread, which
+then dispatches everything that has arrived in a single pass: queued events first, then
+the coalesced values. Every event is numbered on arrival, and a coalesced value that is
+older than a queued event of the same owner is dropped: core.player attaches
+MediaPlayerMediaChanged as a queued event, so a position of the previous track is never
+applied after the next one was set, and one from before a pause not after Paused.
+
+``deque.append``/``popleft``, dict item assignment and ``next()`` on an
+``itertools.count`` are atomic in CPython, so the VLC side takes no lock.
+"""
+import itertools
+import threading
+from collections import deque
+
+from PySide6.QtCore import QObject, Qt, Signal
+
+from core.tracing import span
+
+_NO_VALUE = object()
+
+
+class EventBridge(QObject):
+    """
+    Hands libVLC events to handlers on the thread the bridge lives in.
+
+    ``attach`` registers a handler for an event of a VLC event manager, grouped under
+    an ``owner`` (e.g. a media object) so ``detach`` can remove all of its handlers,
+    including events already queued for them.
+    """
+    _wake = Signal()
+
+    def __init__(self, capacity=256, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._queue = deque()
+        self._latest = {}            # coalescing key -> (sequence, generation, handler, value)
+        self._sequence = itertools.count()  # Arrival order across the queue and the slots
+        self._wake_pending = False
+        self._owners = {}            # owner id -> (generation, [(event manager, event type)])
+        self._generation = 0
+        self._live = set()           # Generations of attached owners
+        self._lock = threading.Lock()  # Guards attach/detach only, never taken by VLC callbacks
+        self._stats = {"received": 0, "coalesced": 0, "dropped": 0, "stale": 0, "drains": 0, "dispatched": 0, "max_depth": 0}
+        self._wake.connect(self.drain, Qt.ConnectionType.QueuedConnection)
+
+    # --- Registration (Qt thread) ---
+
+    def attach(self, event_manager, event_type, handler, owner, value=None, coalesce=False):
+        """
+        Calls ``handler(value(event))`` (or ``handler()`` without ``value``) on the bridge's
+        thread whenever ``event_type`` fires on ``event_manager``. ``value`` runs on VLC's
+        thread and must only read the event. With ``coalesce``, events that arrive before
+        the next drain replace each other and only the newest is delivered.
+        """
+        with self._lock:
+            generation, managers = self._owners.get(id(owner), (None, None))
+            if managers is None:
+                self._generation += 1
+                generation, managers = self._generation, []
+                self._owners[id(owner)] = (generation, managers)
+                self._live.add(generation)
+            # The same EventManager object has to be used for detaching (and kept alive)
+            managers.append((event_manager, event_type))
+        key = (generation, event_type) if coalesce else None
+        event_manager.event_attach(event_type, self._on_event, generation, handler, value, key)
+
+    def detach(self, owner):
+        """Removes the handlers registered for ``owner``; its queued events are discarded."""
+        with self._lock:
+            generation, managers = self._owners.pop(id(owner), (None, ()))
+            self._live.discard(generation)
+        for event_manager, event_type in managers:
+            event_manager.event_detach(event_type)
+
+    def is_attached(self, owner):
+        return id(owner) in self._owners
+
+    # --- libVLC's event thread ---
+
+    @span("EventBridge.on_event")
+    def _on_event(self, event, generation, handler, value, key):
+        payload = value(event) if value is not None else _NO_VALUE
+        sequence = next(self._sequence)
+        # Counters may be bumped from several VLC threads at once, so they are approximate
+        self._stats["received"] += 1
+        if key is not None:
+            if key in self._latest:
+                self._stats["coalesced"] += 1
+            self._latest[key] = (sequence, generation, handler, payload)
+        else:
+            depth = len(self._queue)
+            if depth >= self.capacity:
+                self._stats["dropped"] += 1
+                return
+            self._queue.append((sequence, generation, handler, payload))
+            if depth + 1 > self._stats["max_depth"]:
+                self._stats["max_depth"] = depth + 1
+        if not self._wake_pending:
+            self._wake_pending = True
+            self._wake.emit()
+
+    # --- Qt thread ---
+
+    @span("EventBridge.drain")
+    def drain(self):
+        """Dispatches all pending events. Runs once per wake-up, i.e. at most once per event loop pass."""
+        # Cleared first: an event arriving from here on either is seen below or posts a new wake-up
+        self._wake_pending = False
+        self._stats["drains"] += 1
+
+        barriers = {}  # generation -> sequence of its last queued event in this drain
+        pending = len(self._queue)  # Events queued during dispatch wait for the next drain
+        for _ in range(pending):
+            sequence, generation, handler, payload = self._queue.popleft()
+            barriers[generation] = sequence
+            self._dispatch(generation, handler, payload)
+        for key in list(self._latest):
+            sequence, generation, handler, payload = self._latest.pop(key)
+            if sequence < barriers.get(generation, -1):
+                self._stats["stale"] += 1
+                continue  # Superseded by a queued event that has just been dispatched
+            self._dispatch(generation, handler, payload)
+
+    def _dispatch(self, generation, handler, payload):
+        if generation not in self._live:
+            return  # Detached while the event was queued (or by an earlier handler)
+        self._stats["dispatched"] += 1
+        try:
+            if payload is _NO_VALUE:
+                handler()
+            else:
+                handler(payload)
+        except Exception as e:
+            print(f"Error handling a libVLC event: {e}")
+
+    def stats(self):
+        """Returns event counters plus the current queue depth."""
+        return dict(self._stats, depth=len(self._queue) + len(self._latest), attached=len(self._owners))
@@ -0,0 +1,531 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mutagen
+
+from core.art_cache import ArtCache, default_cache
+from core.metadata import _first_tag, extract_art
+from core.paths import user_data_dir
+
+AUDIO_EXTENSIONS = {
+    '.mp3', '.flac', '.ogg', '.oga', '.opus', '.m4a', '.mp4', '.aac',
+    '.wav', '.wma', '.ape', '.wv', '.aiff', '.aif',
+}
+
+# Each entry upgrades the database by one version (tracked in PRAGMA user_version)
+MIGRATIONS = [
+    """
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration REAL,
+    art_hash TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tracks_artist_album ON tracks (artist, album);
+""",
+    # Cover palette (JSON, see core.palette) stored alongside the art hash
+    "ALTER TABLE tracks ADD COLUMN palette TEXT;",
+    # Loudness analysis (see core.loudness); rewriting a row on rescan clears it
+    """
+ALTER TABLE tracks ADD COLUMN loudness REAL;
+ALTER TABLE tracks ADD COLUMN true_peak REAL;
+ALTER TABLE tracks ADD COLUMN loudness_analyzed INTEGER NOT NULL DEFAULT 0;
+""",
+    # Duplicate detection (see core.dedupe); dedupe_state is 1 once hashed, 2 once also
+    # fingerprinted, and rewriting a row on rescan clears it
+    """
+ALTER TABLE tracks ADD COLUMN audio_hash TEXT;
+ALTER TABLE tracks ADD COLUMN fingerprint BLOB;
+ALTER TABLE tracks ADD COLUMN dedupe_state INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS tracks_audio_hash ON tracks (audio_hash);
+""",
+]
+
+# Below this many changed files, parsing in-process is faster than starting a pool
+_POOL_THRESHOLD = 64
+
+
+def _iter_audio_files(directory, unreadable=None):
+    """
+    Walks ``directory`` iteratively and yields ``(path, mtime_ns, size)`` of audio files.
+    Folders and files that couldn't be read are appended to ``unreadable``.
+    """
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                            stat = entry.stat()
+                            yield entry.path, stat.st_mtime_ns, stat.st_size
+                    except OSError:
+                        if unreadable is not None:
+                            unreadable.append(entry.path)
+                        continue
+        except OSError as e:
+            print(f"Error scanning {current}: {e}")
+            if unreadable is not None:
+                unreadable.append(current)
+
+
+# Art cache of a scanner worker process (see _init_worker)
+_worker_cache = None
+
+
+def _init_worker(art_directory):
+    """
+    Gives a scanner worker its own view of the art directory that never evicts: files
+    are only written there, and the parent's cache adopts them and keeps the budget.
+    """
+    global _worker_cache
+    _worker_cache = ArtCache(art_directory, max_disk_bytes=float("inf"), max_image_bytes=0)
+
+
+def read_track(item):
+    """
+    Reads the tags, duration and art of one file. Runs in the scanner's worker processes,
+    so it takes and returns plain tuples. The cover's palette isn't computed here (no
+    QtGui in the workers); it is left to the first time the track is shown.
+    """
+    path, mtime_ns, size = item
+    title = artist = album = duration = art_hash = None
+    try:
+        audio = mutagen.File(path, easy=True)
+        if audio is not None:
+            title = _first_tag(audio, 'title')
+            artist = _first_tag(audio, 'artist')
+            album = _first_tag(audio, 'album')
+            if audio.info is not None:
+                duration = getattr(audio.info, 'length', None)
+            art_hash = extract_art(path, _worker_cache or default_cache(), audio)
+    except Exception as e:
+        print(f"Error reading {path}: {e}")
+    return (path, mtime_ns, size, title, artist, album, duration, art_hash, None)
+
+
+class Library:
+    """
+    Persistent index of the music collection, backed by SQLite.
+
+    Scans are incremental: files whose mtime and size have not changed since the last
+    scan are not opened again. Changed files are parsed across a process pool and
+    written back in batches.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(user_data_dir(), "library.sqlite3")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for script in MIGRATIONS[version:]:
+                self._conn.executescript(script)
+            if version < len(MIGRATIONS):
+                self._conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+                self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Scanning ---
+
+    def _known_files(self, root):
+        """Returns ``{path: (mtime_ns, size)}`` for indexed files below ``root``."""
+        prefix = root.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, size FROM tracks WHERE path >= ? AND path < ?",
+                (prefix, upper),
+            ).fetchall()
+        return {path: (mtime_ns, size) for path, mtime_ns, size in rows}
+
+    def _write_batch(self, rows):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tracks "
+                "(path, mtime_ns, size, title, artist, album, duration, art_hash, palette) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def _remove(self, paths):
+        with self._lock:
+            self._conn.executemany("DELETE FROM tracks WHERE path = ?", ((path,) for path in paths))
+            self._conn.commit()
+
+    def scan(self, directories, workers=None, batch_size=1000, progress=None):
+        """
+        Brings the index up to date with ``directories``.
+
+        ``progress`` is called as ``progress(done, total)`` while changed files are parsed.
+        Returns a dict with the number of scanned, updated, removed and unchanged files
+        and the elapsed time in seconds.
+        """
+        started = time.perf_counter()
+        changed = []
+        removed = []
+        scanned = 0
+
+        for directory in directories:
+            root = os.path.abspath(directory)
+            known = self._known_files(root)
+            unreadable = []
+            for path, mtime_ns, size in _iter_audio_files(root, unreadable):
+                scanned += 1
+                if known.pop(path, None) != (mtime_ns, size):
+                    changed.append((path, mtime_ns, size))
+            if root in unreadable:
+                continue  # E.g. an unmounted share: nothing can be told about its files
+            # Whatever is left was indexed before but is gone now, unless it is below a
+            # folder that couldn't be listed (or is a file that couldn't be read)
+            skipped = tuple(path.rstrip(os.sep) + os.sep for path in unreadable)
+            unreadable = set(unreadable)
+            removed.extend(path for path in known if path not in unreadable and not path.startswith(skipped))
+
+        if removed:
+            self._remove(removed)
+
+        total = len(changed)
+        if total >= _POOL_THRESHOLD:
+            workers = workers or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(default_cache().directory,))
+            chunksize = max(1, min(256, total // (workers * 4)))
+            results = executor.map(read_track, changed, chunksize=chunksize)
+        else:
+            executor = None
+            results = map(read_track, changed)
+
+        try:
+            batch = []
+            for done, row in enumerate(results, 1):
+                if executor is not None and row[7]:
+                    default_cache().adopt(row[7])  # Stored by a worker
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._write_batch(batch)
+                    batch = []
+                if progress:
+                    progress(done, total)
+            if batch:
+                self._write_batch(batch)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        return {
+            "scanned": scanned,
+            "updated": total,
+            "removed": len(removed),
+            "unchanged": scanned - total,
+            "elapsed": time.perf_counter() - started,
+        }
+
+    def apply_changes(self, changes):
+        """
+        Applies a ``core.watcher.ChangeSet``: moves and removals are single statements,
+        and only added or modified files are opened to read their tags again.
+        Returns the number of files read.
+        """
+        with self._lock:
+            # Renamed in two steps, so swapped or chained names don't collide halfway
+            moving = [(old, new, f"\0moving\0{i}") for i, (old, new) in enumerate(changes.moved)]
+            self._conn.executemany("UPDATE tracks SET path = ? WHERE path = ?",
+                                   ((temporary, old) for old, _, temporary in moving))
+            self._conn.executemany("UPDATE OR REPLACE tracks SET path = ? WHERE path = ?",
+                                   ((new, temporary) for _, new, temporary in moving))
+            for old, new in changes.moved_dirs:
+                old, new = old.rstrip(os.sep) + os.sep, new.rstrip(os.sep) + os.sep
+                self._conn.execute(
+                    "UPDATE OR REPLACE tracks SET path = ? || substr(path, ?) WHERE path >= ? AND path < ?",
+                    (new, len(old) + 1, old, old[:-1] + chr(ord(os.sep) + 1)),
+                )
+            for directory in changes.removed_dirs:
+                prefix = directory.rstrip(os.sep) + os.sep
+                self._conn.execute("DELETE FROM tracks WHERE path >= ? AND path < ?",
+                                   (prefix, prefix[:-1] + chr(ord(os.sep) + 1)))
+            self._conn.executemany("DELETE FROM tracks WHERE path = ?", ((path,) for path in changes.removed))
+            self._conn.commit()
+
+        rows = []
+        for path in changes.added + changes.modified:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Gone again already
+            rows.append(read_track((path, stat.st_mtime_ns, stat.st_size)))
+        if rows:
+            self._write_batch(rows)
+        return len(rows)
+
+    # --- Loudness analysis ---
+
+    def _unanalyzed(self, directories):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, size FROM tracks WHERE loudness_analyzed = 0 ORDER BY path"
+            ).fetchall()
+        if directories is None:
+            return rows
+        prefixes = tuple(os.path.abspath(directory).rstrip(os.sep) + os.sep for directory in directories)
+        return [row for row in rows if row[0].startswith(prefixes)]
+
+    def _write_loudness(self, rows):
+        with self._lock:
+            # The mtime/size check skips files that were rescanned while being analyzed.
+            # Tracks that couldn't be decoded stay unanalyzed so the next run retries them.
+            self._conn.executemany(
+                "UPDATE tracks SET loudness = ?, true_peak = ?, loudness_analyzed = 1 "
+                "WHERE path = ? AND mtime_ns = ? AND size = ?",
+                ((loudness, peak, path, mtime_ns, size) for path, mtime_ns, size, loudness, peak, _ in rows
+                 if loudness is not None or peak is not None),
+            )
+            self._conn.commit()
+
+    def analyze_loudness(self, directories=None, workers=None, batch_size=100, progress=None):
+        """
+        Measures the loudness and true peak of indexed tracks that haven't been analyzed
+        yet (below ``directories``, which are scanned first, or the whole library). Tracks
+        are decoded and measured across a process pool; see core.loudness.
+
+        Returns a dict with the number of analyzed and failed tracks, the seconds of audio
+        measured, the elapsed time and how many times faster than real time that was.
+        Failed tracks are left to be retried by the next call.
+        """
+        from core.loudness import analyze_track
+
+        if directories is not None:
+            self.scan(directories, workers=workers)
+        started = time.perf_counter()
+        pending = self._unanalyzed(directories)
+        total = len(pending)
+
+        if total > 1:
+            workers = min(workers or os.cpu_count() or 1, total)
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(analyze_track, pending)
+        else:
+            executor = None
+            results = map(analyze_track, pending)
+
+        failed = 0
+        audio_seconds = 0.0
+        try:
+            batch = []
+            for done, row in enumerate(results, 1):
+                batch.append(row)
+                failed += row[3] is None and row[4] is None
+                audio_seconds += row[5]
+                if len(batch) >= batch_size:
+                    self._write_loudness(batch)
+                    batch = []
+                if progress:
+                    progress(done, total)
+            if batch:
+                self._write_loudness(batch)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "analyzed": total - failed,
+            "failed": failed,
+            "audio_seconds": audio_seconds,
+            "elapsed": elapsed,
+            "realtime_factor": audio_seconds / elapsed if elapsed > 0 else 0.0,
+        }
+
+    # --- Duplicates ---
+
+    def _under(self, directories):
+        """Returns a SQL condition and parameters selecting the paths below ``directories`` (all for None)."""
+        if directories is None:
+            return "1", ()
+        prefixes = [os.path.abspath(directory).rstrip(os.sep) + os.sep for directory in directories]
+        condition = " OR ".join(["(path >= ? AND path < ?)"] * len(prefixes))
+        return f"({condition})", tuple(p for prefix in prefixes for p in (prefix, prefix[:-1] + chr(ord(os.sep) + 1)))
+
+    def _write_hashes(self, rows):
+        with self._lock:
+            # The mtime/size check skips files that were rescanned while being hashed
+            self._conn.executemany(
+                "UPDATE tracks SET audio_hash = ?, fingerprint = ?, dedupe_state = ? "
+                "WHERE path = ? AND mtime_ns = ? AND size = ?",
+                ((digest, signature, state, path, mtime_ns, size)
+                 for path, mtime_ns, size, digest, signature, state in rows),
+            )
+            self._conn.commit()
+
+    def hash_audio(self, directories=None, fingerprints=False, workers=None, batch_size=200, progress=None):
+        """
+        Computes the payload hash (and with ``fingerprints``, the decoded-audio fingerprint)
+        of indexed tracks that don't have them yet, below ``directories`` (which are scanned
+        first) or in the whole library; see core.dedupe. Results are committed every
+        ``batch_size`` tracks, so an interrupted run continues where it stopped. Tracks
+        that couldn't be decoded are fingerprinted again by the next run.
+
+        Returns a dict with the number of hashed and failed tracks, those done by an
+        earlier run, the elapsed time and the megabytes of files hashed per second.
+        """
+        from core.dedupe import hash_track
+
+        if directories is not None:
+            self.scan(directories, workers=workers)
+        started = time.perf_counter()
+        state = 2 if fingerprints else 1
+        condition, params = self._under(directories)
+        with self._lock:
+            pending = self._conn.execute(
+                f"SELECT path, mtime_ns, size FROM tracks WHERE dedupe_state < ? AND {condition} ORDER BY path",
+                (state,) + params,
+            ).fetchall()
+            done_before = self._conn.execute(
+                f"SELECT COUNT(*) FROM tracks WHERE dedupe_state >= ? AND {condition}", (state,) + params,
+            ).fetchone()[0]
+        total = len(pending)
+        items = [(path, mtime_ns, size, fingerprints) for path, mtime_ns, size in pending]
+
+        if total >= _POOL_THRESHOLD or (fingerprints and total > 1):
+            workers = min(workers or os.cpu_count() or 1, total)
+            executor = ProcessPoolExecutor(max_workers=workers)
+            chunksize = 1 if fingerprints else max(1, min(64, total // (workers * 4)))
+            results = executor.map(hash_track, items, chunksize=chunksize)
+        else:
+            executor = None
+            results = map(hash_track, items)
+
+        failed = 0
+        hashed_bytes = 0
+        try:
+            batch = []
+            for done, row in enumerate(results, 1):
+                batch.append(row)
+                if row[3] is None or row[5] < state:
+                    failed += 1
+                else:
+                    hashed_bytes += row[2]
+                if len(batch) >= batch_size:
+                    self._write_hashes(batch)
+                    batch = []
+                if progress:
+                    progress(done, total)
+            if batch:
+                self._write_hashes(batch)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "hashed": total - failed,
+            "failed": failed,
+            "done_before": done_before,
+            "elapsed": elapsed,
+            "mb_per_second": hashed_bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def duplicate_groups(self, directories=None, max_distance=None):
+        """
+        Returns the groups of duplicate tracks (lists of paths) among those hashed by
+        ``hash_audio``, below ``directories`` or in the whole library.
+        """
+        from core.dedupe import MAX_DISTANCE, DuplicateIndex
+
+        condition, params = self._under(directories)
+        index = DuplicateIndex(MAX_DISTANCE if max_distance is None else max_distance)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT path, audio_hash, fingerprint, duration FROM tracks WHERE dedupe_state > 0 AND {condition}",
+                params,
+            ).fetchall()
+        for path, digest, signature, duration in rows:
+            index.add(path, digest, signature, duration)
+        return index.groups()
+
+    # --- Lookups ---
+
+    def lookup(self, path):
+        """
+        Returns the indexed entry of ``path`` as a dict, or None if the file is not
+        indexed or has changed on disk since it was scanned.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, title, artist, album, duration, art_hash, palette, loudness, true_peak "
+                "FROM tracks WHERE path = ?",
+                (os.path.abspath(path),),
+            ).fetchone()
+        if row is None or (row[0], row[1]) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return {
+            "title": row[2],
+            "artist": row[3],
+            "album": row[4],
+            "duration": row[5],
+            "art_hash": row[6],
+            "palette": json.loads(row[7]) if row[7] else None,
+            "loudness": row[8],
+            "true_peak": row[9],
+        }
+
+    def paths(self, order_by="artist, album, path"):
+        """Returns all indexed paths, e.g. to build a playlist for ``Player``."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT path FROM tracks ORDER BY {order_by}")]
+
+    def rows(self):
+        """Returns ``(path, title, artist, album)`` for every indexed track."""
+        with self._lock:
+            return self._conn.execute("SELECT path, title, artist, album FROM tracks").fetchall()
+
+    def search_index(self):
+        """Builds a ``core.search.SearchIndex`` over the indexed tracks."""
+        from core.search import SearchIndex
+        index = SearchIndex()
+        index.add_many(self.rows())
+        return index
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    analyze = "--loudness" in args
+    directories = [arg for arg in args if arg != "--loudness"] or [os.path.expanduser("~/Music")]
+
+    library = Library()
+    result = library.scan(directories)
+    print(f"Scanned {result['scanned']} files in {result['elapsed']:.2f}s: "
+          f"{result['updated']} updated, {result['removed']} removed, {result['unchanged']} unchanged")
+    if analyze:
+        result = library.analyze_loudness(directories)
+        print(f"Analyzed loudness of {result['analyzed']} tracks ({result['failed']} failed) in "
+              f"{result['elapsed']:.2f}s, {result['realtime_factor']:.0f}x real time")
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+
+import vlc
+
+
+class MediaPipeline:
+    """
+    Keeps parsed ``vlc.Media`` objects ready for the tracks around the current one.
+
+    Media objects are created and parsed asynchronously by libVLC as soon as they are
+    prepared, so switching tracks only hands an already parsed object to the player.
+    At most ``capacity`` objects are held; the least recently used are released.
+    """
+
+    def __init__(self, instance, capacity=3, parse_timeout_ms=5000):
+        self.instance = instance
+        self.capacity = capacity
+        self.parse_timeout_ms = parse_timeout_ms
+        self._lock = threading.Lock()
+        self._media = OrderedDict()  # track path -> vlc.Media, least recently used first
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _new_media(self, path):
+        media = self.instance.media_new(path)
+        # Asynchronous; MediaParsedChanged fires on the media once it is done
+        media.parse_with_options(vlc.MediaParseFlag.fetch_local, self.parse_timeout_ms)
+        return media
+
+    def _trim(self):
+        while len(self._media) > self.capacity:
+            _, media = self._media.popitem(last=False)
+            media.release()
+            self._stats["evictions"] += 1
+
+    def prepare(self, paths):
+        """Starts parsing ``paths`` (nearest first) and drops prepared media not among them."""
+        paths = list(dict.fromkeys(paths))[:self.capacity]
+        with self._lock:
+            for path in list(self._media):
+                if path not in paths:
+                    self._media.pop(path).release()
+                    self._stats["evictions"] += 1
+            for path in paths:
+                if path in self._media:
+                    self._media.move_to_end(path)
+                else:
+                    self._media[path] = self._new_media(path)
+            self._trim()
+
+    def take(self, path):
+        """
+        Returns the media for ``path``, prepared if possible. The caller takes over the
+        reference and must either ``release()`` it or hand it back with ``put``.
+        """
+        with self._lock:
+            media = self._media.pop(path, None)
+            if media is not None:
+                self._stats["hits"] += 1
+                return media
+            self._stats["misses"] += 1
+        return self._new_media(path)
+
+    def put(self, path, media):
+        """Takes back a media object (e.g. the one that just stopped playing) for reuse."""
+        with self._lock:
+            old = self._media.pop(path, None)
+            if old is not None and old is not media:
+                old.release()
+            self._media[path] = media
+            self._trim()
+
+    def clear(self):
+        with self._lock:
+            for media in self._media.values():
+                media.release()
+            self._media.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["prepared"] = len(self._media)
+        return stats
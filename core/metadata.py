@@ -0,0 +1,215 @@
+import base64
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import mutagen
+from mutagen.easyid3 import EasyID3
+from mutagen.easymp4 import EasyMP4Tags
+from mutagen.flac import Picture
+from mutagen.id3 import ID3
+from mutagen.mp4 import MP4Tags
+from PySide6.QtCore import QObject, Signal
+
+from core.art_cache import default_cache
+from core.art_reader import FRONT_COVER, EmbeddedArt, UnsupportedFormat, read_art
+from core.tracing import span
+
+
+def extract_art(track_path, cache=None, audio=None):
+    """
+    Extracts album art from a music file into the art cache.
+    Returns the content key of the cached image, or None if no art is found.
+    The picture is read straight from the file (see core.art_reader); mutagen is only
+    used for containers the reader doesn't know, reusing an already parsed ``audio``.
+    """
+    cache = cache or default_cache()
+    found, key = cache.lookup_track(track_path)
+    if found:
+        return key
+
+    try:
+        try:
+            art = read_art(track_path)
+        except UnsupportedFormat:
+            art = _mutagen_art(track_path, audio)
+
+        key = None
+        if art is not None:
+            with art:
+                key = cache.store(art.data, art.mime)
+        cache.remember_track(track_path, key)
+        return key
+
+    except Exception as e:
+        print(f"Error extracting album art: {e}")
+    return None
+
+
+def _mutagen_art(track_path, audio=None):
+    """Finds the embedded picture with a full mutagen parse. Returns ``EmbeddedArt`` or None."""
+    # Easy-mode wrappers hide picture frames, so those files are parsed again
+    if audio is None or isinstance(audio.tags, (EasyID3, EasyMP4Tags)):
+        audio = mutagen.File(track_path)
+    if audio is None:
+        return None
+
+    pictures = [(p.data, p.mime, p.type) for p in getattr(audio, 'pictures', ())]
+    tags = audio.tags
+    if isinstance(tags, ID3):
+        pictures += [(frame.data, frame.mime, frame.type) for frame in tags.getall('APIC')]
+    elif isinstance(tags, MP4Tags):
+        pictures += [(bytes(cover), None, FRONT_COVER) for cover in tags.get('covr', ())]
+    elif tags is not None and hasattr(tags, 'get'):
+        for value in tags.get('metadata_block_picture', ()):
+            picture = Picture(base64.b64decode(value))
+            pictures.append((picture.data, picture.mime, picture.type))
+    if not pictures:
+        return None
+
+    data, mime, picture_type = next((p for p in pictures if p[2] == FRONT_COVER), pictures[0])
+    return EmbeddedArt(memoryview(data), mime, picture_type)
+
+
+def get_album_art(track_path, cache=None, audio=None):
+    """
+    Extracts album art from a music file into the art cache.
+    Returns a file URL for the cached image, or None if no art is found.
+    """
+    cache = cache or default_cache()
+    key = extract_art(track_path, cache, audio)
+    return cache.url_for(key) if key else None
+
+
+def _first_tag(audio, name):
+    values = audio.get(name) if audio is not None else None
+    return values[0] if values else None
+
+
+def read_metadata(track_path, cache=None, palette=True):
+    """
+    Reads the title, artist and album art of a track with a single mutagen parse.
+    Returns a dict with ``title``, ``artist``, ``art_url`` and ``palette`` keys;
+    missing values are None (as is the palette without ``palette``).
+    """
+    cache = cache or default_cache()
+    audio = None
+    try:
+        audio = mutagen.File(track_path, easy=True)
+    except Exception as e:
+        print(f"Error reading tags: {e}")
+
+    key = extract_art(track_path, cache, audio) if audio is not None else None
+    return {
+        "title": _first_tag(audio, 'title'),
+        "artist": _first_tag(audio, 'artist'),
+        "art_url": cache.url_for(key) if key else None,
+        # Computed here so the tint is ready before the track starts playing
+        "palette": cache.palette(key) if key and palette else None,
+    }
+
+
+class MetadataExtractor(QObject):
+    """
+    Extracts track metadata on a background thread pool.
+
+    Results are kept in a small LRU so that tracks which were prefetched (or played
+    recently) resolve immediately. Finished extractions are announced through
+    ``extracted``, which is delivered on the receiver's thread. When a library is given,
+    indexed tracks are served from it instead of parsing the file again. Without
+    ``palettes`` no colors are extracted from the art (which needs QtGui).
+    """
+    extracted = Signal(str, object)  # track path, metadata dict
+
+    def __init__(self, art_cache=None, library=None, max_workers=2, max_results=64, palettes=True, parent=None):
+        super().__init__(parent)
+        self.art_cache = art_cache or default_cache()
+        self.library = library
+        self.palettes = palettes
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metadata")
+        self._lock = threading.Lock()
+        self._results = OrderedDict()  # track path -> metadata, least recently used first
+        self._pending = {}             # track path -> future
+
+    def cached(self, track_path):
+        """Returns the metadata of a track if it was already extracted, otherwise None."""
+        with self._lock:
+            metadata = self._results.get(track_path)
+            if metadata is not None:
+                self._results.move_to_end(track_path)
+            return metadata
+
+    def request(self, track_path):
+        """
+        Returns the metadata of a track if it is already known. Otherwise schedules its
+        extraction and returns None; ``extracted`` is emitted once it is done.
+        """
+        metadata = self.cached(track_path)
+        if metadata is None:
+            self._submit(track_path)
+        return metadata
+
+    def prefetch(self, track_paths):
+        """
+        Schedules speculative extraction of ``track_paths``. Queued prefetches for tracks
+        that are no longer wanted are cancelled so they don't delay newer requests.
+        """
+        wanted = set(track_paths)
+        with self._lock:
+            for path, future in list(self._pending.items()):
+                if path not in wanted and future.cancel():
+                    del self._pending[path]
+
+        for path in track_paths:
+            if self.cached(path) is None:
+                self._submit(path)
+
+    def forget(self, track_paths):
+        """Drops what is known about tracks whose files changed, so they are extracted again."""
+        with self._lock:
+            for path in track_paths:
+                self._results.pop(path, None)
+                future = self._pending.get(path)
+                if future is not None and future.cancel():
+                    del self._pending[path]
+
+    def _submit(self, track_path):
+        with self._lock:
+            if track_path in self._pending or track_path in self._results:
+                return
+            self._pending[track_path] = self._executor.submit(self._extract, track_path)
+
+    def _from_library(self, track_path):
+        if self.library is None:
+            return None
+        entry = self.library.lookup(track_path)
+        if entry is None:
+            return None
+        art_url = self.art_cache.url_for(entry["art_hash"]) if entry["art_hash"] else None
+        if entry["art_hash"] and not art_url:
+            return None  # The art was evicted from the cache; extract it again
+        palette = None
+        if self.palettes:
+            palette = entry["palette"] or (self.art_cache.palette(entry["art_hash"]) if art_url else None)
+        return {"title": entry["title"], "artist": entry["artist"], "art_url": art_url, "palette": palette}
+
+    @span("MetadataExtractor._extract")
+    def _extract(self, track_path):
+        try:
+            metadata = self._from_library(track_path) or read_metadata(track_path, self.art_cache, self.palettes)
+        except Exception as e:
+            print(f"Error extracting metadata: {e}")
+            metadata = {"title": None, "artist": None, "art_url": None, "palette": None}
+
+        with self._lock:
+            self._pending.pop(track_path, None)
+            self._results[track_path] = metadata
+            self._results.move_to_end(track_path)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+        self.extracted.emit(track_path, metadata)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,126 @@
+import numpy as np
+
+# Covers are reduced to this many pixels per side before quantization
+SAMPLE_SIZE = 48
+CLUSTERS = 5
+ITERATIONS = 8
+# WCAG AA contrast for normal text
+MIN_CONTRAST = 4.5
+
+
+def load_pixels(image_path, size=SAMPLE_SIZE):
+    """
+    Decodes an image directly at ``size`` x ``size`` and returns its pixels as an
+    ``(n, 3)`` float32 array of RGB values in 0..255, or None if it cannot be decoded.
+    """
+    from PySide6.QtCore import QSize
+    from PySide6.QtGui import QImage, QImageReader
+
+    reader = QImageReader(image_path)
+    reader.setScaledSize(QSize(size, size))
+    image = reader.read()
+    if image.isNull():
+        return None
+    image = image.convertToFormat(QImage.Format.Format_RGB32)
+
+    # Format_RGB32 is 0xffRRGGBB per pixel, i.e. BGRA bytes on little-endian machines
+    rows = np.frombuffer(image.constBits(), dtype=np.uint8, count=image.sizeInBytes())
+    rows = rows.reshape(image.height(), image.bytesPerLine())[:, :image.width() * 4]
+    pixels = rows.reshape(-1, 4)
+    if np.little_endian:
+        pixels = pixels[:, 2::-1]
+    else:
+        pixels = pixels[:, 1:]
+    return pixels.astype(np.float32)
+
+
+def kmeans(pixels, k=CLUSTERS, iterations=ITERATIONS):
+    """
+    Quantizes ``pixels`` into ``k`` colors with a few rounds of k-means.
+    Returns ``(centers, counts)`` sorted by cluster size, largest first.
+    """
+    k = min(k, len(pixels))
+    # Deterministic seeding: spread the initial centers over the luminance range
+    luminance = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    order = np.argsort(luminance, kind="stable")
+    centers = pixels[order[np.linspace(0, len(order) - 1, k).astype(int)]].copy()
+
+    for _ in range(iterations):
+        distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, pixels)
+        nonempty = counts > 0
+        new_centers = centers.copy()
+        new_centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+        if np.allclose(new_centers, centers, atol=0.5):
+            centers = new_centers
+            break
+        centers = new_centers
+
+    distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    counts = np.bincount(distances.argmin(axis=1), minlength=k)
+    order = np.argsort(-counts, kind="stable")
+    return centers[order], counts[order]
+
+
+def saturation(colors):
+    """HSV saturation of ``(n, 3)`` RGB colors in 0..255."""
+    high = colors.max(axis=-1)
+    low = colors.min(axis=-1)
+    return np.where(high > 0, (high - low) / np.maximum(high, 1e-6), 0.0)
+
+
+def relative_luminance(color):
+    """WCAG relative luminance of an RGB color in 0..255."""
+    channels = np.asarray(color, dtype=np.float64) / 255.0
+    linear = np.where(channels <= 0.03928, channels / 12.92, ((channels + 0.055) / 1.055) ** 2.4)
+    return float(linear @ np.array([0.2126, 0.7152, 0.0722]))
+
+
+def contrast_ratio(a, b):
+    la, lb = relative_luminance(a), relative_luminance(b)
+    return (max(la, lb) + 0.05) / (min(la, lb) + 0.05)
+
+
+def _hex(color):
+    r, g, b = (int(round(float(c))) for c in color)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def palette_from_pixels(pixels):
+    """
+    Picks the window palette from quantized cover colors.
+
+    ``tint`` is the dominant color, favoring colorful clusters over large grey ones.
+    ``accent`` is the most saturated remaining color (used for elapsed progress).
+    ``text`` is the inverted tint when it is readable on the tint, else black or white.
+    """
+    centers, counts = kmeans(pixels)
+    weights = counts / counts.sum()
+    sat = saturation(centers)
+
+    tint_index = int(np.argmax(weights * (0.35 + sat)))
+    tint = centers[tint_index]
+
+    others = [i for i in range(len(centers)) if i != tint_index and weights[i] >= 0.05]
+    if others:
+        accent = centers[max(others, key=lambda i: sat[i] + weights[i] * 0.5)]
+    else:
+        accent = tint
+
+    text = 255.0 - tint
+    if contrast_ratio(text, tint) < MIN_CONTRAST:
+        black, white = (0, 0, 0), (255, 255, 255)
+        text = black if contrast_ratio(black, tint) >= contrast_ratio(white, tint) else white
+
+    return {"tint": _hex(tint), "accent": _hex(accent), "text": _hex(text)}
+
+
+def extract_palette(image_path):
+    """Returns the palette of an image file as a dict of hex colors, or None."""
+    pixels = load_pixels(image_path)
+    if pixels is None or len(pixels) == 0:
+        return None
+    return palette_from_pixels(pixels)
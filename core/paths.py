@@ -0,0 +1,51 @@
+import os
+import sys
+
+APP_NAME = "liquid-player"
+
+
+def user_cache_dir(*parts):
+    """
+    Returns the per-user cache directory for the player (or a subdirectory of it),
+    creating it if needed.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+    path = os.path.join(base, APP_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def user_data_dir(*parts):
+    """
+    Returns the per-user data directory for the player (or a subdirectory of it),
+    creating it if needed. Unlike the cache directory, its contents are not disposable.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~\\AppData\\Roaming")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+
+    path = os.path.join(base, APP_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def user_runtime_dir(*parts):
+    """
+    Returns the per-user directory for runtime files such as sockets, creating it if
+    needed. This is $XDG_RUNTIME_DIR where it exists, otherwise the cache directory.
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if not base or sys.platform in ("win32", "darwin"):
+        return user_cache_dir(*parts)
+    path = os.path.join(base, APP_NAME, *parts)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
@@ -1,36 +1,21 @@
 import vlc
+import bisect
+import functools
 import os
+import time
+from collections import deque
 from PySide6.QtCore import QObject, Signal
-import mutagen
-import tempfile
-
-def get_album_art(track_path):
-    """
-    Extracts album art from a music file and saves it to a temporary file.
-    Returns the path to the temporary file, or None if no art is found.
-    """
-    try:
-        audio = mutagen.File(track_path, easy=True)
-        if audio is None:
-            return None
-
-        if 'APIC:' in audio:
-            artwork = audio['APIC:'].data
-            ext = audio['APIC:'].mime.split('/')[-1]
-            with tempfile.NamedTemporaryFile(suffix=f'.{ext}', delete=False) as tmp:
-                tmp.write(artwork)
-                return "file:///" + tmp.name.replace('\\', '/')
-        # Fallback for FLAC files
-        elif hasattr(audio, 'pictures') and audio.pictures:
-            artwork = audio.pictures[0].data
-            ext = audio.pictures[0].mime.split('/')[-1]
-            with tempfile.NamedTemporaryFile(suffix=f'.{ext}', delete=False) as tmp:
-                tmp.write(artwork)
-                return "file:///" + tmp.name.replace('\\', '/')
-
-    except Exception as e:
-        print(f"Error extracting album art: {e}")
-    return None
+from core.art_cache import default_cache
+from core.decks import DeckScheduler
+from core.event_bridge import EventBridge
+from core.loudness import TARGET_LUFS, track_gain
+from core.media_pipeline import MediaPipeline
+from core.metadata import MetadataExtractor
+from core.playlist import Playlist
+from core.position import PositionClock
+from core.readahead import ReadAhead
+from core.tracing import span, trace_signals
+from core.waveform import WaveformService
 
 
 class Player(QObject):
@@ -39,106 +24,528 @@ class Player(QObject):
     position_changed = Signal(int, int)
     album_art_changed = Signal(str)
     track_info_changed = Signal(str, str)
+    palette_changed = Signal(object) # Colors derived from the album art (see core.palette), or None
+    waveform_changed = Signal(object) # The current track's core.waveform.Waveform, or None
+    track_changed = Signal(str) # Path of the track now on the active deck
     mute_changed = Signal(bool)
     end_reached = Signal() # Signal to notify the main thread that the track has ended
+    switch_latency_measured = Signal(float) # Milliseconds from a next/previous request to playback
 
-    def __init__(self, playlist):
+    def __init__(self, playlist, art_cache=None, prefetch_radius=2, library=None, prepared_media=3,
+                 position_update_rate=10, vlc_args=(), instance=None, normalize=True,
+                 target_loudness=TARGET_LUFS, waveforms=True, gapless=False, crossfade_ms=0,
+                 crossfade_curve="equal_power", palettes=True, readahead_tracks=3, duplicates=None):
         super().__init__()
-        self.instance = vlc.Instance()
+        self.art_cache = art_cache or default_cache()
+        self.library = library
+
+        # Metadata and art are extracted on worker threads, never on libVLC's event thread
+        self.prefetch_radius = prefetch_radius
+        self.extractor = MetadataExtractor(self.art_cache, self.library, palettes=palettes, parent=self)
+        self.extractor.extracted.connect(self._on_metadata_extracted)
+
+        # libVLC's events reach the handlers below on this thread, batched per event loop pass
+        self.events = EventBridge(parent=self)
+
+        # The next readahead_tracks tracks are pulled into the page cache, so slow storage
+        # (network mounts, spinning disks) doesn't stall the start of the next track
+        self.readahead_tracks = readahead_tracks
+        self.readahead = ReadAhead() if readahead_tracks > 0 else None
+        self._switch_warm = None
+
+        # Waveform peaks for the seek bar, generated ahead of time for the neighboring tracks
+        self.waveforms = WaveformService(parent=self) if waveforms else None
+        self.waveform = None
+        if self.waveforms is not None:
+            self.waveforms.ready.connect(self._on_waveform_ready)
+
+        # An existing instance can be passed in (see core.startup.BackendLoader); otherwise
+        # one is created with the extra libVLC options, e.g. ("--aout=dummy",)
+        self.instance = instance or vlc.Instance(*vlc_args)
         self.player = self.instance.media_player_new()
 
-        self.playlist = playlist
+        # Parsed media for the neighboring tracks, so switching tracks is a pointer swap
+        self.media_pipeline = MediaPipeline(self.instance, capacity=prepared_media)
+        self._media = None
+        self._media_path = None
+        self._resumed_media = None # Media carrying a start-time option (see resume())
+
+        self.playlist = playlist if isinstance(playlist, Playlist) else Playlist(playlist)
         self.current_track_index = 0
+        # Known duplicates ({path: group}, see core.dedupe.group_keys) are played only once
+        self.duplicates = duplicates
+        if duplicates:
+            self.playlist.skip_duplicates(duplicates)
         self._is_muted = False
 
+        # Tracks analyzed by Library.analyze_loudness are played at target_loudness
+        self.normalize = normalize
+        self.target_loudness = target_loudness
+        self._volume = 70
+        self._gain_db = 0.0
+
+        self._switch_started = None
+        self.switch_latencies = deque(maxlen=100)
+
+        # VLC's time/length events are coalesced into at most position_update_rate updates/s
+        self.position_clock = PositionClock(position_update_rate, parent=self)
+        self.position_clock.position_changed.connect(self.position_changed)
+
+        # Gapless/crossfade mode: a second, standby deck is loaded with the next track and
+        # started by the scheduler's clock so it takes over exactly at the end of this one
+        self.scheduler = None
+        self._standby = None
+        self._standby_media = None
+        self._standby_path = None
+        self._standby_gain_db = 0.0
+        self._fading_media = None
+        self._fading_gain_db = 0.0
+        if gapless or crossfade_ms > 0:
+            self._standby = self.instance.media_player_new()
+            self.scheduler = DeckScheduler(self.position_clock, crossfade_ms, crossfade_curve, parent=self)
+            self.scheduler.started.connect(self._on_deck_started)
+            self.scheduler.finished.connect(self._on_deck_finished)
+
+        # Emission rates of the signals that drive the UI (only while tracing)
+        trace_signals(self, "position_changed", "album_art_changed", "track_info_changed",
+                      "palette_changed", "state_changed")
+
         # Load the first track if the playlist is not empty
         if self.playlist:
             self._load_track()
 
         # Set initial volume
-        self.set_volume(70)
+        self.set_volume(self._volume)
 
         # Ensure the player starts unmuted and the UI is synced
         self.set_mute(False)
 
-        events = self.player.event_manager()
-        events.event_attach(vlc.EventType.MediaPlayerPlaying, self.on_playing)
-        events.event_attach(vlc.EventType.MediaPlayerPaused, self.on_paused)
-        events.event_attach(vlc.EventType.MediaPlayerStopped, self.on_paused) # Treat stopped as paused
-        events.event_attach(vlc.EventType.MediaPlayerTimeChanged, self.on_time_changed)
-        events.event_attach(vlc.EventType.MediaPlayerLengthChanged, self.on_time_changed) # Update on length change too
-        events.event_attach(vlc.EventType.MediaPlayerEndReached, self.on_end_reached)
+        for deck in (self.player, self._standby):
+            if deck is not None:
+                self._attach_deck_events(deck)
+
+    def _attach_deck_events(self, deck):
+        """
+        Routes a media player's events through the event bridge. Only the values needed
+        are read on VLC's thread; time and length updates that arrive between two event
+        loop passes are merged, the newest one winning.
+        """
+        handlers = [
+            # Queued, so time and length values of the previous media that haven't been
+            # delivered yet are dropped once the new media is set (see EventBridge.drain)
+            (vlc.EventType.MediaPlayerMediaChanged, self.on_media_changed, None, False),
+            # Stamped on VLC's thread so the switch latency doesn't include the hand-over
+            (vlc.EventType.MediaPlayerPlaying, self.on_playing, lambda event: time.perf_counter(), False),
+            (vlc.EventType.MediaPlayerPaused, self.on_paused, None, False),
+            (vlc.EventType.MediaPlayerStopped, self.on_paused, None, False), # Treat stopped as paused
+            (vlc.EventType.MediaPlayerTimeChanged, self.on_time_changed,
+             lambda event: (event.u.new_time, time.monotonic()), True),
+            (vlc.EventType.MediaPlayerLengthChanged, self.on_length_changed, lambda event: event.u.new_length, True),
+            (vlc.EventType.MediaPlayerEndReached, self.on_end_reached, None, False),
+            (vlc.EventType.MediaPlayerBuffering, self.on_buffering, lambda event: event.u.new_cache, True),
+        ]
+        events = deck.event_manager()
+        for event_type, handler, value, coalesce in handlers:
+            if self.scheduler is not None:
+                # Both decks report events; only the active one's reach the handlers
+                handler = functools.partial(self._on_deck_event, deck, handler)
+            self.events.attach(events, event_type, handler, owner=deck, value=value, coalesce=coalesce)
 
     def _load_track(self):
         """Loads the current track from the playlist into the player."""
         if not self.playlist or not (0 <= self.current_track_index < len(self.playlist)):
             return
 
+        self._cancel_transition()
         path = self.playlist[self.current_track_index]
-        media = self.instance.media_new(path)
+        if self.readahead is not None:
+            # Read-ahead yields to the new track until it has buffered
+            self._switch_warm = self.readahead.is_warm(path)
+            self.readahead.set_busy(True)
+        media = self.media_pipeline.take(path)
         self.player.set_media(media)
+        self.position_clock.reset()
+        self._gain_db = self._track_gain(path)
+        self._apply_volume()
 
-        # Re-attach event for the new media object to get its metadata
-        media_events = media.event_manager()
-        media_events.event_attach(vlc.EventType.MediaParsedChanged, self.on_media_parsed)
+        # Keep the outgoing media parsed in case the user goes back to it
+        if self._media is not None:
+            self._recycle_media(self._media_path, self._media)
+        self._activate_media(path, media)
 
-    def on_end_reached(self, event):
-        """Called when a track finishes. Plays the next one automatically."""
-        self.end_reached.emit()
+    def _recycle_media(self, path, media):
+        if media is self._resumed_media:
+            # Its start time would apply to every later playback, so it is not reused
+            self._resumed_media = None
+            media.release()
+        else:
+            self.media_pipeline.put(path, media)
+
+    def _activate_media(self, path, media):
+        """Makes ``media`` (now on the active deck) the current track and updates everything that shows it."""
+        # Only the current media's parse notification matters; pending ones of the old media are dropped
+        if self._media is not None:
+            self.events.detach(self._media)
+        self._media = media
+        self._media_path = path
+        self.track_changed.emit(path)
+
+        self.events.attach(media.event_manager(), vlc.EventType.MediaParsedChanged, self._on_media_parsed, owner=media)
+        if media.get_parsed_status() == vlc.MediaParsedStatus.done:
+            # Prepared media has already been parsed and won't notify again
+            self._on_media_parsed()
 
-    def on_media_parsed(self, event, retrying=False):
+        self._request_metadata()
+        self._request_waveform()
+        self._prepare_neighbors()
+
+    def _prepare_neighbors(self):
+        """Keeps metadata, parsed media and waveforms ready for the tracks most likely to be played next."""
+        neighbors = self._neighbor_paths()
+        current = self.playlist[self.current_track_index]
+        self.extractor.prefetch([current] + neighbors)
+        # The standby deck holds its own media for the upcoming track
+        prepared = [path for path in neighbors if path != self._standby_path]
+        self.media_pipeline.prepare(prepared[:self.media_pipeline.capacity])
+        if self.waveforms is not None:
+            self.waveforms.prefetch([current] + neighbors)
+        if self.readahead is not None:
+            self.readahead.warm(self._upcoming_paths(self.readahead_tracks))
+        self._arm_standby()
+
+    def _upcoming_index(self, consume=False):
+        """Returns the index of the track after the current one (the head of the queue, if any)."""
+        queued = self.playlist.pop_queued() if consume else self.playlist.peek_queued()
+        if queued is not None:
+            return queued
+        return (self.current_track_index + 1) % len(self.playlist)
+
+    # --- Decks (gapless/crossfade mode) ---
+
+    def _on_deck_event(self, deck, handler, *args):
+        # The standby deck's events (e.g. a faded-out track ending) don't concern the UI
+        if deck is self.player and deck is not self.scheduler.outgoing:
+            handler(*args)
+
+    def _arm_standby(self):
+        """Loads the upcoming track into the standby deck and schedules it to follow the current one."""
+        if self.scheduler is None or not self.playlist or self.scheduler.outgoing is not None:
+            return
+        path = self.playlist[self._upcoming_index()]
+        if path != self._standby_path:
+            self._release_standby()
+            self._standby_media = self.media_pipeline.take(path)
+            self._standby_path = path
+            self._standby.set_media(self._standby_media)
+        self._standby_gain_db = self._track_gain(path)
+        self.scheduler.arm(self.player, self._standby,
+                           self._effective_volume(self._gain_db), self._effective_volume(self._standby_gain_db))
+
+    def _release_standby(self):
+        if self._standby_media is not None:
+            self.media_pipeline.put(self._standby_path, self._standby_media)
+        self._standby_media = None
+        self._standby_path = None
+
+    def _cancel_transition(self):
+        """Stops a scheduled or running transition, e.g. before the user switches tracks."""
+        if self.scheduler is None:
+            return
+        fading = self.scheduler.disarm()
+        if fading is not None:
+            fading.stop()
+            self._finish_fade()
+        # The standby deck may have been started just before the transition was cancelled
+        self._standby.stop()
+        self._release_standby()
+
+    def _on_deck_started(self, incoming):
+        """The scheduler started the standby deck: it becomes the active deck."""
+        if incoming is not self._standby or self._standby_media is None:
+            return # Cancelled in the meantime
+        self._switch_started = None
+        self.current_track_index = self._upcoming_index(consume=True)
+        self.player, self._standby = incoming, self.player
+        # The outgoing media keeps playing until the scheduler reports it finished
+        self._fading_media = (self._media_path, self._media)
+        self._fading_gain_db = self._gain_db
+        media, path = self._standby_media, self._standby_path
+        self._standby_media = None
+        self._standby_path = None
+        self._gain_db = self._standby_gain_db
+
+        # Its length event may have fired while it was still the standby deck
+        self.position_clock.reset()
+        self.position_clock.update_length(max(0, incoming.get_length(), media.get_duration()))
+        self.position_clock.update_time(max(0, incoming.get_time()))
+        self.position_clock.set_playing(True)
+        self.state_changed.emit(True)
+        self._activate_media(path, media)
+
+    def _on_deck_finished(self, outgoing):
+        self._finish_fade()
+        self._arm_standby()
+
+    def _finish_fade(self):
+        if self._fading_media is not None:
+            self._recycle_media(*self._fading_media)
+            self._fading_media = None
+
+    def _neighbor_paths(self):
         """
-        Called when media is parsed. This is the reliable point to fetch metadata.
+        Returns the tracks within ``prefetch_radius`` of the current one, nearest first.
+        The head of the "up next" queue comes before everything else.
         """
+        count = len(self.playlist)
+        paths = self.playlist.queue[:1]
+        for offset in range(1, self.prefetch_radius + 1):
+            for step in (offset, -offset):
+                path = self.playlist[(self.current_track_index + step) % count]
+                if path not in paths:
+                    paths.append(path)
+        return paths
+
+    def _upcoming_paths(self, count):
+        """Returns the next ``count`` tracks in play order (the queue first)."""
+        paths = self.playlist.queue[:count]
+        for step in range(1, count + 1):
+            path = self.playlist[(self.current_track_index + step) % len(self.playlist)]
+            if path not in paths:
+                paths.append(path)
+        return paths[:count]
+
+    def _request_metadata(self):
+        """Shows the current track's metadata, extracting it in the background if needed."""
+        metadata = self.extractor.request(self.playlist[self.current_track_index])
+        if metadata is not None:
+            self._apply_metadata(metadata)
+
+    def _apply_metadata(self, metadata):
+        """Emits track info and art, filling gaps from VLC's own metadata."""
         media = self.player.get_media()
-        if not media: return
+        path = self.playlist[self.current_track_index]
 
         # --- Album Art ---
-        artwork_url = get_album_art(self.playlist[self.current_track_index])
-        if not artwork_url:
+        artwork_url = metadata["art_url"]
+        if not artwork_url and media:
             artwork_url = media.get_meta(vlc.Meta.ArtworkURL)
         self.album_art_changed.emit(artwork_url)
-
+        self.palette_changed.emit(metadata["palette"])
 
         # --- Track Info ---
-        title = media.get_meta(vlc.Meta.Title) or os.path.basename(self.playlist[self.current_track_index])
-        artist = media.get_meta(vlc.Meta.Artist)
+        title = metadata["title"] or (media and media.get_meta(vlc.Meta.Title)) or os.path.basename(path)
+        artist = metadata["artist"] or (media and media.get_meta(vlc.Meta.Artist))
         self.track_info_changed.emit(title, artist)
 
-    def on_playing(self, event):
+    def _request_waveform(self):
+        """Shows the current track's waveform, or clears it until it has been generated."""
+        if self.waveforms is not None:
+            self.waveform = self.waveforms.request(self.playlist[self.current_track_index])
+            self.waveform_changed.emit(self.waveform)
+
+    def _on_waveform_ready(self, path, waveform):
+        if self.playlist and path == self.playlist[self.current_track_index]:
+            self.waveform = waveform
+            self.waveform_changed.emit(waveform)
+
+    def _on_metadata_extracted(self, path, metadata):
+        if self.playlist and path == self.playlist[self.current_track_index]:
+            self._apply_metadata(metadata)
+
+    # --- libVLC events, delivered on this thread by the event bridge ---
+
+    @span("Player.on_end_reached")
+    def on_end_reached(self):
+        """Called when a track finishes. Plays the next one automatically."""
+        self.end_reached.emit()
+
+    @span("Player.on_media_parsed")
+    def _on_media_parsed(self):
+        """Fills in metadata that only VLC could provide once the media is parsed."""
+        if not self.playlist:
+            return
+        metadata = self.extractor.cached(self.playlist[self.current_track_index])
+        if metadata is not None and not (metadata["title"] and metadata["artist"] and metadata["art_url"]):
+            self._apply_metadata(metadata)
+
+    @span("Player.on_playing")
+    def on_media_changed(self):
+        """Nothing to do: _load_track and _on_deck_started already reset the position clock."""
+
+    def on_playing(self, started_at):
+        if self._switch_started is not None:
+            latency_ms = (started_at - self._switch_started) * 1000
+            self._switch_started = None
+            self.switch_latencies.append(latency_ms)
+            self.switch_latency_measured.emit(latency_ms)
+            if self.readahead is not None:
+                self.readahead.record_start(self._switch_warm, latency_ms)
+        if self.readahead is not None:
+            self.readahead.set_busy(False)
+        self.position_clock.set_playing(True)
         self.state_changed.emit(True)
 
-    def on_paused(self, event):
+    def on_buffering(self, percent):
+        if self.readahead is not None:
+            self.readahead.set_busy(percent < 100)
+
+    def on_paused(self):
+        self.position_clock.set_playing(False)
         self.state_changed.emit(False)
 
-    def on_time_changed(self, event):
-        current_time = self.player.get_time()
-        duration = self.player.get_length()
-        if duration > 0: # Avoid division by zero
-            self.position_changed.emit(current_time, duration)
+    @span("Player.on_time_changed")
+    def on_time_changed(self, update):
+        # The event carries the new time (and when it was reported), so there is no need to query the player
+        time_ms, reported_at = update
+        self.position_clock.update_time(time_ms, reported_at)
+
+    @span("Player.on_length_changed")
+    def on_length_changed(self, length_ms):
+        self.position_clock.update_length(length_ms)
+
+    def add_tracks(self, paths, autoplay=False):
+        """
+        Appends tracks to the playlist, e.g. batches from a streaming playlist loader.
+        The first track is loaded (and started with ``autoplay``) as soon as it arrives.
+        """
+        was_empty = not self.playlist
+        self.playlist.extend(paths)
+        if was_empty and self.playlist:
+            self.current_track_index = 0
+            self._load_track()
+            if autoplay:
+                self.player.play()
+        else:
+            # The track after the current one may have changed (e.g. it was the last one)
+            self._arm_standby()
+
+    def apply_changes(self, changes, append_added=True):
+        """
+        Applies a ``core.watcher.ChangeSet`` without interrupting playback: moved files
+        keep their place, removed ones are dropped (the current track plays on and is
+        followed by the next remaining one) and added ones are appended. Cached metadata
+        and waveforms of modified files are dropped.
+        """
+        playlist = self.playlist
+        current = playlist[self.current_track_index] if playlist else None
+        playlist.rename(changes.moved)
+        for old, new in changes.moved_dirs:
+            playlist.rename([(old + os.sep, new + os.sep)], prefix=True)
+        removed = playlist.remove_paths(changes.removed, [directory + os.sep for directory in changes.removed_dirs])
+        current_removed = False
+        if removed:
+            before = bisect.bisect_left(removed, self.current_track_index)
+            current_removed = before < len(removed) and removed[before] == self.current_track_index
+            # A removed current track is left playing; the position before it makes next() play the one after it
+            index = self.current_track_index - before - current_removed
+            self.current_track_index = index % len(playlist) if playlist else 0
+
+        self.extractor.forget(changes.modified)
+        if self.waveforms is not None:
+            self.waveforms.forget(changes.modified)
+        if append_added and changes.added:
+            self.add_tracks(changes.added)
+
+        if self.playlist and current is not None and not current_removed:
+            path = self.playlist[self.current_track_index]
+            if path != current or path in changes.modified:
+                self._request_metadata()
+                self._request_waveform()
+        if self.playlist:
+            self._prepare_neighbors()
+        changes.applied_at = time.monotonic()
+
+    def resume(self, playlist, index, position_ms=0, play=True):
+        """
+        Replaces the playlist and loads the track at ``index`` so it starts at
+        ``position_ms``, e.g. to resume a saved session (see core.session).
+        """
+        self.playlist = playlist
+        if self.duplicates and playlist:
+            removed = playlist.skip_duplicates(self.duplicates)
+            if index in removed:
+                position_ms = 0  # The next remaining track plays instead, from its start
+            index -= bisect.bisect_left(removed, index)
+        if not self.playlist:
+            return
+        self.current_track_index = index if 0 <= index < len(self.playlist) else 0
+        self._load_track()
+        if position_ms > 0:
+            # The decoder starts at the position, instead of seeking once playback has begun
+            self._media.add_option(f":start-time={position_ms / 1000:.3f}")
+            self._resumed_media = self._media
+            self.position_clock.update_time(position_ms)
+        if play:
+            self.player.play()
 
     def play_pause(self):
+        # A deck that is still fading out pauses and resumes along with the active one
+        fading = self.scheduler.outgoing if self.scheduler is not None else None
         if self.player.is_playing():
             self.player.pause()
+            if fading is not None:
+                fading.set_pause(1)
         else:
             self.player.play()
+            if fading is not None:
+                fading.set_pause(0)
 
     def next(self):
         """Plays the next track in the playlist."""
         if not self.playlist: return
-        self.player.stop()
-        self.current_track_index = (self.current_track_index + 1) % len(self.playlist)
+        # set_media() stops the current track itself, so there is no separate stop() round trip
+        self._switch_started = time.perf_counter()
+        self.current_track_index = self._upcoming_index(consume=True)
         self._load_track()
         self.player.play()
 
     def previous(self):
         """Plays the previous track in the playlist."""
         if not self.playlist: return
-        self.player.stop()
+        self._switch_started = time.perf_counter()
         self.current_track_index = (self.current_track_index - 1 + len(self.playlist)) % len(self.playlist)
         self._load_track()
         self.player.play()
 
+    def play_index(self, index):
+        """Plays the track at ``index`` of the playlist's active order (e.g. picked in the playlist view)."""
+        if not 0 <= index < len(self.playlist): return
+        self._switch_started = time.perf_counter()
+        self.current_track_index = index
+        self._load_track()
+        self.player.play()
+
+    def enqueue(self, index):
+        """Queues the track at ``index`` to be played after the current one."""
+        self.playlist.enqueue(index)
+        self._prepare_neighbors()
+
+    def set_shuffle(self, enabled):
+        """Turns shuffle on or off without interrupting the current track."""
+        if not self.playlist: return
+        self.current_track_index = self.playlist.set_shuffle(enabled, self.current_track_index)
+        self._prepare_neighbors()
+
+    def switch_latency_stats(self):
+        """Returns the last, median and worst track-switch latency in milliseconds."""
+        if not self.switch_latencies:
+            return None
+        ordered = sorted(self.switch_latencies)
+        return {
+            "last": self.switch_latencies[-1],
+            "median": ordered[len(ordered) // 2],
+            "max": ordered[-1],
+            "count": len(ordered),
+        }
+
+    def decks(self):
+        """Returns the libVLC media players that play tracks: the active deck and, if any, the standby one."""
+        return [deck for deck in (self.player, self._standby) if deck is not None]
+
+    def current_path(self):
+        """Returns the path of the track on the active deck, or None before one was loaded."""
+        return self._media_path
+
     def is_playing(self):
         return self.player.is_playing()
 
@@ -146,14 +553,45 @@ class Player(QObject):
         if self.player.is_seekable():
             self.player.set_position(position)
 
+    def volume(self):
+        return self._volume
+
+    def is_muted(self):
+        return self._is_muted
+
     def set_volume(self, volume):
-        """Sets the player volume (0-100)."""
-        self.player.audio_set_volume(volume)
+        """Sets the player volume (0-100); the current track's loudness gain is applied on top."""
+        self._volume = volume
+        self._apply_volume()
+
+    def _track_gain(self, path):
+        """Returns the normalization gain in dB for a track (0 if it hasn't been analyzed)."""
+        if not self.normalize or self.library is None:
+            return 0.0
+        entry = self.library.lookup(path)
+        if entry is None:
+            return 0.0
+        return track_gain(entry["loudness"], entry["true_peak"], self.target_loudness)
+
+    def _effective_volume(self, gain_db):
+        # libVLC's volume is a linear amplitude factor in percent, up to 200
+        return max(0, min(200, round(self._volume * 10 ** (gain_db / 20))))
+
+    def _apply_volume(self):
+        if self.scheduler is not None and self._fading_media is not None:
+            # Mid-crossfade the scheduler sets both decks' volumes
+            self.scheduler.set_levels(self._effective_volume(self._fading_gain_db), self._effective_volume(self._gain_db))
+            return
+        self.player.audio_set_volume(self._effective_volume(self._gain_db))
+        if self.scheduler is not None and self._standby_media is not None:
+            self.scheduler.set_levels(self._effective_volume(self._gain_db), self._effective_volume(self._standby_gain_db))
 
     def set_mute(self, mute_state):
         """Sets the audio mute state and updates the UI via callback."""
         self._is_muted = mute_state
         self.player.audio_set_mute(self._is_muted)
+        if self._standby is not None:
+            self._standby.audio_set_mute(self._is_muted)
         self.mute_changed.emit(self._is_muted)
 
     def toggle_mute(self):
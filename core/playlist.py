@@ -0,0 +1,658 @@
+import random
+from array import array
+from collections import deque
+
+import numpy as np
+
+
+class _PathStore:
+    """
+    Array-backed storage for path strings.
+
+    Paths are kept UTF-8 encoded in one contiguous bytearray with their offsets and
+    lengths in typed arrays, which costs a few bytes per entry on top of the path itself
+    instead of a full Python string object per entry. A replaced path leaves its old
+    bytes behind until they make up half of the blob, which is then compacted.
+    """
+    COMPACT_MIN_BYTES = 1 << 20
+
+    def __init__(self):
+        self._blob = bytearray()
+        self._starts = array('Q')
+        self._lengths = array('I')
+        self._dead = 0  # Bytes of the blob no entry points to any more
+
+    def __len__(self):
+        return len(self._starts)
+
+    def add(self, path):
+        """Stores ``path`` and returns its entry id."""
+        data = path.encode('utf-8', 'surrogateescape')
+        self._starts.append(len(self._blob))
+        self._lengths.append(len(data))
+        self._blob += data
+        return len(self._starts) - 1
+
+    def get(self, entry_id):
+        start = self._starts[entry_id]
+        return self._blob[start:start + self._lengths[entry_id]].decode('utf-8', 'surrogateescape')
+
+    def replace(self, entry_id, path):
+        """Points an entry at a new path (e.g. after the file was moved)."""
+        data = path.encode('utf-8', 'surrogateescape')
+        self._dead += self._lengths[entry_id]
+        self._starts[entry_id] = len(self._blob)
+        self._lengths[entry_id] = len(data)
+        self._blob += data
+        if self._dead >= self.COMPACT_MIN_BYTES and 2 * self._dead >= len(self._blob):
+            self._compact()
+
+    def _compact(self):
+        """
+        Copies the live paths into a new blob, in entry order. New buffers are created
+        rather than changed in place, so earlier ``buffers()`` stay consistent.
+        """
+        starts = np.frombuffer(self._starts, dtype=np.uint64).astype(np.int64)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.int64)
+        new_starts = np.cumsum(lengths) - lengths
+        # Source offset of every byte of the new blob
+        source = np.repeat(starts - new_starts, lengths) + np.arange(int(lengths.sum()))
+        self._blob = bytearray(np.frombuffer(self._blob, dtype=np.uint8)[source].tobytes())
+        self._starts = array('Q', new_starts.astype(np.uint64).tobytes())
+        self._dead = 0
+
+    def find(self, path, prefix=False):
+        """
+        Returns the ids of the entries holding ``path`` (or, with ``prefix``, starting
+        with it) as a NumPy array. The blob is searched for the encoded text and only
+        matches at an entry's start count, so no path is decoded.
+        """
+        data = path.encode('utf-8', 'surrogateescape')
+        offsets = array('Q')
+        find = self._blob.find
+        offset = find(data)
+        while offset != -1:
+            offsets.append(offset)
+            offset = find(data, offset + 1)
+        if not offsets:
+            return np.empty(0, dtype=np.uint32)
+        # Offsets come out ascending, so each entry's start is looked up among them by bisection
+        offsets = np.frombuffer(offsets, dtype=np.uint64)
+        starts = np.frombuffer(self._starts, dtype=np.uint64)
+        nearest = np.minimum(np.searchsorted(offsets, starts), len(offsets) - 1)
+        hits = offsets[nearest] == starts
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        hits &= (lengths >= len(data)) if prefix else (lengths == len(data))
+        return np.flatnonzero(hits).astype(np.uint32)
+
+    def find_all(self, paths):
+        """
+        Returns ``{path: [entry ids]}`` for those of ``paths`` that are stored. Paths in the
+        same folder (e.g. an album) share one search of the blob for the folder.
+        """
+        by_folder = {}
+        for path in paths:
+            folder = path[:max(path.rfind("/"), path.rfind("\\")) + 1]
+            by_folder.setdefault(folder, set()).add(path)
+        found = {}
+        for folder, names in by_folder.items():
+            if len(names) == 1:
+                (path,) = names
+                entry_ids = self.find(path).tolist()
+                if entry_ids:
+                    found[path] = entry_ids
+                continue
+            for entry_id in self.find(folder, prefix=True).tolist():
+                path = self.get(entry_id)
+                if path in names:
+                    found.setdefault(path, []).append(entry_id)
+        return found
+
+    def nbytes(self):
+        return (len(self._blob) + self._starts.itemsize * len(self._starts)
+                + self._lengths.itemsize * len(self._lengths))
+
+    def buffers(self):
+        """Returns the ``(blob, starts, lengths)`` backing the store (not copies)."""
+        return self._blob, self._starts, self._lengths
+
+    @classmethod
+    def from_buffers(cls, blob, starts, lengths):
+        """Creates a store that takes over a ``bytearray`` and ``array('Q')``/``array('I')`` like ``buffers()``."""
+        store = cls()
+        store._blob, store._starts, store._lengths = blob, starts, lengths
+        return store
+
+
+class _ChunkedArray:
+    """
+    A list of unsigned ints stored as a sequence of ``array('I')`` chunks.
+
+    A Fenwick tree over the chunk sizes locates the chunk holding a position in
+    O(log n), so indexing, inserting and removing anywhere cost O(log n) plus a memmove
+    within one bounded chunk, instead of shifting the whole list.
+
+    With ``indexed``, the values must be unique and each value's chunk is tracked in
+    one more array, so ``index()`` costs O(log n) plus a scan of that chunk too.
+    """
+    CHUNK = 1024
+
+    def __init__(self, values=(), indexed=False):
+        values = array('I', values)
+        self._chunks = [values[i:i + self.CHUNK] for i in range(0, len(values), self.CHUNK)] or [array('I')]
+        self._serials = list(range(len(self._chunks)))  # Stable id of each chunk
+        self._next_serial = len(self._chunks)
+        self._len = len(values)
+        self._home = array('I') if indexed else None  # Value -> serial of the chunk holding it
+        if indexed:
+            for serial, chunk in zip(self._serials, self._chunks):
+                self._set_home(chunk, serial)
+        self._rebuild()
+
+    def _set_home(self, values, serial):
+        if self._home is None or not len(values):
+            return
+        top = max(values) + 1
+        if top > len(self._home):
+            self._home.frombytes(bytes(self._home.itemsize * (top - len(self._home))))
+        if len(values) == 1:
+            self._home[values[0]] = serial
+        else:
+            np.frombuffer(self._home, dtype=np.uint32)[np.frombuffer(values, dtype=np.uint32)] = serial
+
+    def _new_chunk(self, values):
+        """Returns the serial for a chunk about to be added with ``values``."""
+        serial = self._next_serial
+        self._next_serial += 1
+        self._set_home(values, serial)
+        return serial
+
+    def _rebuild(self):
+        count = len(self._chunks)
+        tree = [0] * (count + 1)
+        for i, chunk in enumerate(self._chunks, 1):
+            tree[i] += len(chunk)
+            parent = i + (i & -i)
+            if parent <= count:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << (count.bit_length() - 1) if count else 0
+        self._chunk_index = {serial: i for i, serial in enumerate(self._serials)}
+
+    def _add(self, chunk_index, delta):
+        i = chunk_index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _offset(self, chunk_index):
+        """Returns the number of values in the chunks before ``chunk_index``."""
+        total = 0
+        i = chunk_index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index):
+        """Returns ``(chunk index, offset in chunk)`` of a valid position."""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("index out of range")
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= index:
+                pos = nxt
+                index -= self._tree[nxt]
+            step >>= 1
+        return pos, index
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        chunk_index, offset = self._locate(index)
+        return self._chunks[chunk_index][offset]
+
+    def __setitem__(self, index, value):
+        chunk_index, offset = self._locate(index)
+        self._chunks[chunk_index][offset] = value
+        self._set_home(array('I', [value]), self._serials[chunk_index])
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def append(self, value):
+        self._chunks[-1].append(value)
+        self._set_home(array('I', [value]), self._serials[-1])
+        self._len += 1
+        self._add(len(self._chunks) - 1, 1)
+        self._split(len(self._chunks) - 1)
+
+    def extend(self, values):
+        values = array('I', values)
+        if not values:
+            return
+        last = self._chunks[-1]
+        room = max(0, self.CHUNK - len(last))
+        last.extend(values[:room])
+        self._set_home(values[:room], self._serials[-1])
+        for i in range(room, len(values), self.CHUNK):
+            chunk = values[i:i + self.CHUNK]
+            self._serials.append(self._new_chunk(chunk))
+            self._chunks.append(chunk)
+        self._len += len(values)
+        self._rebuild()
+
+    def insert(self, index, value):
+        if index < 0:
+            index = max(0, index + self._len)
+        if index >= self._len:
+            self.append(value)
+            return
+        chunk_index, offset = self._locate(index)
+        self._chunks[chunk_index].insert(offset, value)
+        self._set_home(array('I', [value]), self._serials[chunk_index])
+        self._len += 1
+        self._add(chunk_index, 1)
+        self._split(chunk_index)
+
+    def pop(self, index=-1):
+        chunk_index, offset = self._locate(index)
+        value = self._chunks[chunk_index].pop(offset)
+        self._len -= 1
+        if not self._chunks[chunk_index] and len(self._chunks) > 1:
+            del self._chunks[chunk_index]
+            del self._serials[chunk_index]
+            self._rebuild()
+        else:
+            self._add(chunk_index, -1)
+        return value
+
+    def _split(self, chunk_index):
+        chunk = self._chunks[chunk_index]
+        if len(chunk) > 2 * self.CHUNK:
+            tail = chunk[self.CHUNK:]
+            self._serials.insert(chunk_index + 1, self._new_chunk(tail))
+            self._chunks[chunk_index:chunk_index + 1] = [chunk[:self.CHUNK], tail]
+            self._rebuild()
+
+    def index(self, value):
+        """
+        Returns the first position holding ``value``: looked up through the value's chunk
+        when indexed, otherwise a vectorized linear scan.
+        """
+        if self._home is not None:
+            chunk_index = self._chunk_index.get(self._home[value]) if value < len(self._home) else None
+            if chunk_index is not None:
+                try:
+                    return self._offset(chunk_index) + self._chunks[chunk_index].index(value)
+                except ValueError:
+                    pass  # Removed since; its chunk is still recorded
+            raise ValueError(f"{value} is not in the array")
+        base = 0
+        for chunk in self._chunks:
+            hits = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint32) == value)
+            if len(hits):
+                return base + int(hits[0])
+            base += len(chunk)
+        raise ValueError(f"{value} is not in the array")
+
+    def to_array(self):
+        """Returns the values as one ``array('I')``."""
+        values = array('I')
+        for chunk in self._chunks:
+            values.extend(chunk)
+        return values
+
+    def nbytes(self):
+        home = self._home.itemsize * len(self._home) if self._home is not None else 0
+        return home + sum(chunk.itemsize * len(chunk) for chunk in self._chunks)
+
+
+class Playlist:
+    """
+    Compact playlist with shuffle and an "up next" queue.
+
+    Indexing, ``len()`` and iteration follow the active play order: the playlist order,
+    or the shuffle order while shuffle is enabled. Paths live in an array-backed store
+    and both orders are arrays of entry ids, so large playlists cost a few bytes per
+    entry beyond the path text.
+
+    Every change bumps ``revision``; the most recent ones are also logged as row edits
+    of the active order (see ``changes_since``), so views can follow small edits
+    without reloading.
+    """
+    CHANGE_LOG = 64
+
+    def __init__(self, paths=()):
+        self._store = _PathStore()
+        self._order = _ChunkedArray(indexed=True)
+        self._shuffled = None  # Permutation of entry ids while shuffle is enabled
+        self._queue = deque()  # Entry ids to play next, in order
+        self.revision = 0      # Bumped by every change, e.g. to know when to save the session
+        self._changes = deque()  # (revision, kind, position, count), oldest first
+        self._log_floor = 0      # Changes of revisions after this one are all in the log
+        self._duplicates = None  # Path -> duplicate group while skipping duplicates
+        self._kept = {}          # Duplicate group -> the entry id kept for it
+        self.duplicates_skipped = 0
+        self.extend(paths)
+
+    # --- Sequence protocol (active order) ---
+
+    def _active(self):
+        return self._shuffled if self._shuffled is not None else self._order
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, index):
+        return self._store.get(self._active()[index])
+
+    def __iter__(self):
+        for entry_id in self._active():
+            yield self._store.get(entry_id)
+
+    def _changed(self, *edits):
+        """
+        Bumps ``revision`` and logs ``edits`` of the active order, each a ``(kind,
+        position, count)`` with kind "insert", "remove", "update" or "reset"; changes
+        that leave the order as it is (e.g. the queue) log none. Positions refer to the
+        order as left by the edits before.
+        """
+        self.revision += 1
+        for kind, position, count in edits:
+            if len(self._changes) == self.CHANGE_LOG:
+                self._log_floor = self._changes.popleft()[0]
+            self._changes.append((self.revision, kind, position, count))
+
+    def changes_since(self, revision):
+        """
+        Returns the ``(kind, position, count)`` edits made after ``revision``, oldest
+        first, or None if they aren't all logged any more or include a "reset".
+        """
+        if revision < self._log_floor:
+            return None
+        edits = [change[1:] for change in self._changes if change[0] > revision]
+        if any(kind == "reset" for kind, _, _ in edits):
+            return None
+        return edits
+
+    def index(self, path):
+        """Returns the position of ``path`` in the active order."""
+        for position, candidate in enumerate(self):
+            if candidate == path:
+                return position
+        raise ValueError(f"{path!r} is not in the playlist")
+
+    # --- Editing ---
+
+    def append(self, path):
+        self.insert(len(self), path)
+
+    def extend(self, paths):
+        if self._duplicates is not None:
+            entry_ids = self._add_unique(paths)
+        else:
+            entry_ids = [self._store.add(path) for path in paths]
+        if not entry_ids:
+            return
+        self._order.extend(entry_ids)
+        if self._shuffled is None:
+            self._changed(("insert", len(self._order) - len(entry_ids), len(entry_ids)))
+            return
+        # New entries are spread randomly over the rest of the shuffle order; the first
+        # slot is the current entry's, unless the playlist was empty
+        edits = []
+        for entry_id in entry_ids:
+            position = random.randint(1 if self._shuffled else 0, len(self._shuffled))
+            self._shuffled.insert(position, entry_id)
+            edits.append(("insert", position, 1))
+        self._changed(*edits if len(edits) <= self.CHANGE_LOG else [("reset", 0, 0)])
+
+    def insert(self, index, path):
+        """Inserts ``path`` at ``index`` of the active order."""
+        entry_id = self._store.add(path)
+        position = min(max(0, index + len(self) if index < 0 else index), len(self))
+        if self._shuffled is None:
+            self._order.insert(position, entry_id)
+        else:
+            self._shuffled.insert(position, entry_id)
+            self._order.append(entry_id)
+        self._changed(("insert", position, 1))
+
+    def pop(self, index):
+        """Removes the entry at ``index`` of the active order and returns its path."""
+        position = index + len(self) if index < 0 else index
+        entry_id = self._active().pop(index)
+        self._changed(("remove", position, 1))
+        if self._shuffled is not None:
+            self._order.pop(self._order.index(entry_id))
+        try:
+            self._queue.remove(entry_id)
+        except ValueError:
+            pass
+        if self._kept:
+            self._forget_kept({entry_id})
+        return self._store.get(entry_id)
+
+    def replace(self, index, path):
+        """Changes the path of the entry at ``index`` in place, keeping its position."""
+        self._store.replace(self._active()[index], path)
+        self._changed(("update", index + len(self) if index < 0 else index, 1))
+
+    # --- Files changing on disk (see core.watcher) ---
+
+    def rename(self, moves, prefix=False):
+        """
+        Points the entries of each ``(old, new)`` pair to ``new`` (with ``prefix``, the
+        entries below folder prefix ``old`` to the same path below ``new``), keeping their
+        positions. Every pair is looked up before any entry changes, so swaps and chains
+        of renames resolve correctly. Returns how many entries changed.
+        """
+        if prefix:
+            found = [(old, new, self._store.find(old, prefix=True).tolist()) for old, new in moves]
+        else:
+            entry_ids = self._store.find_all([old for old, _ in moves])
+            found = [(old, new, entry_ids.get(old, ())) for old, new in moves]
+        changed = 0
+        for old, new, entry_ids in found:
+            for entry_id in entry_ids:
+                self._store.replace(entry_id, new + self._store.get(entry_id)[len(old):])
+            changed += len(entry_ids)
+        if changed:
+            self._changed(("update", 0, len(self)))
+        return changed
+
+    def remove_paths(self, paths, prefixes=()):
+        """
+        Removes every entry of ``paths`` and below the folder ``prefixes`` in one pass over
+        the orders. Returns the positions they had in the active order, ascending.
+        """
+        found = [np.array(ids, dtype=np.uint32) for ids in self._store.find_all(paths).values()]
+        found += [self._store.find(prefix, prefix=True) for prefix in prefixes]
+        return self._remove_ids(np.concatenate(found) if found else np.empty(0, dtype=np.uint32))
+
+    def _remove_ids(self, entry_ids):
+        """Removes the entries ``entry_ids`` (a uint32 array); returns their active positions, ascending."""
+        if not len(entry_ids):
+            return []
+        active = np.frombuffer(self._active().to_array(), dtype=np.uint32)
+        removed = np.isin(active, entry_ids)
+        positions = np.flatnonzero(removed)
+        if not len(positions):
+            return []
+
+        kept = _ChunkedArray(active[~removed].tobytes(), indexed=True)
+        if self._shuffled is None:
+            self._order = kept
+        else:
+            self._shuffled = kept
+            order = np.frombuffer(self._order.to_array(), dtype=np.uint32)
+            self._order = _ChunkedArray(order[~np.isin(order, entry_ids)].tobytes(), indexed=True)
+        gone = set(entry_ids.tolist())
+        self._queue = deque(entry_id for entry_id in self._queue if entry_id not in gone)
+        if self._kept:
+            self._forget_kept(gone)
+        # Runs of removed positions, last first so the earlier positions stay valid
+        firsts = np.concatenate(([0], np.flatnonzero(np.diff(positions) != 1) + 1))
+        if len(firsts) <= self.CHANGE_LOG:
+            counts = np.diff(np.append(firsts, len(positions)))
+            self._changed(*(("remove", int(positions[first]), int(count))
+                            for first, count in zip(firsts[::-1], counts[::-1])))
+        else:
+            self._changed(("reset", 0, 0))
+        return positions.tolist()
+
+    # --- Duplicates (see core.dedupe) ---
+
+    def skip_duplicates(self, duplicates):
+        """
+        Keeps one entry per group of known duplicates. ``duplicates`` maps paths to a
+        group (see core.dedupe.group_keys): every entry but the first of each group, in
+        playlist order, is removed, and ``extend`` skips further members of a group that
+        is already in the playlist. None turns skipping off again. Returns the positions
+        the removed entries had in the active order, ascending.
+        """
+        self._kept = {}
+        if not duplicates:
+            self._duplicates = None
+            return []
+        self._duplicates = duplicates
+        # Compared as encoded bytes against the store's blob, so no entry is decoded
+        encoded = {path.encode('utf-8', 'surrogateescape'): group for path, group in duplicates.items()}
+        blob, starts, lengths = self._store.buffers()
+        blob = bytes(blob)
+        redundant = array('I')
+        for entry_id in self._order:
+            start = starts[entry_id]
+            group = encoded.get(blob[start:start + lengths[entry_id]])
+            if group is None:
+                continue
+            if group in self._kept:
+                redundant.append(entry_id)
+            else:
+                self._kept[group] = entry_id
+        self.duplicates_skipped += len(redundant)
+        return self._remove_ids(np.frombuffer(redundant, dtype=np.uint32))
+
+    def _add_unique(self, paths):
+        """Stores the paths that aren't a duplicate of an entry kept already; returns their entry ids."""
+        entry_ids = []
+        for path in paths:
+            group = self._duplicates.get(path)
+            if group is not None and group in self._kept:
+                self.duplicates_skipped += 1
+                continue
+            entry_id = self._store.add(path)
+            if group is not None:
+                self._kept[group] = entry_id
+            entry_ids.append(entry_id)
+        return entry_ids
+
+    def _forget_kept(self, entry_ids):
+        """Lets a group in again once the entry kept for it was removed."""
+        for group, entry_id in list(self._kept.items()):
+            if entry_id in entry_ids:
+                del self._kept[group]
+
+    # --- Shuffle ---
+
+    @property
+    def shuffle(self):
+        return self._shuffled is not None
+
+    def set_shuffle(self, enabled, current_index=None):
+        """
+        Enables or disables shuffle. The shuffle order is one random permutation of the
+        entries, so stepping through it is as cheap as stepping through the playlist.
+        Returns the position of the entry at ``current_index`` in the new active order;
+        when enabling, that entry is moved to the front of the shuffle order.
+        """
+        current_id = self._active()[current_index] if current_index is not None and len(self) else None
+        self._changed(("reset", 0, 0))
+        if enabled:
+            permutation = array('I', self._order)
+            random.shuffle(permutation)
+            if current_id is not None:
+                position = permutation.index(current_id)
+                permutation[0], permutation[position] = permutation[position], permutation[0]
+            self._shuffled = _ChunkedArray(permutation, indexed=True)
+        else:
+            self._shuffled = None
+        if current_id is None:
+            return current_index
+        return self._active().index(current_id)
+
+    # --- Up next queue ---
+
+    def enqueue(self, index):
+        """Queues the entry at ``index`` of the active order to be played next."""
+        self._queue.append(self._active()[index])
+        self._changed()
+
+    def pop_queued(self):
+        """Removes the first queued entry and returns its position in the active order, or None."""
+        while self._queue:
+            entry_id = self._queue.popleft()
+            self._changed()
+            try:
+                return self._active().index(entry_id)
+            except ValueError:
+                continue
+        return None
+
+    def peek_queued(self):
+        """Returns the position of the first queued entry in the active order without removing it, or None."""
+        for entry_id in self._queue:
+            try:
+                return self._active().index(entry_id)
+            except ValueError:
+                continue
+        return None
+
+    @property
+    def queue(self):
+        """Paths waiting in the "up next" queue."""
+        return [self._store.get(entry_id) for entry_id in self._queue]
+
+    def clear_queue(self):
+        self._queue.clear()
+        self._changed()
+
+    # --- Snapshots (see core.session) ---
+
+    def to_arrays(self):
+        """
+        Returns the playlist as flat buffers: the path store's ``blob``, ``starts`` and
+        ``lengths``, and the ``order``, ``shuffled`` (or None) and ``queue`` entry ids.
+        The path buffers are the live ones, not copies.
+        """
+        blob, starts, lengths = self._store.buffers()
+        return {
+            "blob": blob,
+            "starts": starts,
+            "lengths": lengths,
+            "order": self._order.to_array(),
+            "shuffled": self._shuffled.to_array() if self._shuffled is not None else None,
+            "queue": array('I', self._queue),
+        }
+
+    @classmethod
+    def from_arrays(cls, blob, starts, lengths, order, shuffled=None, queue=()):
+        """Recreates a playlist from buffers like those of ``to_arrays()``, without decoding any path."""
+        playlist = cls()
+        playlist._store = _PathStore.from_buffers(blob, starts, lengths)
+        playlist._order = _ChunkedArray(order, indexed=True)
+        playlist._shuffled = _ChunkedArray(shuffled, indexed=True) if shuffled is not None else None
+        playlist._queue = deque(queue)
+        return playlist
+
+    def nbytes(self):
+        """Approximate memory used by the playlist's arrays, in bytes."""
+        shuffled = self._shuffled.nbytes() if self._shuffled is not None else 0
+        return self._store.nbytes() + self._order.nbytes() + shuffled
@@ -0,0 +1,205 @@
+import mmap
+import os
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+from PySide6.QtCore import QObject, Signal
+
+PLAYLIST_EXTENSIONS = {'.m3u', '.m3u8', '.pls', '.xspf'}
+
+CHUNK_SIZE = 1 << 20
+# The first block is small so the first entries are available almost immediately
+FIRST_CHUNK_SIZE = 64 << 10
+
+
+def is_playlist(path):
+    return os.path.splitext(path)[1].lower() in PLAYLIST_EXTENSIONS
+
+
+def resolve_entry(entry, base_dir):
+    """
+    Turns a playlist entry into something ``vlc.Instance.media_new`` accepts: file URLs
+    and relative paths become absolute paths, other URLs (streams) are kept as they are.
+    """
+    if entry.startswith('file://'):
+        path = url2pathname(unquote(urlparse(entry).path))
+    elif '://' in entry:
+        return entry
+    else:
+        path = os.path.expanduser(entry)
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    return os.path.normpath(path)
+
+
+def _iter_line_blocks(path, chunk_size=CHUNK_SIZE):
+    """
+    Yields ``(lines, offset)`` for a text file, ``lines`` being the raw lines of one
+    block and ``offset`` the number of bytes consumed so far. Local files are memory
+    mapped; anything that can't be mapped is read in chunks.
+    """
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            mapped = None
+
+        if mapped is not None and hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+        offset = 0
+        carry = b''
+        try:
+            while True:
+                size = min(chunk_size, FIRST_CHUNK_SIZE) if offset == 0 else chunk_size
+                block = mapped[offset:offset + size] if mapped is not None else f.read(size)
+                if not block:
+                    break
+                offset += len(block)
+                lines = (carry + block).split(b'\n')
+                carry = lines.pop()
+                yield lines, offset
+            if carry:
+                yield [carry], offset
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+
+def _decode(line, encoding):
+    line = line.rstrip(b'\r')
+    if encoding == 'utf-8':
+        return line.decode('utf-8', 'replace')
+    # Plain .m3u has no defined encoding: prefer UTF-8, fall back to Windows-1252
+    try:
+        return line.decode('utf-8')
+    except UnicodeDecodeError:
+        return line.decode('cp1252', 'replace')
+
+
+def _iter_m3u(path, base_dir, encoding):
+    first = True
+    for lines, offset in _iter_line_blocks(path):
+        entries = []
+        for raw in lines:
+            line = _decode(raw, encoding).strip()
+            if first:
+                line = line.lstrip('\ufeff')
+                first = False
+            if line and not line.startswith('#'):
+                entries.append(resolve_entry(line, base_dir))
+        yield entries, offset
+
+
+def _iter_pls(path, base_dir):
+    for lines, offset in _iter_line_blocks(path):
+        entries = []
+        for raw in lines:
+            line = _decode(raw, None).strip().lstrip('\ufeff')
+            key, sep, value = line.partition('=')
+            if sep and key.lower().startswith('file') and value:
+                entries.append(resolve_entry(value.strip(), base_dir))
+        yield entries, offset
+
+
+def _iter_xspf(path, base_dir, batch_size=1000):
+    with open(path, 'rb') as f:
+        entries = []
+        for _, element in ElementTree.iterparse(f, events=('end',)):
+            tag = element.tag.rsplit('}', 1)[-1]
+            if tag == 'location' and element.text:
+                entries.append(resolve_entry(element.text.strip(), base_dir))
+            elif tag == 'track':
+                # Drop parsed tracks so memory stays flat on huge files
+                element.clear()
+            if len(entries) >= batch_size:
+                yield entries, f.tell()
+                entries = []
+        yield entries, f.tell()
+
+
+def iter_playlist(path):
+    """
+    Streams the entries of an M3U/M3U8/PLS/XSPF playlist. Yields ``(entries, offset)``
+    batches, ``offset`` being how many bytes of the file have been consumed.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.pls':
+        return _iter_pls(path, base_dir)
+    if ext == '.xspf':
+        return _iter_xspf(path, base_dir)
+    return _iter_m3u(path, base_dir, 'utf-8' if ext == '.m3u8' else None)
+
+
+def read_playlist(path):
+    """Returns all entries of a playlist file as a list."""
+    return [entry for entries, _ in iter_playlist(path) for entry in entries]
+
+
+class PlaylistLoader(QObject):
+    """
+    Loads a playlist file on a background thread and hands its entries over in batches,
+    so playback can start with the first entry while the rest is still being read.
+    """
+    entries_loaded = Signal(list)
+    progress = Signal(int, int)  # bytes read, total bytes
+    finished = Signal(dict)      # entries, bytes, seconds, entries_per_second, mb_per_second
+
+    FIRST_BATCH = 1
+    BATCH_SIZE = 5000
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="playlist-loader", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            total = os.path.getsize(self.path)
+        except OSError:
+            total = 0
+        count = 0
+        offset = 0
+        pending = []
+
+        try:
+            for entries, offset in iter_playlist(self.path):
+                if self._cancelled.is_set():
+                    break
+                pending.extend(entries)
+                # The first entry goes out on its own so playback can start right away
+                limit = self.FIRST_BATCH if count == 0 else self.BATCH_SIZE
+                while len(pending) >= limit:
+                    batch, pending = pending[:limit], pending[limit:]
+                    count += len(batch)
+                    self.entries_loaded.emit(batch)
+                    limit = self.BATCH_SIZE
+                self.progress.emit(offset, total)
+            if pending and not self._cancelled.is_set():
+                count += len(pending)
+                self.entries_loaded.emit(pending)
+        except (OSError, ElementTree.ParseError) as e:
+            print(f"Error loading playlist {self.path}: {e}")
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.progress.emit(offset, total)
+        self.finished.emit({
+            "entries": count,
+            "bytes": offset,
+            "seconds": elapsed,
+            "entries_per_second": count / elapsed,
+            "mb_per_second": offset / elapsed / 1e6,
+        })
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class PositionClock(QObject):
+    """
+    Coalesces libVLC's time and length events into position updates at a bounded rate.
+
+    The player feeds VLC's time and length values in as they arrive through
+    core.event_bridge; the clock's QTimer then emits ``position_changed`` at most
+    ``max_rate`` times per second while playing, interpolating between VLC's ticks. The
+    timer runs on the thread the clock lives in, i.e. that of its parent (the GUI thread
+    when the Player owns it). The duration is cached per media instead of being queried
+    on every update. ``position()`` may be called from any thread (e.g. by
+    core.decks), so the state is kept under a lock.
+    """
+    position_changed = Signal(int, int)
+    _running_changed = Signal(bool)
+    _wake = Signal()
+
+    # Never extrapolate further than this past VLC's last reported time (e.g. while buffering)
+    MAX_INTERPOLATION_MS = 1000
+    # Backward jumps smaller than this are tick jitter, not seeks
+    SEEK_THRESHOLD_MS = 250
+
+    def __init__(self, max_rate=10, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._time = 0
+        self._length = 0
+        self._tick_at = None
+        self._playing = False
+        self._last_emitted = None
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._emit_position)
+        self.set_max_rate(max_rate)
+
+        self._running_changed.connect(self._on_running_changed)
+        self._wake.connect(self._emit_position)
+
+    def set_max_rate(self, max_rate):
+        """Sets the maximum number of position updates per second."""
+        self._timer.setInterval(max(1, int(1000 / max_rate)))
+
+    # --- Fed on the GUI thread (VLC's events arrive through core.event_bridge) ---
+
+    def reset(self):
+        """Forgets the cached time and duration, e.g. when new media is loaded."""
+        with self._lock:
+            self._time = 0
+            self._length = 0
+            self._tick_at = None
+            self._last_emitted = None
+
+    def update_time(self, time_ms, at=None):
+        """Sets the time reported by VLC; ``at`` is the ``time.monotonic()`` of the report if it was delayed."""
+        with self._lock:
+            self._time = time_ms
+            self._tick_at = time.monotonic() if at is None else at
+            playing = self._playing
+        if not playing:
+            # No timer is running, so a seek while paused has to be shown explicitly
+            self._wake.emit()
+
+    def update_length(self, length_ms):
+        with self._lock:
+            changed = length_ms != self._length
+            self._length = length_ms
+        if changed:
+            self._wake.emit()
+
+    def set_playing(self, playing):
+        with self._lock:
+            if self._playing == playing:
+                return
+            if not playing:
+                # Freeze the interpolated time so the display doesn't jump back on pause
+                self._time = self._position_locked()
+            self._tick_at = time.monotonic()
+            self._playing = playing
+        self._running_changed.emit(playing)
+
+    # --- Timer (the clock's own thread, normally the GUI thread) ---
+
+    def _position_locked(self):
+        position = self._time
+        if self._playing and self._tick_at is not None:
+            elapsed_ms = (time.monotonic() - self._tick_at) * 1000
+            position += int(min(elapsed_ms, self.MAX_INTERPOLATION_MS))
+        if self._length > 0:
+            position = min(position, self._length)
+        return position
+
+    def position(self):
+        """Returns the current (interpolated) position and the cached duration in milliseconds."""
+        with self._lock:
+            return self._position_locked(), self._length
+
+    def _on_running_changed(self, running):
+        if running:
+            self._timer.start()
+        else:
+            self._timer.stop()
+            self._emit_position()
+
+    def _emit_position(self):
+        with self._lock:
+            position = self._position_locked()
+            length = self._length
+            last = self._last_emitted
+            if length <= 0:  # Avoid division by zero downstream
+                return
+            if last is not None and last[1] == length and last[0] - self.SEEK_THRESHOLD_MS < position < last[0]:
+                # Interpolation ran slightly ahead of VLC's next tick; don't step backwards
+                position = last[0]
+            if (position, length) == last:
+                return
+            self._last_emitted = (position, length)
+        self.position_changed.emit(position, length)
@@ -0,0 +1,190 @@
+"""
+Read-ahead for the tracks about to be played.
+
+On network mounts and spinning disks the first read of a cold file can stall for
+hundreds of milliseconds, right when libVLC starts a track. ``ReadAhead`` pulls the
+upcoming tracks into the page cache on a background thread, so the stall happens
+while the current track is still playing.
+
+Each track is hinted to the kernel with ``posix_fadvise(POSIX_FADV_WILLNEED)`` (which
+starts the same asynchronous read-ahead as ``readahead(2)``) up to ``track_bytes``,
+and its first ``head_bytes`` are read in chunks, because network filesystems may
+ignore the hint and the head is what starting playback needs. Reads are paced to
+``bandwidth`` bytes/s, the tracks warmed at a time stay within ``memory_budget``, and
+everything pauses while the current track is still buffering.
+"""
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+
+MiB = 1024 * 1024
+
+
+class ReadAhead:
+    """
+    Warms the page cache for ``warm(paths)``, nearest first, on a background thread.
+    ``set_busy`` pauses it (e.g. while the current track buffers) for at most
+    ``max_backoff_s``. Start latencies recorded with ``record_start`` are split by
+    whether the track had been warmed.
+    """
+
+    def __init__(self, head_bytes=4 * MiB, track_bytes=16 * MiB, memory_budget=64 * MiB,
+                 bandwidth=16 * MiB, chunk_bytes=256 * 1024, max_backoff_s=5.0):
+        self.head_bytes = head_bytes
+        self.track_bytes = track_bytes
+        self.memory_budget = memory_budget
+        self.bandwidth = bandwidth
+        self.chunk_bytes = chunk_bytes
+        self.max_backoff_s = max_backoff_s
+        self._cond = threading.Condition()
+        self._wanted = []              # paths to warm, nearest first
+        self._warmed = OrderedDict()   # path -> bytes warmed (complete ones only)
+        self._failed = set()           # wanted paths that couldn't be read
+        self._busy_until = 0.0
+        self._closed = False
+        self._latencies = {True: deque(maxlen=100), False: deque(maxlen=100)}
+        self._stats = {"tracks": 0, "bytes_read": 0, "bytes_advised": 0, "aborted": 0, "over_budget": 0,
+                       "errors": 0, "backoffs": 0, "backoff_s": 0.0, "read_s": 0.0}
+        self._thread = threading.Thread(target=self._run, name="readahead", daemon=True)
+        self._thread.start()
+
+    # --- Control ---
+
+    def warm(self, paths):
+        """Sets the tracks to keep warm, nearest first; others are no longer accounted for."""
+        paths = list(dict.fromkeys(paths))
+        with self._cond:
+            self._wanted = paths
+            for path in list(self._warmed):
+                if path not in paths:
+                    del self._warmed[path]
+            self._failed.intersection_update(paths)
+            self._cond.notify()
+
+    def set_busy(self, busy):
+        """Pauses reading while something more urgent (the current track) uses the storage."""
+        with self._cond:
+            if busy:
+                if self._busy_until <= time.monotonic():
+                    self._stats["backoffs"] += 1
+                self._busy_until = time.monotonic() + self.max_backoff_s
+            else:
+                self._busy_until = 0.0
+                self._cond.notify()
+
+    def is_warm(self, path):
+        with self._cond:
+            return path in self._warmed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    # --- Worker ---
+
+    def _next_path(self):
+        """Returns the nearest wanted track that isn't warm yet and fits the budget, or None."""
+        used = sum(self._warmed.values())
+        for path in self._wanted:
+            if path in self._warmed or path in self._failed:
+                continue
+            if used + self.head_bytes > self.memory_budget:
+                self._stats["over_budget"] += 1
+                return None
+            return path
+        return None
+
+    def _wait_idle(self):
+        """Waits out a backoff. Returns False once closed."""
+        while not self._closed:
+            remaining = self._busy_until - time.monotonic()
+            if remaining <= 0:
+                return True
+            started = time.monotonic()
+            self._cond.wait(remaining)
+            self._stats["backoff_s"] += time.monotonic() - started
+        return False
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._wait_idle():
+                    return
+                path = self._next_path()
+                if path is None:
+                    self._cond.wait()
+                    continue
+                budget = self.memory_budget - sum(self._warmed.values())
+            warmed = self._warm_file(path, budget)
+            with self._cond:
+                if path not in self._wanted:
+                    continue
+                if warmed is not None:
+                    self._warmed[path] = warmed
+                    self._stats["tracks"] += 1
+                else:
+                    self._failed.add(path)  # Not retried until it is wanted again
+
+    def _still_wanted(self, path):
+        with self._cond:
+            return self._wait_idle() and path in self._wanted
+
+    def _warm_file(self, path, budget):
+        """Advises and reads the start of ``path``. Returns the bytes warmed, or None if aborted."""
+        try:
+            f = open(path, "rb", buffering=0)
+        except OSError:
+            self._stats["errors"] += 1
+            return None
+        try:
+            size = os.fstat(f.fileno()).st_size
+            advised = min(size, self.track_bytes, budget)
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, advised, os.POSIX_FADV_WILLNEED)
+                self._stats["bytes_advised"] += advised
+
+            head = min(advised, self.head_bytes)
+            buffer = memoryview(bytearray(self.chunk_bytes))
+            offset = 0
+            while offset < head:
+                if not self._still_wanted(path):
+                    self._stats["aborted"] += 1
+                    return None
+                read_started = time.monotonic()
+                count = f.readinto(buffer[:min(self.chunk_bytes, head - offset)])
+                self._stats["read_s"] += time.monotonic() - read_started
+                if not count:
+                    break
+                offset += count
+                self._stats["bytes_read"] += count
+                # Paced to the bandwidth budget, so the current track's reads aren't crowded out
+                pause = count / self.bandwidth - (time.monotonic() - read_started)
+                if pause > 0:
+                    time.sleep(pause)
+            return max(offset, advised)
+        except OSError:
+            self._stats["errors"] += 1
+            return None
+        finally:
+            f.close()
+
+    # --- Measurements ---
+
+    def record_start(self, warm, latency_ms):
+        """Records how long a track took to start, and whether it had been warmed."""
+        self._latencies[bool(warm)].append(latency_ms)
+
+    def stats(self):
+        """Returns read and backoff counters, and the median/worst start latency of cold and warm tracks."""
+        with self._cond:
+            stats = dict(self._stats, warm=len(self._warmed), warmed_bytes=sum(self._warmed.values()))
+        for warm, name in ((False, "cold_start_ms"), (True, "warm_start_ms")):
+            latencies = sorted(self._latencies[warm])
+            if latencies:
+                stats[name] = {"median": statistics.median(latencies), "worst": latencies[-1],
+                               "samples": len(latencies)}
+        return stats
@@ -0,0 +1,186 @@
+"""
+Instant search over track metadata.
+
+Titles, artists, albums and file names are normalized (case-folded, accents stripped,
+punctuation removed) and split into trigrams; every trigram has a posting list of the
+documents containing it, stored as a typed ``array`` so the index costs a few bytes per
+trigram occurrence. Words are padded with two leading spaces, so the first trigrams of
+a word double as a prefix index and a single typed letter already finds matches.
+
+A query counts, per document, how many of its trigrams match and keeps documents
+sharing enough of them (which tolerates typos). Only the shortest posting lists are
+scanned; the longer ones are binary-searched for those candidates. The query then
+ranks the best candidates by how well they match: whole words and prefixes, in which
+field, and the length of the text.
+"""
+import functools
+import heapq
+import math
+import unicodedata
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+from core.playlist import _PathStore
+
+# Share of the query's trigrams a document needs to be a candidate
+MIN_SIMILARITY = 0.5
+# Candidates that are ranked exactly (by trigram count first)
+RERANK_LIMIT = 256
+
+# Relative weight of a match in each field
+FIELD_WEIGHTS = (1.0, 0.8, 0.6, 0.3)  # title, artist, album, file name
+_SEPARATOR = "\x1f"
+
+
+# Letters without a Unicode decomposition to their usual ASCII spelling
+_FOLD = str.maketrans({"æ": "ae", "œ": "oe", "ø": "o", "ð": "d", "þ": "th", "đ": "d", "ł": "l", "ı": "i"})
+# Punctuation to spaces for the common all-ASCII case
+_ASCII_SPACES = str.maketrans({chr(c): " " for c in range(128) if not chr(c).isalnum()})
+
+
+@functools.lru_cache(maxsize=8192)  # Artists and albums repeat across many tracks
+def normalize(text):
+    """Case-folds ``text``, strips accents and replaces punctuation with single spaces."""
+    if not text:
+        return ""
+    if text.isascii():
+        return " ".join(text.lower().translate(_ASCII_SPACES).split())
+    decomposed = unicodedata.normalize("NFKD", text.casefold().translate(_FOLD))
+    kept = [c if c.isalnum() else " " for c in decomposed if not unicodedata.combining(c)]
+    return " ".join("".join(kept).split())
+
+
+def trigrams(text, partial_last=False):
+    """
+    Returns the set of trigrams of normalized ``text``. Each word is padded with two
+    leading spaces and one trailing space; with ``partial_last`` the last word (still
+    being typed) gets no trailing space, so it matches as a prefix.
+    """
+    if not text:
+        return set()
+    # "  w1  w2 " yields every padded word's trigrams plus one "x  " per word boundary,
+    # which no other text can contain and is dropped again
+    padded = "  " + text.replace(" ", "  ") + ("" if partial_last else " ")
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    for word in text.split(" ")[:-1]:
+        grams.discard(word[-1] + "  ")
+    return grams
+
+
+def _file_name(path):
+    name = path.replace("\\", "/").rsplit("/", 1)[-1]
+    return name.rsplit(".", 1)[0] if "." in name else name
+
+
+class SearchIndex:
+    """
+    An in-memory trigram index. Documents are only ever appended (``add``) or marked as
+    removed (``remove``), so posting lists stay sorted by document id without re-sorting.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(functools.partial(array, 'I'))  # trigram -> document ids
+        self._keys = _PathStore()     # document id -> key (usually the track path)
+        self._texts = _PathStore()    # document id -> normalized fields joined by _SEPARATOR
+        self._removed = bytearray()   # document id -> 1 if removed
+        self._live = 0
+
+    def __len__(self):
+        return self._live
+
+    def add(self, key, title=None, artist=None, album=None, path=None):
+        """Indexes a track and returns its document id. ``path`` defaults to ``key``."""
+        path = key if path is None else path
+        fields = [normalize(title), normalize(artist), normalize(album), normalize(_file_name(path))]
+        doc_id = self._keys.add(key)
+        self._texts.add(_SEPARATOR.join(fields))
+        self._removed.append(0)
+        self._live += 1
+        postings = self._postings
+        for gram in trigrams(" ".join(filter(None, fields))):
+            postings[gram].append(doc_id)
+        return doc_id
+
+    def add_many(self, rows):
+        """Indexes ``(key, title, artist, album)`` rows, e.g. from ``Library.rows``."""
+        for key, title, artist, album in rows:
+            self.add(key, title, artist, album)
+
+    def remove(self, doc_id):
+        """Excludes a document from results (its postings stay until the index is rebuilt)."""
+        if not self._removed[doc_id]:
+            self._removed[doc_id] = 1
+            self._live -= 1
+
+    def key(self, doc_id):
+        return self._keys.get(doc_id)
+
+    def search(self, query, limit=50, min_similarity=MIN_SIMILARITY):
+        """
+        Returns up to ``limit`` ``(key, score)`` pairs for ``query``, best first. The
+        last word of the query is matched as a prefix.
+        """
+        text = normalize(query)
+        grams = trigrams(text, partial_last=True)
+        needed = max(1, math.ceil(len(grams) * min_similarity))
+        lists = sorted((self._postings[gram] for gram in grams if gram in self._postings), key=len)
+        if len(lists) < needed:
+            return []
+
+        # A document with ``needed`` hits is in at least one of the shortest
+        # ``len(lists) - needed + 1`` lists; only those are scanned in full
+        seeds = len(lists) - needed + 1
+        ids = np.concatenate([np.frombuffer(p, dtype=np.uint32) for p in lists[:seeds]])
+        candidates, hits = np.unique(ids, return_counts=True)
+        for postings in lists[seeds:]:
+            # Longer lists are only probed for the candidates (posting lists are sorted)
+            postings = np.frombuffer(postings, dtype=np.uint32)
+            found = np.searchsorted(postings, candidates)
+            found[found == len(postings)] = 0
+            hits += postings[found] == candidates
+        removed = np.frombuffer(self._removed, dtype=np.uint8)
+        keep = (hits >= needed) & (removed[candidates] == 0)
+        candidates, hits = candidates[keep], hits[keep]
+        if len(candidates) > RERANK_LIMIT:
+            best = np.argpartition(hits, -RERANK_LIMIT)[-RERANK_LIMIT:]
+            candidates, hits = candidates[best], hits[best]
+
+        words = text.split()
+        scored = ((self._score(doc_id, words, count / len(grams)), doc_id)
+                  for doc_id, count in zip(candidates.tolist(), hits.tolist()))
+        return [(self._keys.get(doc_id), score) for score, doc_id in heapq.nlargest(limit, scored)]
+
+    def _score(self, doc_id, words, similarity):
+        fields = self._texts.get(doc_id).split(_SEPARATOR)
+        score = similarity
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            best = 0.0
+            for weight, field in zip(FIELD_WEIGHTS, fields):
+                field_words = field.split()
+                if word in field_words:
+                    best = max(best, weight)
+                elif last and any(w.startswith(word) for w in field_words):
+                    best = max(best, 0.8 * weight)
+                elif word in field:
+                    best = max(best, 0.4 * weight)
+            score += best
+        # Among equal matches, shorter titles are more specific
+        return score / len(words) - 0.001 * len(fields[0])
+
+    def nbytes(self):
+        """Approximate memory used by the posting lists and stored texts, in bytes."""
+        postings = sum(p.itemsize * len(p) for p in self._postings.values())
+        return postings + self._keys.nbytes() + self._texts.nbytes() + len(self._removed)
+
+    def stats(self):
+        sizes = [len(p) for p in self._postings.values()]
+        return {
+            "documents": self._live,
+            "trigrams": len(sizes),
+            "postings": sum(sizes),
+            "longest_posting": max(sizes, default=0),
+            "nbytes": self.nbytes(),
+        }
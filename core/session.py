@@ -0,0 +1,278 @@
+"""
+Saving and resuming the playback session.
+
+The playlist (with its shuffle order and "up next" queue), the current track, the
+position, volume and mute state are saved periodically to a binary snapshot. The
+playlist goes in as the raw buffers behind ``Playlist`` (see ``Playlist.to_arrays``),
+so neither saving nor loading touches paths one by one: loading memory-maps the file
+and copies each section into its array in one go.
+
+Snapshots are written to a temporary file and renamed over the old one. When only the
+position moved since the last snapshot, just the position is written, in place, to a
+small delta file tagged with the snapshot's generation; a delta belonging to another
+snapshot (or torn by a crash) is ignored.
+
+Snapshot layout (little endian): a header, then the path store's ``starts`` (u64) and
+``lengths`` (u32), the ``order``, ``shuffled`` and ``queue`` entry ids (u32), and the
+UTF-8 path blob.
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, QTimer
+
+from core.paths import user_data_dir
+from core.playlist import Playlist
+
+_MAGIC = b"LPSN"
+_VERSION = 1
+# magic, version, flags, generation, saved at, current index, position, volume,
+# muted, playing, entries, blob bytes, order, shuffled, queue
+_HEADER = struct.Struct("<4sHHQdiqHBBQQIII4x")
+_SHUFFLED = 1
+
+_DELTA_MAGIC = b"LPSP"
+# magic, generation, position, playing, saved at, then a CRC-32 of these
+_DELTA = struct.Struct("<4sQqB7xd")
+_DELTA_CRC = struct.Struct("<I")
+
+# Position changes smaller than this are not worth a periodic write
+MIN_POSITION_DELTA_MS = 1000
+
+
+def default_session_path():
+    return os.path.join(user_data_dir(), "session.bin")
+
+
+def _delta_path(path):
+    return os.path.splitext(path)[0] + ".pos"
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+# --- Writing ---
+
+def capture(player):
+    """
+    Returns the player's session state. The playlist's buffers are copied, so the state
+    can be written on another thread while the playlist keeps changing.
+    """
+    arrays = player.playlist.to_arrays()
+    position, _ = player.position_clock.position()
+    return {
+        "blob": bytes(arrays["blob"]),
+        "starts": array('Q', arrays["starts"]),
+        "lengths": array('I', arrays["lengths"]),
+        "order": arrays["order"],
+        "shuffled": arrays["shuffled"],
+        "queue": arrays["queue"],
+        "index": player.current_track_index if player.playlist else -1,
+        "position_ms": position,
+        "volume": player.volume(),
+        "muted": player.is_muted(),
+        "playing": player.is_playing(),
+    }
+
+
+def write_snapshot(path, state, generation):
+    """Writes a snapshot of ``state`` (see ``capture``) to ``path`` atomically. Returns its size."""
+    shuffled = state["shuffled"]
+    header = _HEADER.pack(
+        _MAGIC, _VERSION, _SHUFFLED if shuffled is not None else 0, generation, time.time(),
+        state["index"], state["position_ms"], state["volume"], state["muted"], state["playing"],
+        len(state["starts"]), len(state["blob"]), len(state["order"]),
+        len(shuffled) if shuffled is not None else 0, len(state["queue"]),
+    )
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for values in (state["starts"], state["lengths"], state["order"], shuffled or array('I'), state["queue"]):
+            f.write(_little_endian(values))
+        f.write(state["blob"])
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def write_position(f, generation, position_ms, playing):
+    """Overwrites the delta file ``f`` (open for writing) with the position for snapshot ``generation``."""
+    record = _DELTA.pack(_DELTA_MAGIC, generation, position_ms, playing, time.time())
+    f.seek(0)
+    f.write(record + _DELTA_CRC.pack(zlib.crc32(record)))
+    f.flush()
+
+
+# --- Loading ---
+
+def _read_position(path, generation):
+    try:
+        with open(path, "rb") as f:
+            data = f.read(_DELTA.size + _DELTA_CRC.size)
+    except OSError:
+        return None
+    if len(data) != _DELTA.size + _DELTA_CRC.size:
+        return None
+    record = data[:_DELTA.size]
+    magic, delta_generation, position_ms, playing, _ = _DELTA.unpack(record)
+    (crc,) = _DELTA_CRC.unpack_from(data, _DELTA.size)
+    if magic != _DELTA_MAGIC or crc != zlib.crc32(record) or delta_generation != generation:
+        return None
+    return position_ms, bool(playing)
+
+
+def _take(view, offset, typecode, count):
+    values = array(typecode)
+    end = offset + values.itemsize * count
+    values.frombytes(view[offset:end])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, end
+
+
+def load_session(path=None):
+    """
+    Loads the saved session, or returns None if there is none (or it is unreadable).
+    Returns a dict with the ``playlist``, the current ``index``, ``position_ms``,
+    ``volume``, ``muted``, ``playing``, the snapshot's ``generation`` and ``saved_at``.
+    """
+    path = path or default_session_path()
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # ValueError: empty file
+        return None
+    try:
+        view = memoryview(mapped)
+        try:
+            if len(view) < _HEADER.size:
+                raise ValueError("truncated header")
+            (magic, version, flags, generation, saved_at, index, position_ms, volume, muted, playing,
+             entries, blob_bytes, order_count, shuffled_count, queue_count) = _HEADER.unpack_from(view)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError("not a session snapshot")
+            expected = _HEADER.size + 12 * entries + 4 * (order_count + shuffled_count + queue_count) + blob_bytes
+            if len(view) != expected:
+                raise ValueError("truncated snapshot")
+
+            offset = _HEADER.size
+            starts, offset = _take(view, offset, 'Q', entries)
+            lengths, offset = _take(view, offset, 'I', entries)
+            order, offset = _take(view, offset, 'I', order_count)
+            shuffled, offset = _take(view, offset, 'I', shuffled_count)
+            queue, offset = _take(view, offset, 'I', queue_count)
+            blob = bytearray(view[offset:offset + blob_bytes])
+        finally:
+            view.release()
+    except ValueError as e:
+        print(f"Error loading session {path}: {e}")
+        return None
+    finally:
+        mapped.close()
+
+    playlist = Playlist.from_arrays(blob, starts, lengths, order, shuffled if flags & _SHUFFLED else None, queue)
+    delta = _read_position(_delta_path(path), generation)
+    if delta is not None:
+        position_ms, playing = delta
+    return {
+        "playlist": playlist,
+        "index": index,
+        "position_ms": position_ms,
+        "volume": volume,
+        "muted": bool(muted),
+        "playing": bool(playing),
+        "generation": generation,
+        "saved_at": saved_at,
+    }
+
+
+class SessionRecorder(QObject):
+    """
+    Saves a player's session every ``interval_ms`` and on ``save()``. A full snapshot
+    is written only when the playlist, current track, volume or mute state changed;
+    otherwise a moved position (or play/pause) goes to the delta file. Files are written on a worker
+    thread, in order.
+    """
+
+    def __init__(self, player, path=None, interval_ms=5000, generation=0, parent=None):
+        super().__init__(parent)
+        self.player = player
+        self.path = path or default_session_path()
+        self._generation = generation
+        self._saved_key = None
+        self._saved_position = None
+        self._delta_file = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session")
+        self._stats = {"snapshots": 0, "deltas": 0, "snapshot_bytes": 0, "capture_ms": 0.0, "write_ms": 0.0}
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(lambda: self.save(min_delta_ms=MIN_POSITION_DELTA_MS))
+        self._timer.start(interval_ms)
+
+    def _key(self):
+        player = self.player
+        return (id(player.playlist), player.playlist.revision, player.current_track_index,
+                player.volume(), player.is_muted())
+
+    def save(self, force=False, min_delta_ms=0):
+        """
+        Writes whatever changed since the last save (everything with ``force``); position
+        changes below ``min_delta_ms`` are skipped.
+        """
+        key = self._key()
+        position, _ = self.player.position_clock.position()
+        playing = self.player.is_playing()
+        if force or key != self._saved_key:
+            started = time.perf_counter()
+            state = capture(self.player)
+            self._stats["capture_ms"] = (time.perf_counter() - started) * 1000
+            # Generations only need to differ between snapshots; the time keeps them unique across runs
+            self._generation = max(self._generation + 1, time.time_ns())
+            self._executor.submit(self._write_snapshot, state, self._generation)
+            self._saved_key = key
+            self._saved_position = (position, playing)
+        elif playing != self._saved_position[1] or abs(position - self._saved_position[0]) > min_delta_ms:
+            self._executor.submit(self._write_position, self._generation, position, playing)
+            self._saved_position = (position, playing)
+
+    def _write_snapshot(self, state, generation):
+        started = time.perf_counter()
+        try:
+            self._stats["snapshot_bytes"] = write_snapshot(self.path, state, generation)
+            self._stats["snapshots"] += 1
+        except OSError as e:
+            print(f"Error saving session {self.path}: {e}")
+        self._stats["write_ms"] = (time.perf_counter() - started) * 1000
+
+    def _write_position(self, generation, position_ms, playing):
+        try:
+            if self._delta_file is None:
+                self._delta_file = open(_delta_path(self.path), "wb")
+            write_position(self._delta_file, generation, position_ms, playing)
+            self._stats["deltas"] += 1
+        except OSError as e:
+            print(f"Error saving session position: {e}")
+
+    def stats(self):
+        """Returns counts of snapshots and position deltas written, and the last snapshot's cost."""
+        return dict(self._stats)
+
+    def close(self):
+        """Saves the final state and waits until everything is written."""
+        self._timer.stop()
+        self.save()
+        self._executor.shutdown(wait=True)
+        if self._delta_file is not None:
+            self._delta_file.close()
+            self._delta_file = None
@@ -0,0 +1,99 @@
+"""
+Startup timing and the deferred player backend.
+
+Marks are recorded relative to the import of this module, which ``main.py`` does
+first. The window is shown before anything heavy is loaded; ``BackendLoader`` then
+imports the player modules and creates the libVLC instance (which loads all of VLC's
+plugins) on a background thread.
+"""
+import time
+
+_origin = time.perf_counter()
+
+import json
+import threading
+
+from PySide6.QtCore import QEvent, QObject, QTimer, Signal
+
+_marks = []
+
+# Time-to-first-frame budget the startup report is checked against
+DEFAULT_BUDGET_MS = 400
+
+
+def mark(name):
+    """Records that startup reached ``name`` (the first mark of a name wins)."""
+    if all(existing != name for existing, _ in _marks):
+        _marks.append((name, (time.perf_counter() - _origin) * 1000))
+
+
+def marks():
+    """Returns ``{name: milliseconds since start}`` in the order they were reached."""
+    return dict(_marks)
+
+
+def report(budget_ms=DEFAULT_BUDGET_MS, path=None):
+    """Prints the startup timeline (and writes it as JSON to ``path``). Returns True within budget."""
+    timeline = marks()
+    first_frame = timeline.get("first_frame")
+    within_budget = first_frame is not None and first_frame <= budget_ms
+
+    print(f"--- Startup ({'within' if within_budget else 'OVER'} the {budget_ms:g} ms first-frame budget) ---")
+    for name, elapsed in timeline.items():
+        print(f"{name:20s} {elapsed:9.1f} ms")
+
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"marks": timeline, "budget_ms": budget_ms, "within_budget": within_budget}, f, indent=2)
+    return within_budget
+
+
+class _FirstFrameWatcher(QObject):
+    painted = Signal()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            # The paint event is delivered before the widget paints; mark once it's done
+            QTimer.singleShot(0, self._on_painted)
+        return False
+
+    def _on_painted(self):
+        mark("first_frame")
+        self.painted.emit()
+
+
+def watch_first_frame(window):
+    """Marks ``first_frame`` once ``window`` has been painted; returns the watcher."""
+    watcher = _FirstFrameWatcher(window)
+    window.installEventFilter(watcher)
+    return watcher
+
+
+class BackendLoader(QObject):
+    """
+    Imports the player modules and creates the libVLC instance on a background thread.
+    ``ready`` carries the instance, or None if libVLC could not be initialized.
+    """
+    ready = Signal(object)
+
+    def __init__(self, vlc_args=(), parent=None):
+        super().__init__(parent)
+        self.vlc_args = tuple(vlc_args)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="backend-loader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        instance = None
+        try:
+            import vlc
+            import core.player  # noqa: F401  (imported here so Player() is cheap on the GUI thread)
+            mark("backend_imported")
+            instance = vlc.Instance(*self.vlc_args)
+        except Exception as e:  # python-vlc raises NameError/OSError when libVLC is missing
+            print(f"Error initializing libVLC: {e}")
+        mark("vlc_ready")
+        self.ready.emit(instance)
@@ -0,0 +1,203 @@
+"""
+Opt-in instrumentation: timing spans, counters and signal rates.
+
+Tracing is enabled by the ``LIQUID_TRACE`` environment variable (``main.py --trace``
+sets it), which is read once at import time. Its value is the path of the Chrome
+trace-event file written at exit (open it in chrome://tracing or Perfetto), or ``1`` for
+a timestamped file in the cache directory. While tracing, a summary with p50/p99
+durations and events per second is printed every ``LIQUID_TRACE_SUMMARY`` seconds.
+
+When tracing is off, ``span`` returns the decorated function itself and
+``trace_signals`` connects nothing, so instrumented code runs exactly as before.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ENV_VAR = "LIQUID_TRACE"
+SUMMARY_ENV_VAR = "LIQUID_TRACE_SUMMARY"
+DEFAULT_SUMMARY_INTERVAL = 10.0
+# Spans kept for the trace file; older ones are dropped first
+MAX_EVENTS = 500_000
+
+enabled = bool(os.environ.get(ENV_VAR)) and os.environ.get(ENV_VAR) != "0"
+
+
+class Tracer:
+    """Collects spans and counters from any thread."""
+
+    def __init__(self, path=None, summary_interval=DEFAULT_SUMMARY_INTERVAL):
+        self.path = path
+        self.summary_interval = summary_interval
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._events = deque(maxlen=MAX_EVENTS)  # (name, thread id, start ns, duration ns)
+        self._counters = []                      # (name, ns, events per second)
+        self._threads = {}
+        self._durations = {}  # name -> durations in ns since the last summary
+        self._counts = {}     # name -> events since the last summary
+        self._window_start = time.monotonic()
+        self._stop = threading.Event()
+        self._summary_thread = None
+
+    # --- Recording ---
+
+    def record_span(self, name, start_ns, end_ns):
+        thread = threading.current_thread()
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads[thread.ident] = thread.name
+            self._events.append((name, thread.ident, start_ns - self._origin, end_ns - start_ns))
+            self._durations.setdefault(name, []).append(end_ns - start_ns)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + value
+
+    # --- Reporting ---
+
+    def summary(self, reset=True):
+        """
+        Returns ``{name: {"count", "per_second", "p50_ms", "p99_ms"}}`` for the events
+        since the last reset (durations only for spans).
+        """
+        now = time.monotonic()
+        with self._lock:
+            durations, counts = self._durations, self._counts
+            elapsed = max(now - self._window_start, 1e-9)
+            if reset:
+                self._durations, self._counts = {}, {}
+                self._window_start = now
+                timestamp = time.perf_counter_ns() - self._origin
+                for name, count in counts.items():
+                    self._counters.append((name, timestamp, count / elapsed))
+
+        result = {}
+        for name, count in sorted(counts.items()):
+            entry = {"count": count, "per_second": count / elapsed}
+            values = sorted(durations.get(name, ()))
+            if values:
+                entry["p50_ms"] = values[len(values) // 2] / 1e6
+                entry["p99_ms"] = values[min(len(values) - 1, int(len(values) * 0.99))] / 1e6
+            result[name] = entry
+        return result
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"--- Trace summary ({len(summary)} probes) ---")
+        for name, entry in summary.items():
+            line = f"{name:40s} {entry['count']:8d} {entry['per_second']:9.1f}/s"
+            if "p50_ms" in entry:
+                line += f"  p50 {entry['p50_ms']:8.3f} ms  p99 {entry['p99_ms']:8.3f} ms"
+            print(line)
+
+    def trace_events(self):
+        """Returns the collected data in Chrome's trace-event format."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self._events)
+            counters = list(self._counters)
+            threads = dict(self._threads)
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in threads.items()]
+        events.extend({"name": name, "cat": "span", "ph": "X", "pid": pid, "tid": tid,
+                       "ts": start / 1e3, "dur": duration / 1e3}
+                      for name, tid, start, duration in spans)
+        events.extend({"name": name, "cat": "rate", "ph": "C", "pid": pid, "ts": timestamp / 1e3,
+                       "args": {"per_second": rate}}
+                      for name, timestamp, rate in counters)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path=None):
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.trace_events(), f)
+        os.replace(tmp_path, path)
+        return path
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self.summary_interval > 0:
+            self._summary_thread = threading.Thread(target=self._summary_loop, name="trace-summary", daemon=True)
+            self._summary_thread.start()
+        atexit.register(self.close)
+
+    def _summary_loop(self):
+        while not self._stop.wait(self.summary_interval):
+            self.print_summary()
+
+    def close(self):
+        self._stop.set()
+        self.print_summary()
+        if self.path:
+            try:
+                print(f"Trace written to {self.write()}")
+            except OSError as e:
+                print(f"Error writing trace: {e}")
+
+
+def _trace_path(value):
+    if value not in ("1", "true", "yes"):
+        return value
+    from core.paths import user_cache_dir
+    return os.path.join(user_cache_dir("traces"), time.strftime("trace-%Y%m%d-%H%M%S.json"))
+
+
+def _summary_interval():
+    try:
+        return float(os.environ.get(SUMMARY_ENV_VAR, DEFAULT_SUMMARY_INTERVAL))
+    except ValueError:
+        return DEFAULT_SUMMARY_INTERVAL
+
+
+tracer = None
+if enabled:
+    tracer = Tracer(_trace_path(os.environ[ENV_VAR]), _summary_interval())
+    tracer.start()
+
+
+# --- Instrumentation helpers ---
+
+def span(name):
+    """Decorator timing every call of a function as a span called ``name``."""
+    def decorate(func):
+        if tracer is None:
+            return func
+
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.record_span(name, start, time.perf_counter_ns())
+        return traced
+    return decorate
+
+
+def count(name, value=1):
+    """Adds to a counter (nothing happens while tracing is off)."""
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+def trace_signals(obj, *signal_names, prefix=None):
+    """Counts the emissions of Qt signals of ``obj``, in the emitting thread."""
+    if tracer is None:
+        return
+    from PySide6.QtCore import Qt
+
+    prefix = prefix or type(obj).__name__
+    for signal_name in signal_names:
+        counter = f"{prefix}.{signal_name}"
+        getattr(obj, signal_name).connect(lambda *args, counter=counter: tracer.count(counter),
+                                          Qt.ConnectionType.DirectConnection)
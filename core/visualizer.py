@@ -0,0 +1,322 @@
+"""
+Live spectrum and level analysis of the playing track.
+
+libVLC's audio callbacks replace a media player's audio output, so ``AudioTap`` takes
+over the output of the player's decks: each deck's PCM (16-bit stereo, after VLC's
+volume) arrives through the callbacks and is handed to a QAudioSink, which plays it,
+and the active deck's audio is also mixed to mono float32 into a preallocated ring
+buffer. Every track is decoded once, as without the tap; the "visualizer_decoder"
+benchmark measures what forwarding and analyzing the audio add to playback.
+
+A worker thread analyzes the newest audio once per frame: all windows since the last
+frame go through one batched FFT, the power is summed into log-spaced bands, and RMS
+and peak levels are taken over the new samples. Only the latest frame is kept;
+``ui.widgets.spectrum_widget`` polls it at its own capped frame rate. Without a tap
+(the default) none of this exists, so switching it off costs nothing.
+"""
+import ctypes
+import statistics
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from PySide6.QtCore import QIODevice, QObject
+
+SAMPLE_RATE = 44100
+FFT_SIZE = 2048
+HOP = 1024
+BANDS = 24
+MIN_FREQUENCY = 40.0
+MAX_FREQUENCY = 16000.0
+FLOOR_DB = -70.0       # Shown as an empty band or meter
+FALL_DB_PER_S = 40.0   # How fast bars and the peak hold sink after a loud moment
+DEFAULT_FPS = 30
+# Windows analyzed per frame at most (the rest of a backlog is skipped)
+MAX_BATCH = 8
+# Audio the sinks buffer ahead of what is heard
+SINK_BUFFER_MS = 100
+# Decoded audio waiting for a sink beyond this is dropped (the sink fell behind)
+MAX_QUEUED_MS = 1000
+
+
+class PcmRing:
+    """
+    A preallocated ring of mono float32 samples with a single writer (libVLC's audio
+    thread of the active deck) and a single reader (the analyzer). ``written`` counts
+    every sample ever written, so the reader can tell what is new without any locking;
+    the ring holds far more than one read, so a read isn't overwritten while it is copied.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._address = self._data.ctypes.data
+        self.written = 0
+
+    def write(self, pointer, count):
+        """Copies ``count`` samples from the C buffer at ``pointer``."""
+        if count > self.capacity:
+            pointer += (count - self.capacity) * 4
+            self.written += count - self.capacity
+            count = self.capacity
+        position = self.written % self.capacity
+        first = min(count, self.capacity - position)
+        ctypes.memmove(self._address + position * 4, pointer, first * 4)
+        if count > first:
+            ctypes.memmove(self._address, pointer + first * 4, (count - first) * 4)
+        self.written += count
+
+    def write_array(self, samples):
+        """Copies a float32 array (e.g. for benchmarks, where libVLC isn't involved)."""
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.write(samples.ctypes.data, len(samples))
+
+    def latest(self, count, end=None):
+        """Returns a copy of the ``count`` samples before ``end`` (default: the newest)."""
+        end = self.written if end is None else end
+        count = min(count, self.capacity, end)
+        start = (end - count) % self.capacity
+        if start + count <= self.capacity:
+            return self._data[start:start + count].copy()
+        return np.concatenate((self._data[start:], self._data[:start + count - self.capacity]))
+
+
+class SpectrumAnalyzer:
+    """Turns the newest samples of a PcmRing into band levels and RMS/peak, 0..1 on a dB scale."""
+
+    def __init__(self, rate=SAMPLE_RATE, fft_size=FFT_SIZE, hop=HOP, bands=BANDS, fps=DEFAULT_FPS):
+        self.fft_size = fft_size
+        self.hop = hop
+        self.window = np.hanning(fft_size).astype(np.float32)
+        # Scales a full-scale sine to 0 dB
+        self._power_scale = (2.0 / self.window.sum()) ** 2
+
+        # Each band covers at least one FFT bin
+        frequencies = np.fft.rfftfreq(fft_size, 1.0 / rate)
+        edges = np.searchsorted(frequencies, np.geomspace(MIN_FREQUENCY, min(MAX_FREQUENCY, rate / 2), bands + 1))
+        for i in range(1, len(edges)):
+            edges[i] = max(edges[i], edges[i - 1] + 1)
+        edges = np.minimum(edges, len(frequencies) - 1)
+        self._lo, self._hi = int(edges[0]), int(edges[-1])
+        self._offsets = edges[:-1] - self._lo
+        self._counts = np.maximum(np.diff(edges), 1).astype(np.float32)
+
+        self._fall = FALL_DB_PER_S / -FLOOR_DB / fps  # per frame, on the 0..1 scale
+        self.bands = np.zeros(bands, dtype=np.float32)
+        self.rms = self.peak = self.peak_hold = 0.0
+        self.analyzed = 0  # ring position up to which samples were analyzed
+
+    @staticmethod
+    def _scale(db):
+        return np.clip(1.0 - np.asarray(db) / FLOOR_DB, 0.0, 1.0)
+
+    def analyze(self, ring):
+        """Analyzes what was written since the last call. Returns False if nothing was new (levels just fall)."""
+        end = ring.written
+        new = min(end - self.analyzed, ring.capacity - self.fft_size)
+        self.analyzed = end
+        if new <= 0:
+            self.bands = np.maximum(self.bands - self._fall, 0.0)
+            self.rms = max(self.rms - self._fall, 0.0)
+            self.peak = max(self.peak - self._fall, 0.0)
+            self.peak_hold = max(self.peak_hold - self._fall, 0.0)
+            return False
+
+        windows = min(MAX_BATCH, max(1, -(-new // self.hop)))
+        samples = ring.latest(self.fft_size + (windows - 1) * self.hop, end)
+        if len(samples) < self.fft_size:
+            samples = np.concatenate((np.zeros(self.fft_size - len(samples), np.float32), samples))
+            windows = 1
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.fft_size)[::self.hop][:windows]
+        spectra = np.fft.rfft(frames * self.window, axis=1)[:, self._lo:self._hi]
+        power = (spectra.real ** 2 + spectra.imag ** 2).mean(axis=0) * self._power_scale
+        bands = np.add.reduceat(power, self._offsets) / self._counts
+        levels = self._scale(10.0 * np.log10(bands + 1e-12))
+        # Fast attack, slow fall
+        self.bands = np.maximum(levels.astype(np.float32), self.bands - self._fall)
+
+        recent = samples[-min(new, len(samples)):]
+        rms = float(np.sqrt(np.mean(recent * recent)))
+        peak = float(np.max(np.abs(recent)))
+        self.rms = max(float(self._scale(20.0 * np.log10(rms + 1e-9))), self.rms - self._fall)
+        self.peak = float(self._scale(20.0 * np.log10(peak + 1e-9)))
+        self.peak_hold = max(self.peak, self.peak_hold - self._fall / 4)
+        return True
+
+
+class _DeckOutput(QIODevice):
+    """
+    Carries one deck's PCM from libVLC's audio thread to the QAudioSink that pulls it.
+    Blocks are queued as VLC delivers them; while the deck is paused or nothing is
+    queued the sink gets silence, so it keeps running and never has to be restarted.
+    """
+
+    def __init__(self, rate, channels, parent=None):
+        super().__init__(parent)
+        self.frame_bytes = 2 * channels
+        self._max_bytes = rate * MAX_QUEUED_MS // 1000 * self.frame_bytes
+        self._blocks = deque()
+        self._head = b""  # Unread rest of the block being read
+        self._queued = 0
+        self._lock = threading.Lock()
+        self.paused = False
+        self.underruns = 0
+        self.dropped_bytes = 0
+        self.open(QIODevice.OpenModeFlag.ReadOnly)
+
+    # --- libVLC's audio thread ---
+
+    def push(self, data):
+        with self._lock:
+            self._blocks.append(data)
+            self._queued += len(data)
+            while self._queued > self._max_bytes and self._blocks:
+                dropped = len(self._blocks.popleft())
+                self._queued -= dropped
+                self.dropped_bytes += dropped
+
+    def clear(self):
+        """Discards the queued audio (VLC flushes on seeks and stops)."""
+        with self._lock:
+            self._blocks.clear()
+            self._head = b""
+            self._queued = 0
+
+    # --- The sink's thread ---
+
+    def isSequential(self):
+        return True
+
+    def readData(self, maxlen):
+        maxlen -= maxlen % self.frame_bytes
+        if self.paused:
+            return bytes(maxlen)
+        out = bytearray()
+        with self._lock:
+            while len(out) < maxlen and (self._head or self._blocks):
+                if not self._head:
+                    self._head = self._blocks.popleft()
+                taken = self._head[:maxlen - len(out)]
+                self._head = self._head[len(taken):]
+                self._queued -= len(taken)
+                out += taken
+        if len(out) < maxlen:
+            if out:
+                self.underruns += 1
+            out += bytes(maxlen - len(out))
+        return bytes(out)
+
+    def writeData(self, data):
+        return -1
+
+
+class AudioTap(QObject):
+    """
+    Plays ``player``'s decks through QAudioSinks and feeds the active deck's audio to a
+    SpectrumAnalyzer on a worker thread at ``fps`` frames per second. ``latest()``
+    returns the newest frame. Must be created before playback starts; a deck that is
+    already playing switches to the tap's output from its next track on.
+    """
+
+    def __init__(self, player, fps=DEFAULT_FPS, rate=SAMPLE_RATE, ring_seconds=1.0, parent=None):
+        super().__init__(parent)
+        import vlc
+        from PySide6.QtMultimedia import QAudioFormat, QAudioSink
+
+        self.player = player
+        self.fps = fps
+        self.rate = rate
+        self.ring = PcmRing(int(rate * ring_seconds))
+        self.analyzer = SpectrumAnalyzer(rate, fps=fps)
+        self._frame = None
+        self._seq = 0
+        self._stopping = threading.Event()
+        self._cpu_ms = deque(maxlen=300)
+        self._stats = {"frames": 0, "idle_frames": 0, "callbacks": 0}
+
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(rate)
+        audio_format.setChannelCount(2)
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        self._outputs = []
+        self._callbacks = []  # Must stay referenced for as long as libVLC may call them
+        for deck in player.decks():
+            output = _DeckOutput(rate, 2, parent=self)
+            sink = QAudioSink(audio_format, self)
+            sink.setBufferSize(rate * SINK_BUFFER_MS // 1000 * output.frame_bytes)
+            sink.start(output)
+            callbacks = (
+                vlc.CallbackDecorators.AudioPlayCb(
+                    lambda data, samples, count, pts, deck=deck, output=output: self._on_audio(deck, output, samples, count)),
+                vlc.CallbackDecorators.AudioPauseCb(lambda data, pts, output=output: setattr(output, "paused", True)),
+                vlc.CallbackDecorators.AudioResumeCb(lambda data, pts, output=output: setattr(output, "paused", False)),
+                vlc.CallbackDecorators.AudioFlushCb(lambda data, pts, output=output: output.clear()),
+                None,  # Draining: the sink plays out what is queued anyway
+            )
+            deck.audio_set_callbacks(*callbacks, None)
+            deck.audio_set_format("S16N", rate, 2)
+            self._outputs.append((output, sink))
+            self._callbacks.append(callbacks)
+
+        self._thread = threading.Thread(target=self._run, name="visualizer", daemon=True)
+        self._thread.start()
+
+    # --- Audio threads ---
+
+    def _on_audio(self, deck, output, samples, count):
+        data = ctypes.string_at(samples, count * output.frame_bytes)
+        output.push(data)
+        self._stats["callbacks"] += 1
+        # Only the active deck is analyzed; during a crossfade the incoming one takes over
+        if deck is self.player.player and not self._stopping.is_set():
+            stereo = np.frombuffer(data, dtype=np.int16).reshape(-1, 2)
+            self.ring.write_array(stereo.mean(axis=1, dtype=np.float32) * (1.0 / 32768.0))
+
+    # --- Worker ---
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        deadline = time.monotonic()
+        while not self._stopping.is_set():
+            deadline = max(deadline + interval, time.monotonic())
+            if self._stopping.wait(max(0.0, deadline - time.monotonic())):
+                return
+            started = time.thread_time()
+            analyzer = self.analyzer
+            fresh = analyzer.analyze(self.ring)
+            silent = analyzer.peak_hold == 0 and analyzer.rms == 0 and not analyzer.bands.any()
+            if not fresh and silent and self._frame is not None and self._frame["silent"]:
+                self._stats["idle_frames"] += 1
+                continue  # Paused or stopped, and already shown as silence
+            self._seq += 1
+            # Replaced as a whole, so readers never see a half-updated frame
+            self._frame = {"seq": self._seq, "bands": analyzer.bands.copy(), "rms": analyzer.rms,
+                           "peak": analyzer.peak, "peak_hold": analyzer.peak_hold, "silent": silent}
+            self._cpu_ms.append((time.thread_time() - started) * 1000)
+            self._stats["frames"] += 1
+
+    def latest(self):
+        """Returns the newest frame (``seq``, ``bands``, ``rms``, ``peak``, ``peak_hold``), or None."""
+        return self._frame
+
+    def stats(self):
+        """
+        Returns frame and callback counts, the sinks' underruns and dropped audio, and the
+        analysis CPU time per frame in milliseconds.
+        """
+        stats = dict(self._stats, underruns=sum(output.underruns for output, _ in self._outputs),
+                     dropped_ms=sum(output.dropped_bytes for output, _ in self._outputs) / 4 / self.rate * 1000)
+        cpu = sorted(self._cpu_ms)
+        if cpu:
+            stats["cpu_ms_per_frame"] = {"median": statistics.median(cpu),
+                                         "p90": cpu[min(len(cpu) - 1, int(len(cpu) * 0.9))], "worst": cpu[-1]}
+        return stats
+
+    def stop(self):
+        """Stops analyzing. The decks keep playing through the tap's sinks."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._frame = None
@@ -0,0 +1,590 @@
+"""
+Watching music folders for changes.
+
+On Linux, inotify (through ctypes) reports changes as they happen, with one watch per
+folder since inotify isn't recursive. Elsewhere, or when inotify is unavailable (e.g.
+out of watches), the folders are rescanned every ``poll_interval`` seconds and compared
+with the previous scan.
+
+Events are coalesced per path (a file created and written is one addition; created
+and deleted again is nothing) and flushed as one ChangeSet once the folders have been
+quiet for ``debounce_ms``, or at the latest ``max_delay_ms`` after the first event. So
+copying an album yields one batch instead of hundreds of updates, and a long copy
+still shows up while it runs. Files being written are only reported once they are
+closed, so their tags are read complete.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, Signal
+
+from core.library import AUDIO_EXTENSIONS
+
+DEBOUNCE_MS = 500
+MAX_DELAY_MS = 5000
+POLL_INTERVAL_S = 5.0
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")  # watch descriptor, mask, cookie, name length
+
+_ADDED, _MODIFIED, _REMOVED = "added", "modified", "removed"
+
+
+def _is_audio(path):
+    return os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS
+
+
+def _below(path, directory):
+    return path.startswith(directory + os.sep)
+
+
+class ChangeSet:
+    """
+    One debounced batch of changes below the watched folders. ``moved`` maps paths as
+    they were before the batch to where the files are now; the other paths are as they
+    are after it. Folder entries stand for everything below them. Apply in this order:
+    ``moved`` (all pairs at once), ``moved_dirs``, ``removed`` and ``removed_dirs``,
+    then ``added`` and ``modified``.
+    """
+
+    def __init__(self, added=(), modified=(), removed=(), moved=(), moved_dirs=(), removed_dirs=(),
+                 overflowed=False):
+        self.added = list(added)
+        self.modified = list(modified)
+        self.removed = list(removed)
+        self.moved = list(moved)                # (old path, new path)
+        self.moved_dirs = list(moved_dirs)      # (old folder, new folder)
+        self.removed_dirs = list(removed_dirs)
+        self.overflowed = overflowed            # Events were lost; only a rescan is reliable
+        self.events = 0
+        self.first_event_at = None              # time.monotonic() of the first event
+        self.flushed_at = None
+        self.applied_at = None                  # Set by whoever applies the changes last
+
+    def __len__(self):
+        return (len(self.added) + len(self.modified) + len(self.removed) + len(self.moved)
+                + len(self.moved_dirs) + len(self.removed_dirs))
+
+    def __repr__(self):
+        return (f"<ChangeSet added={len(self.added)} modified={len(self.modified)} removed={len(self.removed)} "
+                f"moved={len(self.moved)} moved_dirs={len(self.moved_dirs)} removed_dirs={len(self.removed_dirs)}>")
+
+
+class _Pending:
+    """Coalesces raw events until the next flush."""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.files = {}         # path -> _ADDED, _MODIFIED or _REMOVED
+        self.moves = {}         # new path -> path before the batch
+        self.moved_dirs = []
+        self.removed_dirs = []
+        self.overflowed = False
+        self.events = 0
+        self.first_at = self.last_at = None
+
+    def touch(self):
+        """Counts one raw event (and restarts the quiet period)."""
+        now = time.monotonic()
+        self.events += 1
+        if self.first_at is None:
+            self.first_at = now
+        self.last_at = now
+
+    def due(self, now, debounce, max_delay):
+        return self.first_at is not None and (now - self.last_at >= debounce or now - self.first_at >= max_delay)
+
+    def timeout(self, now, debounce, max_delay):
+        if self.first_at is None:
+            return None
+        return max(0.0, min(self.last_at + debounce, self.first_at + max_delay) - now)
+
+    def _before_dir_moves(self, path):
+        for old, new in reversed(self.moved_dirs):
+            if _below(path, new):
+                path = old + path[len(new):]
+        return path
+
+    def _after_dir_moves(self, path):
+        for old, new in self.moved_dirs:
+            if _below(path, old):
+                path = new + path[len(old):]
+        return path
+
+    def created(self, path):
+        if _is_audio(path):
+            state = self.files.get(path)
+            if state is None:
+                self.files[path] = _ADDED
+            elif state is _REMOVED:
+                self.files[path] = _MODIFIED  # Replaced
+
+    def written(self, path):
+        if _is_audio(path):
+            self.files.setdefault(path, _MODIFIED)
+
+    def deleted(self, path):
+        if not _is_audio(path):
+            return
+        state = self.files.pop(path, None)
+        origin = self.moves.pop(path, None)
+        if origin is not None:
+            # Moves are applied before removals, and folder moves may have taken it along
+            self.files[self._after_dir_moves(origin)] = _REMOVED
+        elif state is not _ADDED:
+            self.files[path] = _REMOVED
+
+    def moved(self, old, new):
+        if not _is_audio(new):
+            self.deleted(old)
+            return
+        if not _is_audio(old):
+            self.created(new)
+            return
+        state = self.files.pop(old, None)
+        if self.files.get(new) is _REMOVED:
+            del self.files[new]
+        if state is _ADDED:
+            self.files[new] = _ADDED
+            return
+        origin = self.moves.pop(old, None) or self._before_dir_moves(old)
+        if origin != new:
+            self.moves[new] = origin
+        if state is _MODIFIED:
+            self.files[new] = _MODIFIED
+
+    def dir_moved(self, old, new):
+        self.files = {new + path[len(old):] if _below(path, old) else path: state
+                      for path, state in self.files.items()}
+        self.moves = {new + path[len(old):] if _below(path, old) else path: origin
+                      for path, origin in self.moves.items()}
+        self.moved_dirs.append((old, new))
+
+    def dir_removed(self, directory):
+        # Whatever was below it is covered by the folder entry, except moves into it
+        self.files = {path: state for path, state in self.files.items() if not _below(path, directory)}
+        for path in [path for path in self.moves if _below(path, directory)]:
+            target = self._after_dir_moves(self.moves.pop(path))
+            if not _below(target, directory):
+                self.files[target] = _REMOVED
+        self.removed_dirs.append(directory)
+
+    def overflow(self):
+        self.overflowed = True
+
+    def take(self):
+        """Returns the coalesced changes as a ChangeSet and starts over."""
+        by_state = {_ADDED: [], _MODIFIED: [], _REMOVED: []}
+        for path, state in self.files.items():
+            by_state[state].append(path)
+        changes = ChangeSet(
+            added=sorted(by_state[_ADDED]),
+            modified=sorted(by_state[_MODIFIED]),
+            removed=sorted(by_state[_REMOVED]),
+            moved=[(old, new) for new, old in self.moves.items()],
+            moved_dirs=self.moved_dirs,
+            removed_dirs=self.removed_dirs,
+            overflowed=self.overflowed,
+        )
+        changes.events = self.events
+        changes.first_event_at = self.first_at
+        self._reset()
+        return changes
+
+
+# --- Backends ---
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.ENOSYS, "inotify needs Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_init1.restype = ctypes.c_int
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_add_watch.restype = ctypes.c_int
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    libc.inotify_rm_watch.restype = ctypes.c_int
+    return libc
+
+
+class _Inotify:
+    """Reads inotify events; every folder below the roots gets its own watch."""
+    name = "inotify"
+
+    def __init__(self, roots):
+        self._roots = roots
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._wake_r, self._wake_w = os.pipe()
+        self._dirs = {}        # watch descriptor -> folder
+        self._moved_from = {}  # cookie -> (path, is folder) until the matching IN_MOVED_TO
+        self._writing = set()  # audio files created but not closed yet
+        try:
+            for root in roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), directory)
+        self._dirs[wd] = directory
+
+    def _watch_tree(self, directory, pending=None):
+        """Watches ``directory`` and the folders below it, reporting files already in them to ``pending``."""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                # Watched before it is listed, so files arriving meanwhile aren't missed
+                self._add_watch(current)
+            except OSError as e:
+                if e.errno not in (errno.EACCES, errno.ENOENT, errno.ENOTDIR):
+                    raise  # e.g. ENOSPC: out of watches (fs.inotify.max_user_watches)
+                continue
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif pending is not None:
+                                pending.touch()
+                                pending.created(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def _unwatch_tree(self, directory):
+        for wd, path in list(self._dirs.items()):
+            if path == directory or _below(path, directory):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._dirs[wd]
+
+    def _rename_watches(self, old, new):
+        for wd, path in self._dirs.items():
+            if path == old or _below(path, old):
+                self._dirs[wd] = new + path[len(old):]
+
+    def wait(self, timeout, pending):
+        ready, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        if self._wake_r in ready:
+            os.read(self._wake_r, 64)
+        if self._fd in ready:
+            self._read(pending)
+
+    def _read(self, pending):
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                try:
+                    self._handle(wd, mask, cookie, name, pending)
+                except OSError as e:
+                    print(f"Error watching {name}: {e}")
+
+    def _handle(self, wd, mask, cookie, name, pending):
+        if mask & IN_Q_OVERFLOW:
+            pending.touch()
+            pending.overflow()
+            for root in self._roots:
+                self._watch_tree(root)  # Folders created meanwhile have no watch yet
+            return
+        if mask & IN_IGNORED:
+            self._dirs.pop(wd, None)
+            return
+        directory = self._dirs.get(wd)
+        if directory is None or mask & IN_DELETE_SELF:
+            return  # The parent reports the deletion
+        path = os.path.join(directory, name)
+        is_dir = bool(mask & IN_ISDIR)
+        pending.touch()
+
+        if mask & IN_MOVED_FROM:
+            self._writing.discard(path)
+            self._moved_from[cookie] = (path, is_dir)
+        elif mask & IN_MOVED_TO:
+            source = self._moved_from.pop(cookie, None)
+            if is_dir:
+                if source is not None:
+                    self._rename_watches(source[0], path)
+                    self._writing = {path + file[len(source[0]):] if _below(file, source[0]) else file
+                                     for file in self._writing}
+                    pending.dir_moved(source[0], path)
+                else:
+                    self._watch_tree(path, pending)  # Moved in from elsewhere
+            elif source is not None:
+                pending.moved(source[0], path)
+            else:
+                pending.created(path)
+        elif is_dir:
+            if mask & IN_CREATE:
+                self._watch_tree(path, pending)
+            elif mask & IN_DELETE:
+                pending.dir_removed(path)
+        elif mask & IN_CREATE:
+            if not _is_audio(path):
+                return
+            # Files are reported once the writer closes them; links have no writer
+            info = os.lstat(path)
+            if stat.S_ISLNK(info.st_mode) or info.st_nlink > 1:
+                pending.created(path)
+            else:
+                self._writing.add(path)
+        elif mask & IN_CLOSE_WRITE:
+            if path in self._writing:
+                self._writing.discard(path)
+                pending.created(path)
+            else:
+                pending.written(path)
+        elif mask & IN_DELETE:
+            if path in self._writing:
+                self._writing.discard(path)
+            else:
+                pending.deleted(path)
+
+    def settle(self, pending):
+        """Resolves moves whose other half never came: those left the watched folders."""
+        for path, is_dir in self._moved_from.values():
+            if is_dir:
+                self._unwatch_tree(path)
+                pending.dir_removed(path)
+            else:
+                pending.deleted(path)
+        self._moved_from.clear()
+
+    def wake(self):
+        os.write(self._wake_w, b"\0")
+
+    def close(self):
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            os.close(fd)
+
+    def stats(self):
+        return {"watches": len(self._dirs)}
+
+
+class _Poller:
+    """Rescans the folders every ``interval`` seconds and compares them with the previous scan."""
+    name = "polling"
+
+    def __init__(self, roots, interval, stopping):
+        self._roots = roots
+        self.interval = interval
+        self._stopping = stopping
+        self._scan_ms = 0.0
+        self._snapshot = self._scan()
+        self._next = time.monotonic() + interval
+
+    def _scan(self):
+        """Returns ``{path: (inode, mtime_ns, size)}`` of the audio files below the roots."""
+        started = time.perf_counter()
+        snapshot = {}
+        stack = list(self._roots)
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif _is_audio(entry.name):
+                                info = entry.stat()
+                                snapshot[entry.path] = (entry.inode(), info.st_mtime_ns, info.st_size)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        self._scan_ms = (time.perf_counter() - started) * 1000
+        return snapshot
+
+    def wait(self, timeout, pending):
+        due = self._next - time.monotonic()
+        if timeout is not None and timeout < due:
+            self._stopping.wait(timeout)
+            return
+        if self._stopping.wait(max(0.0, due)):
+            return
+        self.poll(pending)
+        self._next = time.monotonic() + self.interval
+
+    def poll(self, pending):
+        old, new = self._snapshot, self._scan()
+        gone = {path: info for path, info in old.items() if path not in new}
+        by_inode = {info[0]: path for path, info in gone.items()}
+        for path, info in new.items():
+            previous = old.get(path)
+            if previous is None:
+                pending.touch()
+                # A vanished file with the same inode, mtime and size was renamed
+                source = by_inode.pop(info[0], None)
+                if source is not None and gone[source][1:] == info[1:]:
+                    del gone[source]
+                    pending.moved(source, path)
+                else:
+                    pending.created(path)
+            elif previous != info:
+                pending.touch()
+                pending.written(path)
+        for path in gone:
+            pending.touch()
+            pending.deleted(path)
+        self._snapshot = new
+
+    def settle(self, pending):
+        pass
+
+    def wake(self):
+        pass  # Waits on the stop event itself
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {"files": len(self._snapshot), "scan_ms": self._scan_ms}
+
+
+# --- Watcher ---
+
+class FileWatcher(QObject):
+    """
+    Watches folders on a background thread and emits ``changed`` with a ChangeSet per
+    burst of changes. With a library, each batch is applied to it first (tags are read
+    on the watcher's thread, only for added and modified files). Whoever applies the
+    changes last (e.g. ``Player.apply_changes``) sets their ``applied_at``, which
+    ``stats()`` reports as the latency from the first event.
+    """
+    changed = Signal(object)  # ChangeSet
+
+    def __init__(self, roots, library=None, debounce_ms=DEBOUNCE_MS, max_delay_ms=MAX_DELAY_MS,
+                 poll_interval=POLL_INTERVAL_S, polling=False, parent=None):
+        super().__init__(parent)
+        self.roots = [os.path.abspath(root).rstrip(os.sep) or os.sep for root in roots]
+        self.library = library
+        self.debounce = debounce_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self.poll_interval = poll_interval
+        self.polling = polling
+        self._backend = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._recent = deque(maxlen=100)
+        self._stats = {"events": 0, "batches": 0, "changes": 0, "largest_batch": 0, "overflows": 0}
+
+    def start(self):
+        """Starts watching; setting up the watches happens on the watcher's thread."""
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._backend is not None:
+            self._backend.wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _open_backend(self):
+        if not self.polling:
+            try:
+                return _Inotify(self.roots)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}); polling every {self.poll_interval:g}s instead")
+        return _Poller(self.roots, self.poll_interval, self._stopping)
+
+    def _run(self):
+        backend = self._backend = self._open_backend()
+        pending = _Pending()
+        try:
+            while not self._stopping.is_set():
+                backend.wait(pending.timeout(time.monotonic(), self.debounce, self.max_delay), pending)
+                if pending.due(time.monotonic(), self.debounce, self.max_delay):
+                    self._flush(backend, pending)
+        finally:
+            self._backend = None
+            backend.close()
+
+    def _flush(self, backend, pending):
+        backend.settle(pending)
+        changes = pending.take()
+        self._stats["events"] += changes.events
+        if not changes and not changes.overflowed:
+            return  # Everything cancelled out
+        if self.library is not None:
+            try:
+                if changes.overflowed:
+                    self.library.scan(self.roots)
+                else:
+                    self.library.apply_changes(changes)
+            except Exception as e:
+                print(f"Error updating the library: {e}")
+
+        changes.flushed_at = time.monotonic()
+        self._stats["batches"] += 1
+        self._stats["changes"] += len(changes)
+        self._stats["largest_batch"] = max(self._stats["largest_batch"], len(changes))
+        self._stats["overflows"] += changes.overflowed
+        self._recent.append(changes)
+        self.changed.emit(changes)
+
+    def stats(self):
+        """
+        Returns event and batch counts, and for recent batches the milliseconds from their
+        first event until they were applied (or flushed, if nobody set ``applied_at``).
+        """
+        backend = self._backend
+        stats = dict(self._stats, backend=backend.name if backend is not None else None)
+        if backend is not None:
+            stats.update(backend.stats())
+        if self._stats["batches"]:
+            stats["mean_batch"] = self._stats["changes"] / self._stats["batches"]
+        recent = list(self._recent)
+        if recent:
+            latencies = sorted(((changes.applied_at or changes.flushed_at) - changes.first_event_at) * 1000
+                               for changes in recent)
+            stats["latency_ms"] = {
+                "last": ((recent[-1].applied_at or recent[-1].flushed_at) - recent[-1].first_event_at) * 1000,
+                "median": latencies[len(latencies) // 2],
+                "worst": latencies[-1],
+            }
+        return stats
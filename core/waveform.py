@@ -0,0 +1,295 @@
+"""
+Waveform peaks for the seek bar.
+
+Each track is decoded once, in chunks (see core.decode), into min/max peaks per bucket of
+samples, plus mipmap levels that halve the resolution down to a few dozen buckets.
+The levels are stored in one binary file per track that is memory mapped when loaded,
+so showing a waveform reads only the pages of the level that is drawn.
+
+File layout (little endian): a header, a table of ``(offset, count)`` per level, then
+each level as ``count`` interleaved ``(min, max)`` int8 pairs (peaks scaled to 127).
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+from core.paths import user_cache_dir
+
+# Samples per bucket of the finest level
+BUCKET_FRAMES = 256
+# Mipmaps stop once a level has no more than this many buckets
+MIN_LEVEL_BUCKETS = 64
+
+_MAGIC = b"LPWF"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHIIQ")  # magic, version, levels, rate, bucket frames, frames
+_LEVEL = struct.Struct("<QI")        # byte offset, bucket count
+
+
+def _quantize(values):
+    return np.clip(np.round(values * 127), -127, 127).astype(np.int8)
+
+
+def _halve(level):
+    """Builds the next mipmap level from ``(count, 2)`` min/max pairs."""
+    if len(level) % 2:
+        level = np.concatenate([level, level[-1:]])
+    pairs = level.reshape(-1, 2, 2)
+    return np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1)
+
+
+def compute_levels(chunks, bucket_frames=BUCKET_FRAMES):
+    """
+    Reduces decoded ``(samples, rate)`` chunks to peaks. Returns ``(levels, rate, frames)``
+    with ``levels[0]`` the finest ``(count, 2)`` int8 min/max array.
+    """
+    buckets = []
+    carry = None
+    rate = 0
+    frames = 0
+    for samples, rate in chunks:
+        frames += len(samples)
+        # Channels are merged: the waveform shows the extremes of any channel
+        mono_min = samples.min(axis=1)
+        mono_max = samples.max(axis=1)
+        if carry is not None:
+            mono_min = np.concatenate([carry[0], mono_min])
+            mono_max = np.concatenate([carry[1], mono_max])
+        whole = len(mono_min) // bucket_frames * bucket_frames
+        if whole:
+            buckets.append(np.stack([
+                mono_min[:whole].reshape(-1, bucket_frames).min(axis=1),
+                mono_max[:whole].reshape(-1, bucket_frames).max(axis=1),
+            ], axis=1))
+        carry = (mono_min[whole:], mono_max[whole:])
+    if carry is not None and len(carry[0]):
+        buckets.append(np.array([[carry[0].min(), carry[1].max()]]))
+    if not buckets:
+        return [], rate, frames
+
+    levels = [_quantize(np.concatenate(buckets))]
+    while len(levels[-1]) > MIN_LEVEL_BUCKETS:
+        levels.append(_halve(levels[-1]))
+    return levels, rate, frames
+
+
+def write_peaks(path, levels, rate, frames, bucket_frames=BUCKET_FRAMES):
+    """Writes peak levels to ``path`` atomically."""
+    offset = _HEADER.size + _LEVEL.size * len(levels)
+    table = []
+    for level in levels:
+        table.append(_LEVEL.pack(offset, len(level)))
+        offset += level.nbytes
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(levels), rate, bucket_frames, frames))
+        f.write(b"".join(table))
+        for level in levels:
+            f.write(np.ascontiguousarray(level).tobytes())
+    os.replace(tmp_path, path)
+
+
+class Waveform:
+    """Memory-mapped peaks of one track."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, self.rate, self.bucket_frames, self.frames = _HEADER.unpack_from(self._map)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError("not a waveform file")
+            self.levels = []
+            for i in range(count):
+                offset, buckets = _LEVEL.unpack_from(self._map, _HEADER.size + i * _LEVEL.size)
+                self.levels.append(np.frombuffer(self._map, dtype=np.int8, count=buckets * 2,
+                                                 offset=offset).reshape(buckets, 2))
+        except (struct.error, ValueError):
+            self._map.close()
+            raise ValueError(f"invalid waveform file: {path}")
+        self._columns = {}
+
+    @property
+    def duration_ms(self):
+        return self.frames * 1000 // self.rate if self.rate else 0
+
+    def columns(self, width):
+        """
+        Returns ``(mins, maxs)`` float32 arrays in -1..1 with one entry per pixel column,
+        reduced from the coarsest level that still has at least ``width`` buckets.
+        """
+        cached = self._columns.get(width)
+        if cached is not None:
+            return cached
+        if not self.levels or width <= 0:
+            empty = np.zeros(max(0, width), dtype=np.float32)
+            return empty, empty
+        level = self.levels[0]
+        for candidate in self.levels:
+            if len(candidate) >= width:
+                level = candidate
+        edges = np.linspace(0, len(level), width + 1).astype(np.int64)
+        starts = np.minimum(edges[:-1], len(level) - 1)
+        mins = np.minimum.reduceat(level[:, 0], starts).astype(np.float32) / 127
+        maxs = np.maximum.reduceat(level[:, 1], starts).astype(np.float32) / 127
+        self._columns = {width: (mins, maxs)}  # Only the current width is worth keeping
+        return mins, maxs
+
+
+class WaveformService(QObject):
+    """
+    Generates and caches waveforms on a background worker.
+
+    ``request`` returns a cached waveform right away or schedules it; ``prefetch``
+    generates the waveforms of upcoming tracks ahead of time. Results are announced
+    through ``ready`` on the service's thread.
+    """
+    ready = Signal(str, object)  # track path, Waveform or None
+
+    def __init__(self, directory=None, max_disk_bytes=64 * 1024 * 1024, max_loaded=8, parent=None):
+        super().__init__(parent)
+        self.directory = directory or user_cache_dir("waveforms")
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_loaded = max_loaded
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()  # track path -> Waveform, least recently used first
+        self._pending = {}            # track path -> Future
+        self._failed = set()
+        # A single worker, so generating waveforms never competes with itself for the CPU
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="waveform")
+
+    def _cache_path(self, track_path):
+        try:
+            stat = os.stat(track_path)
+        except OSError:
+            return None
+        signature = f"{os.path.abspath(track_path)}|{stat.st_mtime_ns}|{stat.st_size}|{BUCKET_FRAMES}"
+        return os.path.join(self.directory, hashlib.sha1(signature.encode("utf-8", "surrogateescape")).hexdigest() + ".peaks")
+
+    def _remember(self, track_path, waveform):
+        with self._lock:
+            self._loaded[track_path] = waveform
+            self._loaded.move_to_end(track_path)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def cached(self, track_path):
+        """Returns the waveform if it is loaded or on disk (a cheap mmap), else None."""
+        with self._lock:
+            waveform = self._loaded.get(track_path)
+            if waveform is not None:
+                self._loaded.move_to_end(track_path)
+                return waveform
+        cache_path = self._cache_path(track_path)
+        if cache_path is None or not os.path.exists(cache_path):
+            return None
+        try:
+            waveform = Waveform(cache_path)
+        except (OSError, ValueError):
+            return None
+        os.utime(cache_path)  # Recently used files are evicted last
+        self._remember(track_path, waveform)
+        return waveform
+
+    def forget(self, track_paths):
+        """Unloads the waveforms of changed files; the disk cache is keyed by mtime and size already."""
+        with self._lock:
+            for path in track_paths:
+                self._loaded.pop(path, None)
+                self._failed.discard(path)
+
+    def request(self, track_path):
+        """Returns the waveform of ``track_path`` if available, otherwise generates it in the background."""
+        waveform = self.cached(track_path)
+        if waveform is None:
+            self._submit(track_path)
+        return waveform
+
+    def prefetch(self, track_paths):
+        """Generates waveforms for ``track_paths`` ahead of time, dropping stale queued work."""
+        wanted = set(track_paths)
+        with self._lock:
+            for path, future in list(self._pending.items()):
+                if path not in wanted and future.cancel():
+                    del self._pending[path]
+        for path in track_paths:
+            if self.cached(path) is None:
+                self._submit(path)
+
+    def _submit(self, track_path):
+        with self._lock:
+            if track_path in self._pending or track_path in self._failed:
+                return
+            future = self._executor.submit(self._generate, track_path)
+            self._pending[track_path] = future
+        future.add_done_callback(lambda f, path=track_path: self._on_done(path, f))
+
+    def _generate(self, track_path):
+        from core.decode import DecodeError, decode_chunks
+
+        cache_path = self._cache_path(track_path)
+        if cache_path is None:
+            return None
+        try:
+            with closing(decode_chunks(track_path)) as chunks:
+                levels, rate, frames = compute_levels(chunks)
+        except (DecodeError, OSError) as e:
+            print(f"Error generating waveform for {track_path}: {e}")
+            return None
+        if not levels:
+            return None
+        try:
+            write_peaks(cache_path, levels, rate, frames)
+            self._evict()
+            return Waveform(cache_path)
+        except (OSError, ValueError) as e:
+            print(f"Error caching waveform: {e}")
+            return None
+
+    def _on_done(self, track_path, future):
+        with self._lock:
+            self._pending.pop(track_path, None)
+        if future.cancelled():
+            return
+        try:
+            waveform = future.result()
+        except Exception as e:  # Anything _generate didn't expect; the track counts as failed
+            print(f"Error generating waveform for {track_path}: {e}")
+            waveform = None
+        if waveform is None:
+            with self._lock:
+                self._failed.add(track_path)
+        else:
+            self._remember(track_path, waveform)
+        self.ready.emit(track_path, waveform)
+
+    def _evict(self):
+        """Removes the least recently used files while the cache is over its byte budget."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".peaks"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)  # Mapped files stay readable until they are closed
+                total -= size
+            except OSError:
+                pass
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
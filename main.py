@@ -1,4 +1,32 @@
-from ui import main_window
+import os
+import sys
+
+
+def _enable_tracing(argv):
+    """
+    --trace has to take effect before the player modules are imported, because
+    core.tracing only instruments functions when it is enabled at import time.
+    """
+    if "--trace" not in argv:
+        return
+    path = "1"
+    for i, arg in enumerate(argv):
+        if arg.startswith("--trace-file="):
+            path = arg.split("=", 1)[1]
+        elif arg == "--trace-file" and i + 1 < len(argv):
+            path = argv[i + 1]
+    os.environ["LIQUID_TRACE"] = path
+
 
 if __name__ == "__main__":
+    _enable_tracing(sys.argv[1:])
+
+    if "--headless" in sys.argv[1:]:
+        # No window: the player is controlled over a local socket (see core.daemon)
+        from core import daemon
+        sys.exit(daemon.run(sys.argv[1:]))
+
+    from core import startup  # noqa: F401  (starts the startup clock)
+    from ui import main_window
+
     main_window.run()
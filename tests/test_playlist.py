@@ -0,0 +1,46 @@
+from core.playlist import Playlist
+
+
+def test_extend_empty_shuffled_playlist():
+    playlist = Playlist(["/music/a.flac", "/music/b.flac"])
+    playlist.set_shuffle(True, 0)
+    playlist.remove_paths(["/music/a.flac", "/music/b.flac"])
+    assert len(playlist) == 0
+
+    playlist.extend(["/music/c.flac", "/music/d.flac", "/music/e.flac"])
+
+    assert playlist.shuffle
+    assert sorted(playlist) == ["/music/c.flac", "/music/d.flac", "/music/e.flac"]
+    playlist.set_shuffle(False)
+    assert list(playlist) == ["/music/c.flac", "/music/d.flac", "/music/e.flac"]
+
+
+def test_shuffled_pop_and_logged_changes():
+    paths = [f"/music/{i}.flac" for i in range(3000)]
+    playlist = Playlist(paths)
+    playlist.set_shuffle(True, 0)
+    revision = playlist.revision
+    shuffled = list(playlist)
+
+    assert playlist.pop(10) == shuffled.pop(10)
+    playlist.enqueue(0)
+    playlist.pop_queued()
+    playlist.remove_paths([shuffled[5], shuffled[6], shuffled[20]])
+    del shuffled[20], shuffled[5:7]
+
+    assert list(playlist) == shuffled
+    assert playlist.changes_since(revision) == [("remove", 10, 1), ("remove", 20, 1), ("remove", 5, 2)]
+    playlist.set_shuffle(False)
+    assert playlist.changes_since(revision) is None
+    assert list(playlist) == [path for path in paths if path in set(shuffled)]
+
+
+def test_renames_compact_the_path_store(monkeypatch):
+    monkeypatch.setattr("core.playlist._PathStore.COMPACT_MIN_BYTES", 1024)
+    playlist = Playlist([f"/music/{i}.flac" for i in range(200)])
+    for i in range(50):
+        playlist.rename([(f"/music{i or ''}/", f"/music{i + 1}/")], prefix=True)
+
+    blob, _, lengths = playlist._store.buffers()
+    assert len(blob) <= 2 * sum(lengths)
+    assert list(playlist) == [f"/music50/{i}.flac" for i in range(200)]
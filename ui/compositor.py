@@ -0,0 +1,99 @@
+import sys
+import time
+import ctypes
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QColor
+
+# Constants for Acrylic effect
+WCA_ACCENT_POLICY = 19
+ACCENT_ENABLE_ACRYLICBLURBEHIND = 4
+
+class ACCENT_POLICY(ctypes.Structure):
+    _fields_ = [
+        ("AccentState", ctypes.c_uint),
+        ("AccentFlags", ctypes.c_uint),
+        ("GradientColor", ctypes.c_uint),
+        ("AnimationId", ctypes.c_uint),
+    ]
+
+class WINDOWCOMPOSITIONATTRIBDATA(ctypes.Structure):
+    _fields_ = [
+        ("Attribute", ctypes.c_int),
+        ("Data", ctypes.POINTER(ACCENT_POLICY)),
+        ("SizeOfData", ctypes.c_size_t),
+    ]
+
+
+class Compositor(QObject):
+    """
+    Applies the window tint through the platform compositor.
+
+    Updates are limited to ``max_fps`` per second; intermediate colors of an animation
+    are dropped and the latest one is applied once the frame interval has passed.
+    This base class has no compositor effect, so the window paints the tint itself.
+    """
+    blurs_background = False
+
+    def __init__(self, window, max_fps=30):
+        super().__init__(window)
+        self.window = window
+        self._interval = 1.0 / max_fps
+        self._pending = None
+        self._last_applied = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._flush)
+
+    def set_tint(self, color: QColor):
+        self._pending = QColor(color)
+        if self._timer.isActive():
+            return
+        wait = self._last_applied + self._interval - time.monotonic()
+        if wait <= 0:
+            self._flush()
+        else:
+            self._timer.start(int(wait * 1000) + 1)
+
+    def _flush(self):
+        color, self._pending = self._pending, None
+        if color is None:
+            return
+        self._last_applied = time.monotonic()
+        self.apply(color)
+
+    def apply(self, color: QColor):
+        pass
+
+
+class WindowsAcrylicCompositor(Compositor):
+    """Acrylic blur-behind through SetWindowCompositionAttribute (Windows 10+)."""
+    blurs_background = True
+
+    def __init__(self, window, max_fps=30):
+        super().__init__(window, max_fps)
+        self._set_window_composition_attribute = ctypes.windll.user32.SetWindowCompositionAttribute
+
+        # The structures are built once and only their color is updated per frame
+        self._accent = ACCENT_POLICY()
+        self._accent.AccentState = ACCENT_ENABLE_ACRYLICBLURBEHIND
+
+        self._data = WINDOWCOMPOSITIONATTRIBDATA()
+        self._data.Attribute = WCA_ACCENT_POLICY
+        self._data.SizeOfData = ctypes.sizeof(self._accent)
+        self._data.Data = ctypes.pointer(self._accent)
+
+    def apply(self, color: QColor):
+        self._accent.GradientColor = (color.alpha() << 24) | (color.blue() << 16) | (color.green() << 8) | color.red()
+        self._set_window_composition_attribute(int(self.window.winId()), ctypes.byref(self._data))
+
+
+def create_compositor(window, max_fps=30):
+    """
+    Returns the compositor backend for this platform. Linux (X11 and Wayland) and macOS
+    have no portable tint API, so they get the no-op backend.
+    """
+    if sys.platform == "win32":
+        return WindowsAcrylicCompositor(window, max_fps)
+    return Compositor(window, max_fps)
@@ -0,0 +1,69 @@
+"""
+Disk cache for rasterized qtawesome icons.
+
+Rendering a font icon needs qtawesome, which loads its icon fonts on import; that is
+a large part of the time before the first frame. Icons are therefore rasterized once
+per glyph, color, size and device pixel ratio and stored as PNG files, and qtawesome
+is only imported when an icon is missing from the cache.
+"""
+import hashlib
+import os
+
+from PySide6.QtCore import QSize
+from PySide6.QtGui import QGuiApplication, QIcon, QImage, QPixmap
+
+from core.paths import user_cache_dir
+
+# Bump when the rendering changes so old files are not reused
+CACHE_VERSION = 1
+
+# Kept as QImages: QPixmaps must not outlive the QGuiApplication
+_images = {}
+_directory = None
+
+
+def _cache_path(name, color, size, dpr):
+    global _directory
+    if _directory is None:
+        _directory = user_cache_dir("icons")
+    digest = hashlib.sha1(f"{CACHE_VERSION}|{name}|{color}|{size}|{dpr:g}".encode("utf-8")).hexdigest()
+    return os.path.join(_directory, digest + ".png")
+
+
+def _render(name, color, size, dpr):
+    import qtawesome
+    return qtawesome.icon(name, color=color).pixmap(QSize(size, size), dpr)
+
+
+def _save(image, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if image.save(tmp_path, "PNG"):
+        try:
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error caching icon: {e}")
+
+
+def pixmap(name, color, size, dpr=None):
+    """
+    Returns the qtawesome glyph ``name`` (e.g. ``'fa5s.music'``) drawn in ``color`` at
+    ``size`` x ``size`` logical pixels for the given device pixel ratio.
+    """
+    if dpr is None:
+        dpr = QGuiApplication.instance().devicePixelRatio()
+    key = (name, color, size, dpr)
+    image = _images.get(key)
+    if image is None:
+        path = _cache_path(name, color, size, dpr)
+        image = QImage(path) if os.path.exists(path) else QImage()
+        if image.isNull():
+            image = _render(name, color, size, dpr).toImage()
+            _save(image, path)
+        image.setDevicePixelRatio(dpr)
+        _images[key] = image
+    return QPixmap.fromImage(image)
+
+
+def icon(name, color, size, dpr=None):
+    """Returns the glyph as a QIcon, for use at ``size`` x ``size`` logical pixels."""
+    return QIcon(pixmap(name, color, size, dpr))
@@ -1,32 +1,22 @@
+import os
 import sys
+import argparse
 from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout
-from PySide6.QtCore import Qt, QPoint, QTimer, Property, QPropertyAnimation
-from PySide6.QtGui import QColor
-import ctypes
-from ctypes import wintypes
+from PySide6.QtCore import Qt, QPoint, QTimer, Property, QPropertyAnimation, QRectF
+from PySide6.QtGui import QColor, QKeySequence, QPainter, QPen, QShortcut
+from core import startup
+from core.decks import CURVES
+from core.playlist_io import PlaylistLoader, is_playlist
+from core.tracing import span
+from ui.compositor import create_compositor
 from ui.widgets.album_art_widget import AlbumArtWidget
 from ui.widgets.progress_slider import ProgressSlider
 
-# Constants for Acrylic effect
-WCA_ACCENT_POLICY = 19
-ACCENT_ENABLE_ACRYLICBLURBEHIND = 4
-
-class ACCENT_POLICY(ctypes.Structure):
-    _fields_ = [
-        ("AccentState", ctypes.c_uint),
-        ("AccentFlags", ctypes.c_uint),
-        ("GradientColor", ctypes.c_uint),
-        ("AnimationId", ctypes.c_uint),
-    ]
-
-class WINDOWCOMPOSITIONATTRIBDATA(ctypes.Structure):
-    _fields_ = [
-        ("Attribute", ctypes.c_int),
-        ("Data", ctypes.POINTER(ACCENT_POLICY)),
-        ("SizeOfData", ctypes.c_size_t),
-    ]
-
 class MainWindow(QMainWindow):
+    DEFAULT_TINT = QColor(255, 255, 255, 30)
+    PALETTE_TINT_ALPHA = 120
+    SPECTRUM_HEIGHT = 28
+
     def __init__(self):
         super().__init__()
 
@@ -38,6 +28,11 @@ class MainWindow(QMainWindow):
         
         self.resize(self.width, self.height)
 
+        # The tint is pushed to the platform compositor at a bounded frame rate, while the
+        # border is painted from a cached pen so animation frames don't re-parse stylesheets
+        self.compositor = create_compositor(self)
+        self._border_pen = QPen(QColor(0, 0, 0, 0), 2)
+
         self.central_widget = QWidget()
         self.central_widget.setObjectName("central_widget")
         self.setCentralWidget(self.central_widget)
@@ -59,47 +54,96 @@ class MainWindow(QMainWindow):
 
         self.main_layout.addStretch()
 
+        self.spectrum = None  # Created by show_visualizer()
+        self.player = None
+        self.playlist_view = None  # Created the first time it is toggled
+        QShortcut(QKeySequence("L"), self, self.toggle_playlist)
+
         self.dragging = False
         self.offset = QPoint()
 
         # Set default tint color to white
-        default_color = QColor(255, 255, 255, 30)
-        self.set_tint_color(default_color)
+        self.set_tint_color(self.DEFAULT_TINT)
+
+    def bind_player(self, player):
+        """Connects a Player's signals to the window's widgets."""
+        self.player = player
+        player.album_art_changed.connect(self.album_art.set_album_art)
+        player.position_changed.connect(self.progress_slider.update_progress)
+        player.palette_changed.connect(self.apply_palette)
+        player.waveform_changed.connect(self.progress_slider.set_waveform)
+        self.progress_slider.set_waveform(player.waveform)
+        player.end_reached.connect(player.next)
+        self.progress_slider.seek_requested.connect(player.seek)
+
+    def toggle_playlist(self):
+        """Shows or hides the playlist window."""
+        if self.player is None:
+            return
+        if self.playlist_view is None:
+            from ui.widgets.playlist_view import PlaylistView
+            self.playlist_view = PlaylistView(self.player, parent=self)
+        self.playlist_view.setVisible(not self.playlist_view.isVisible())
+
+    def show_visualizer(self, tap):
+        """Adds a spectrum and level meter for ``tap`` (a core.visualizer.AudioTap) under the art."""
+        from ui.widgets.spectrum_widget import SpectrumWidget
+
+        self.spectrum = SpectrumWidget(fps=tap.fps)
+        self.spectrum.setFixedSize(200, self.SPECTRUM_HEIGHT)
+        self.main_layout.insertWidget(2, self.spectrum, alignment=Qt.AlignmentFlag.AlignHCenter)
+        self.main_layout.insertSpacing(3, 4)
+        self.height += self.SPECTRUM_HEIGHT + 4
+        self.resize(self.width, self.height)
+        self.spectrum.set_source(tap)
+
+    @span("MainWindow.apply_palette")
+    def apply_palette(self, palette):
+        """Animates the window to the colors extracted from the album art (see core.palette)."""
+        if not palette:
+            self.progress_slider.set_label_color(None)
+            self.progress_slider.set_elapsed_color(QColor(ProgressSlider.DEFAULT_ELAPSED_COLOR))
+            if self.spectrum is not None:
+                self.spectrum.set_color(QColor(255, 255, 255))
+            self.start_color_animation(self.DEFAULT_TINT)
+            return
+
+        tint = QColor(palette["tint"])
+        tint.setAlpha(self.PALETTE_TINT_ALPHA)
+        self.progress_slider.set_elapsed_color(QColor(palette["accent"]))
+        self.progress_slider.set_label_color(QColor(palette["text"]))
+        if self.spectrum is not None:
+            self.spectrum.set_color(QColor(palette["accent"]))
+        self.start_color_animation(tint)
 
     def get_tint_color(self):
         return self._tint_color
 
+    @span("MainWindow.set_tint_color")
     def set_tint_color(self, color: QColor):
         '''Sets the tint color for the acrylic effect.'''
         self._tint_color = color
-        user32 = ctypes.windll.user32
-        set_window_composition_attribute = user32.SetWindowCompositionAttribute
-
-        accent = ACCENT_POLICY()
-        accent.AccentState = ACCENT_ENABLE_ACRYLICBLURBEHIND
-        
-        gradient_color = (color.alpha() << 24) | (color.blue() << 16) | (color.green() << 8) | color.red()
-        accent.GradientColor = gradient_color
-
-        data = WINDOWCOMPOSITIONATTRIBDATA()
-        data.Attribute = WCA_ACCENT_POLICY
-        data.SizeOfData = ctypes.sizeof(accent)
-        data.Data = ctypes.cast(ctypes.pointer(accent), ctypes.POINTER(ACCENT_POLICY))
-
-        set_window_composition_attribute(int(self.winId()), ctypes.pointer(data))
-        
-        border_color = color.lighter(150)
-        self.central_widget.setStyleSheet(f'''
-            #central_widget {{
-                background-color: transparent;
-                border: 2px solid {border_color.name()};
-                border-radius: 10px;
-            }}
-        ''')
+        self.compositor.set_tint(color)
+        self._border_pen.setColor(color.lighter(150))
+        self.update()
         self.progress_slider.set_main_window_color(color)
 
     tint_color = Property(QColor, get_tint_color, set_tint_color)
 
+    @span("MainWindow.paintEvent")
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = QRectF(self.central_widget.geometry()).adjusted(1, 1, -1, -1)
+        if not self.compositor.blurs_background:
+            # Without a compositor effect the tint is painted as a translucent fill
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(self._tint_color)
+            painter.drawRoundedRect(rect, 10, 10)
+        painter.setPen(self._border_pen)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRoundedRect(rect, 10, 10)
+
     def start_color_animation(self, color: QColor):
         self.anim = QPropertyAnimation(self, b"tint_color")
         self.anim.setEndValue(color)
@@ -120,11 +164,139 @@ class MainWindow(QMainWindow):
         self.dragging = False
         event.accept()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="liquid-player")
+    parser.add_argument("paths", nargs="*", help="audio files and playlists (M3U, M3U8, PLS, XSPF) to play")
+    # Handled by main.py before anything is imported (see core.tracing); listed for --help
+    parser.add_argument("--headless", action="store_true",
+                        help="play without a window, controlled over a local socket (see --headless --help)")
+    parser.add_argument("--trace", action="store_true", help="record timing spans and print periodic summaries")
+    parser.add_argument("--trace-file", metavar="PATH", help="where --trace writes its Chrome trace-event JSON")
+    parser.add_argument("--startup-report", nargs="?", const="", metavar="JSON",
+                        help="print startup timings once the player is ready (and write them to JSON)")
+    parser.add_argument("--startup-budget", type=float, default=startup.DEFAULT_BUDGET_MS, metavar="MS",
+                        help="time-to-first-frame budget checked by the startup report")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="quit once started, with exit status 1 if the first frame was over budget")
+    parser.add_argument("--gapless", action="store_true",
+                        help="start the next track exactly where the current one ends")
+    parser.add_argument("--crossfade", type=int, default=0, metavar="MS",
+                        help="crossfade consecutive tracks over MS milliseconds (implies --gapless)")
+    parser.add_argument("--crossfade-curve", choices=sorted(CURVES), default="equal_power",
+                        help="volume curve of the crossfade")
+    parser.add_argument("--no-session", action="store_true",
+                        help="neither resume the last session (when started without paths) nor save this one")
+    parser.add_argument("--visualizer", action="store_true",
+                        help="show a live spectrum and level meter (audio is then played through Qt Multimedia)")
+    parser.add_argument("--no-library", action="store_true",
+                        help="don't open the music library (no loudness normalization or indexed tags)")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="play one copy of tracks known to be duplicates (see python -m core.dedupe)")
+    parser.add_argument("--readahead", type=int, default=3, metavar="N",
+                        help="pull the next N tracks into the page cache ahead of time (0 disables)")
+    parser.add_argument("--watch", action="append", default=[], metavar="DIR",
+                        help="keep the playlist in sync with files added, moved or deleted below DIR (repeatable)")
+    # Unknown arguments are left for Qt (e.g. -platform)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+def _report_playlist_loaded(stats):
+    print(f"Loaded {stats['entries']} playlist entries in {stats['seconds']:.2f}s "
+          f"({stats['entries_per_second']:.0f} entries/s, {stats['mb_per_second']:.1f} MB/s)")
+
 def run():
+    args = parse_args()
+    startup.mark("modules_imported")
     app = QApplication(sys.argv)
+    startup.mark("app_created")
     window = MainWindow()
+    startup.mark("window_created")
+
+    # The window is shown first; the player modules and libVLC are loaded in the background
+    watcher = startup.watch_first_frame(window)
+    backend = startup.BackendLoader(parent=window)
+    loaders = []
+
+    def on_backend_ready(instance):
+        if instance is None:
+            finish_startup(None)
+            return
+        from core.player import Player
+        from core.dedupe import known_duplicates
+        from core.library import Library
+        from core import session
+
+        # The library supplies loudness gains (see Library.analyze_loudness) and indexed tags
+        library = None if args.no_library else Library()
+        # Absolute, like the paths from playlist files, the library and the file watcher
+        tracks = [os.path.abspath(path) for path in args.paths if not is_playlist(path)]
+        player = Player(tracks, instance=instance, library=library,
+                        gapless=args.gapless, crossfade_ms=max(0, args.crossfade), crossfade_curve=args.crossfade_curve,
+                        readahead_tracks=max(0, args.readahead),
+                        duplicates=known_duplicates(library) if args.skip_duplicates else None)
+        window.bind_player(player)
+
+        # The tap takes over the decks' audio output, which has to happen before playback starts
+        if args.visualizer:
+            from core.visualizer import AudioTap
+            try:
+                tap = AudioTap(player, parent=window)
+            except ImportError as e:  # PySide6 without QtMultimedia (or its audio backend)
+                print(f"Visualizer not available: {e}")
+            else:
+                window.show_visualizer(tap)
+                app.aboutToQuit.connect(tap.stop)
+
+        # Without paths, the last session picks up where it left off
+        saved = session.load_session() if not args.paths and not args.no_session else None
+        if saved is not None:
+            player.set_volume(saved["volume"])
+            player.set_mute(saved["muted"])
+            player.resume(saved["playlist"], saved["index"], saved["position_ms"], play=saved["playing"])
+            startup.mark("session_resumed")
+        if not args.no_session:
+            recorder = session.SessionRecorder(player, generation=saved["generation"] if saved else 0, parent=window)
+            app.aboutToQuit.connect(recorder.close)
+
+        if args.watch:
+            from core.watcher import FileWatcher
+            file_watcher = FileWatcher(args.watch, library=library, parent=window)
+            file_watcher.changed.connect(player.apply_changes, Qt.ConnectionType.QueuedConnection)
+            app.aboutToQuit.connect(file_watcher.stop)
+            file_watcher.start()
+
+        # Playlist files are streamed in the background; playback starts with the first entry
+        for path in args.paths:
+            if is_playlist(path):
+                loader = PlaylistLoader(path, parent=window)
+                loader.entries_loaded.connect(lambda entries: player.add_tracks(entries, autoplay=True),
+                                              Qt.ConnectionType.QueuedConnection)
+                loader.finished.connect(_report_playlist_loaded)
+                loaders.append(loader)
+
+        if player.playlist and saved is None:
+            player.play_pause()
+        for loader in loaders:
+            loader.start()
+        finish_startup(player)
+
+    def finish_startup(player):
+        startup.mark("player_ready")
+        if "first_frame" not in startup.marks():
+            # Headless platforms may not paint before the backend is up
+            watcher.painted.connect(lambda: finish_startup(player))
+            return
+        within_budget = True
+        if args.startup_report is not None or args.exit_after_startup:
+            within_budget = startup.report(args.startup_budget, args.startup_report or None)
+        if args.exit_after_startup:
+            app.exit(0 if within_budget else 1)
+
+    backend.ready.connect(on_backend_ready, Qt.ConnectionType.QueuedConnection)
     window.show()
-    
+    startup.mark("window_shown")
+    backend.start()
+
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import os
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QFont
+
+
+class PlaylistModel(QAbstractListModel):
+    """
+    Lazy list model over a ``core.playlist.Playlist``.
+
+    Rows are exposed to the view in batches through ``canFetchMore``/``fetchMore``, and
+    a row's text is only produced when the view asks for it, so attaching a view to a
+    very large playlist costs nothing up front. The playlist isn't a QObject, so changes
+    are picked up by ``sync()``, which compares ``Playlist.revision`` and replays the
+    playlist's logged edits as row insertions and removals, resetting only after bulk
+    changes.
+    """
+    BATCH_SIZE = 256
+
+    def __init__(self, playlist, parent=None):
+        super().__init__(parent)
+        self.playlist = playlist
+        self._revision = playlist.revision
+        self._length = len(playlist)  # As of the last sync, which fetchMore must not run ahead of
+        self._loaded = 0
+        self.current_row = -1
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < self._length
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.BATCH_SIZE, self._length - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        # Until the next sync() the playlist may already be shorter than the loaded rows
+        if not index.isValid() or not 0 <= index.row() < min(self._loaded, len(self.playlist)):
+            return None
+        if role == Qt.DisplayRole:
+            return os.path.basename(self.playlist[index.row()])
+        if role == Qt.ToolTipRole:
+            return self.playlist[index.row()]
+        if role == Qt.FontRole and index.row() == self.current_row:
+            font = QFont()
+            font.setBold(True)
+            return font
+        return None
+
+    def set_current_row(self, row):
+        """Highlights the playing track."""
+        if row == self.current_row:
+            return
+        previous, self.current_row = self.current_row, row
+        for changed in (previous, row):
+            if 0 <= changed < self._loaded:
+                index = self.index(changed)
+                self.dataChanged.emit(index, index, [Qt.FontRole])
+
+    def sync(self, playlist=None):
+        """
+        Applies the changes made to the playlist since the last sync. The model is reset
+        if ``playlist`` replaced the shown one (e.g. a resumed session) or the changes
+        weren't small edits (shuffle, many removals). Returns True if it was reset.
+        """
+        if playlist is not None and playlist is not self.playlist:
+            self.playlist = playlist
+            self.reload()
+            return True
+        if self.playlist.revision == self._revision:
+            return False
+        edits = self.playlist.changes_since(self._revision)
+        if edits is None:
+            self.reload()
+            return True
+        self._revision = self.playlist.revision
+        for kind, position, count in edits:
+            self._apply(kind, position, count)
+        return False
+
+    def _apply(self, kind, position, count):
+        """Replays one of the playlist's edits on the loaded rows."""
+        end = min(position + count, self._loaded)
+        if kind == "insert":
+            self._length += count
+            if position < self._loaded:  # Rows past the loaded ones come in through fetchMore
+                self.beginInsertRows(QModelIndex(), position, position + count - 1)
+                self._loaded += count
+                self.endInsertRows()
+            if 0 <= position <= self.current_row:
+                self.current_row += count
+        elif kind == "remove":
+            self._length -= count
+            if position < end:
+                self.beginRemoveRows(QModelIndex(), position, end - 1)
+                self._loaded -= end - position
+                self.endRemoveRows()
+            if position <= self.current_row < position + count:
+                self.current_row = -1
+            elif self.current_row >= position + count:
+                self.current_row -= count
+        elif kind == "update" and position < end:
+            self.dataChanged.emit(self.index(position), self.index(end - 1), [Qt.DisplayRole, Qt.ToolTipRole])
+
+    def reload(self):
+        """Resets the model after the playlist changed (e.g. shuffle was toggled)."""
+        self.beginResetModel()
+        self._revision = self.playlist.revision
+        self._length = len(self.playlist)
+        self._loaded = min(self._loaded, self._length)
+        if self.current_row >= len(self.playlist):
+            self.current_row = -1
+        self.endResetModel()
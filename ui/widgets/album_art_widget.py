@@ -1,10 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout
 from PySide6.QtGui import QPixmap
-from PySide6.QtCore import Qt, QSize
-import qtawesome
-from urllib.parse import unquote
+from PySide6.QtCore import Qt, Signal
+from core.art_cache import default_cache
+from core.tracing import span, trace_signals
+from ui import icon_cache
+
+# Covers are decoded off the GUI thread; one worker keeps decodes in request order
+_decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="art-decode")
 
 class AlbumArtWidget(QWidget):
+    _image_decoded = Signal(object, object)  # request, QImage or None
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumSize(200, 200)
@@ -18,20 +25,16 @@ class AlbumArtWidget(QWidget):
         layout.addWidget(self.album_art_label)
 
         # Set a default placeholder icon
-        self.default_pixmap = qtawesome.icon('fa5s.music', color='#555555').pixmap(QSize(150, 150))
-        self.pixmap = None
+        self.default_pixmap = icon_cache.pixmap('fa5s.music', '#555555', 150, self.devicePixelRatioF())
+        self.art_url = None
+        self._request = None
+        self._image_decoded.connect(self._on_image_decoded)
+        trace_signals(self, "_image_decoded")
         self.set_album_art(None)
 
+    @span("AlbumArtWidget.set_album_art")
     def set_album_art(self, image_path):
-        if image_path and image_path.startswith('file:///'):
-            path = unquote(image_path[8:])
-            self.pixmap = QPixmap(path)
-        else:
-            self.pixmap = self.default_pixmap
-        
-        if self.pixmap.isNull():
-            self.pixmap = self.default_pixmap
-
+        self.art_url = image_path if image_path and image_path.startswith('file:///') else None
         self.update_pixmap()
 
     def resizeEvent(self, event):
@@ -39,5 +42,50 @@ class AlbumArtWidget(QWidget):
         self.update_pixmap()
 
     def update_pixmap(self):
-        if self.pixmap:
-            self.album_art_label.setPixmap(self.pixmap.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
\ No newline at end of file
+        """Shows the art at the widget's device-pixel size, decoding it in the background if needed."""
+        if not self.art_url:
+            self._request = None
+            self._show_placeholder()
+            return
+
+        dpr = self.devicePixelRatioF()
+        width = max(1, round(self.width() * dpr))
+        height = max(1, round(self.height() * dpr))
+        request = (self.art_url, width, height, dpr)
+        if request == self._request:
+            return  # Already shown or being decoded
+
+        self._request = request
+        image = default_cache().cached_image(*request)
+        if image is not None:
+            self._show_image(image, dpr)
+            return
+
+        future = _decoder.submit(default_cache().scaled_image, *request)
+        future.add_done_callback(lambda f: self._emit_decoded(request, f))
+
+    def _emit_decoded(self, request, future):
+        """Runs on the decoder thread; a failed decode shows the placeholder for that request."""
+        try:
+            image = future.result()
+        except Exception as e:
+            print(f"Error decoding album art {request[0]}: {e}")
+            image = None
+        self._image_decoded.emit(request, image)
+
+    @span("AlbumArtWidget._on_image_decoded")
+    def _on_image_decoded(self, request, image):
+        if request != self._request:
+            return  # A newer track or size was requested meanwhile
+        if image is None:
+            self._show_placeholder()
+        else:
+            self._show_image(image, request[3])
+
+    def _show_image(self, image, dpr):
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(dpr)
+        self.album_art_label.setPixmap(pixmap)
+
+    def _show_placeholder(self):
+        self.album_art_label.setPixmap(self.default_pixmap)
@@ -1,6 +1,6 @@
-import qtawesome
 from PySide6.QtCore import QSize, Qt, Signal, QTimer
 from PySide6.QtWidgets import QWidget, QPushButton, QHBoxLayout, QSlider, QLabel
+from ui import icon_cache
 
 class PlayerControlsWidget(QWidget):
     next_requested = Signal()
@@ -30,20 +30,20 @@ class PlayerControlsWidget(QWidget):
         """
 
         # --- Playback Buttons ---
-        self.prev_button = QPushButton(qtawesome.icon('fa5s.step-backward', color=self.icon_color), "")
+        self.prev_button = QPushButton(icon_cache.icon('fa5s.step-backward', self.icon_color, 48), "")
         self.prev_button.setIconSize(icon_size)
         self.prev_button.setFixedSize(icon_size)
         self.prev_button.setStyleSheet(button_style)
 
-        self.play_icon = qtawesome.icon('fa5s.play-circle', color=self.icon_color)
-        self.pause_icon = qtawesome.icon('fa5s.pause-circle', color=self.icon_color)
+        self.play_icon = icon_cache.icon('fa5s.play-circle', self.icon_color, 48)
+        self.pause_icon = icon_cache.icon('fa5s.pause-circle', self.icon_color, 48)
 
         self.play_button = QPushButton(self.play_icon, "")
         self.play_button.setIconSize(icon_size)
         self.play_button.setFixedSize(icon_size)
         self.play_button.setStyleSheet(button_style)
 
-        self.next_button = QPushButton(qtawesome.icon('fa5s.step-forward', color=self.icon_color), "")
+        self.next_button = QPushButton(icon_cache.icon('fa5s.step-forward', self.icon_color, 48), "")
         self.next_button.setIconSize(icon_size)
         self.next_button.setFixedSize(icon_size)
         self.next_button.setStyleSheet(button_style)
@@ -59,8 +59,8 @@ class PlayerControlsWidget(QWidget):
         volume_layout = QHBoxLayout(self.volume_container)
         volume_layout.setContentsMargins(0,0,0,0)
 
-        self.volume_up_icon = qtawesome.icon('fa5s.volume-up', color=self.icon_color)
-        self.volume_mute_icon = qtawesome.icon('fa5s.volume-mute', color=self.icon_color)
+        self.volume_up_icon = icon_cache.icon('fa5s.volume-up', self.icon_color, 24)
+        self.volume_mute_icon = icon_cache.icon('fa5s.volume-mute', self.icon_color, 24)
 
         self.volume_button = QPushButton(self.volume_up_icon, "")
         self.volume_button.setIconSize(QSize(24, 24))
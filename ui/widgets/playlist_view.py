@@ -0,0 +1,54 @@
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QListView
+
+from ui.playlist_model import PlaylistModel
+
+
+class PlaylistView(QListView):
+    """
+    The player's playlist in a small tool window (toggled with L in the main window).
+    While it is shown, the model is synced with the playlist a few times a second, so
+    removals, shuffle and replaced playlists never leave it pointing past the end.
+    Double-clicking a track plays it.
+    """
+    SYNC_INTERVAL_MS = 250
+
+    def __init__(self, player, parent=None):
+        super().__init__(parent)
+        self.setWindowFlag(Qt.WindowType.Tool)
+        self.setWindowTitle("Playlist")
+        self.setUniformItemSizes(True)  # Rows aren't measured one by one on large playlists
+        self.resize(320, 420)
+
+        self.player = player
+        self.playlist_model = PlaylistModel(player.playlist, parent=self)
+        self.setModel(self.playlist_model)
+
+        self._sync_timer = QTimer(self)
+        self._sync_timer.setInterval(self.SYNC_INTERVAL_MS)
+        self._sync_timer.timeout.connect(self.sync)
+
+        self.doubleClicked.connect(self._play_row)
+        player.track_changed.connect(self._on_track_changed)
+
+    def sync(self):
+        scroll = self.verticalScrollBar().value()
+        if self.playlist_model.sync(self.player.playlist):
+            self.verticalScrollBar().setValue(scroll)
+        self.playlist_model.set_current_row(self.player.current_track_index)
+
+    def _play_row(self, index):
+        self.player.play_index(index.row())
+
+    def _on_track_changed(self, path):
+        if self.isVisible():
+            self.sync()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.sync()
+        self._sync_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._sync_timer.stop()
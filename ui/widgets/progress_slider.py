@@ -1,18 +1,129 @@
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtWidgets import QWidget, QSlider, QHBoxLayout, QVBoxLayout, QLabel, QToolTip
-from PySide6.QtGui import QCursor, QColor
+from PySide6.QtCore import Qt, Signal, QLineF, QPointF, QRect, QRectF
+from PySide6.QtWidgets import QWidget, QAbstractSlider, QSlider, QHBoxLayout, QVBoxLayout, QLabel, QToolTip
+from PySide6.QtGui import QCursor, QColor, QPainter, QPalette, QPen
+from core.tracing import span, trace_signals
+
+class TrackSlider(QSlider):
+    """
+    A horizontal slider that paints its groove and handle from cached colors, so that
+    recoloring it (e.g. on every frame of a tint animation) doesn't re-parse a stylesheet.
+    With a waveform set, the groove is drawn as the track's peaks. Progress ticks only
+    repaint the strip between the old and the new handle position.
+    """
+    GROOVE_HEIGHT = 4
+    HANDLE_SIZE = 12
+    WAVEFORM_HEIGHT = 28
+
+    def __init__(self, parent=None):
+        super().__init__(Qt.Horizontal, parent)
+        self.setMinimumHeight(self.HANDLE_SIZE + 4)
+        self._groove_color = QColor()
+        self._elapsed_color = QColor()
+        self._handle_pen = QPen(QColor(), 1)
+        self._waveform = None
+        self._painted_x = None  # Handle position of the last paint
+
+    def set_waveform(self, waveform):
+        """Draws the groove as ``waveform``'s peaks (a core.waveform.Waveform), or flat for None."""
+        if waveform is self._waveform:
+            return
+        self._waveform = waveform
+        self.setMinimumHeight(self.WAVEFORM_HEIGHT if waveform is not None else self.HANDLE_SIZE + 4)
+        self.update()
+
+    def set_colors(self, groove: QColor, elapsed: QColor, handle_border: QColor):
+        self._groove_color = QColor(groove)
+        self._elapsed_color = QColor(elapsed)
+        self._handle_pen.setColor(handle_border)
+        self.update()
+
+    def handle_x(self):
+        """Returns the x coordinate of the handle's center for the current value."""
+        half = self.HANDLE_SIZE / 2
+        span = self.width() - self.HANDLE_SIZE
+        if self.maximum() <= self.minimum():
+            return half
+        return half + span * (self.value() - self.minimum()) / (self.maximum() - self.minimum())
+
+    def sliderChange(self, change):
+        if change != QAbstractSlider.SliderChange.SliderValueChange or self._painted_x is None:
+            super().sliderChange(change)
+            return
+        # Only the strip the handle moved across (plus the handle itself) changes
+        new_x = self.handle_x()
+        left = int(min(self._painted_x, new_x) - self.HANDLE_SIZE / 2) - 2
+        right = int(max(self._painted_x, new_x) + self.HANDLE_SIZE / 2) + 2
+        self.update(QRect(left, 0, right - left, self.height()))
+
+    def resizeEvent(self, event):
+        self._painted_x = None
+        super().resizeEvent(event)
+
+    def _paint_waveform(self, painter, dirty, handle_x):
+        """Draws one vertical peak line per pixel column inside ``dirty``."""
+        half = self.HANDLE_SIZE // 2
+        columns = max(1, self.width() - self.HANDLE_SIZE)
+        mins, maxs = self._waveform.columns(columns)
+        first = max(0, dirty.left() - half)
+        last = min(columns, dirty.right() - half + 1)
+        if first >= last:
+            return
+        center_y = self.height() / 2
+        scale = (self.height() - 2) / 2
+        played, unplayed = [], []
+        for i in range(first, last):
+            x = half + i + 0.5
+            # Keep silent passages visible as a thin line
+            line = QLineF(x, center_y - max(float(maxs[i]) * scale, 0.5), x, center_y - min(float(mins[i]) * scale, -0.5))
+            (played if x <= handle_x else unplayed).append(line)
+        painter.setPen(QPen(self._elapsed_color, 1))
+        painter.drawLines(played)
+        painter.setPen(QPen(self._groove_color.lighter(160) if self._groove_color.lightness() < 128 else self._groove_color.darker(130), 1))
+        painter.drawLines(unplayed)
+
+    @span("TrackSlider.paintEvent")
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        half = self.HANDLE_SIZE / 2
+        center_y = self.height() / 2
+        top = center_y - self.GROOVE_HEIGHT / 2
+        radius = self.GROOVE_HEIGHT / 2
+        handle_x = self.handle_x()
+        self._painted_x = handle_x
+
+        if self._waveform is not None:
+            self._paint_waveform(painter, event.rect(), handle_x)
+        else:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(self._groove_color)
+            painter.drawRoundedRect(QRectF(half, top, self.width() - self.HANDLE_SIZE, self.GROOVE_HEIGHT), radius, radius)
+            painter.setBrush(self._elapsed_color)
+            painter.drawRoundedRect(QRectF(half, top, handle_x - half, self.GROOVE_HEIGHT), radius, radius)
+
+        painter.setPen(self._handle_pen)
+        painter.setBrush(self._groove_color)
+        painter.drawEllipse(QPointF(handle_x, center_y), half - 0.5, half - 0.5)
+
 
 class ProgressSlider(QWidget):
     """
     A widget containing a slider and labels to display and control track progress.
     """
     seek_requested = Signal(float)
+    DEFAULT_ELAPSED_COLOR = "#A8E6CF"  # Gentle green
 
     def __init__(self, main_window_color: QColor, parent=None):
         super().__init__(parent)
         self._is_seeking = False
+        # What is currently displayed, so unchanged updates don't touch the widgets
+        self._shown_duration = None
+        self._shown_second = None
+        self._shown_total_second = None
         self._main_window_color = main_window_color
-        self._elapsed_color = QColor("#A8E6CF")  # Gentle green
+        self._elapsed_color = QColor(self.DEFAULT_ELAPSED_COLOR)
+        self._label_color = None  # None means the inverted main window color
 
         # --- Layout ---
         main_layout = QVBoxLayout(self)
@@ -29,62 +140,56 @@ class ProgressSlider(QWidget):
         labels_layout.addStretch()
         labels_layout.addWidget(self.total_time_label)
 
-        self.slider = QSlider(Qt.Horizontal)
+        self.slider = TrackSlider()
 
         main_layout.addLayout(labels_layout)
         main_layout.addWidget(self.slider)
 
-        self.update_stylesheet()
+        self.update_colors()
+        self._update_tooltip_style()
 
         # --- Connections ---
         self.slider.sliderMoved.connect(self.on_slider_moved)
         self.slider.sliderPressed.connect(self.on_slider_pressed)
         self.slider.sliderReleased.connect(self.on_slider_released)
+        trace_signals(self, "seek_requested")
 
     def set_elapsed_color(self, color: QColor):
         self._elapsed_color = color
-        self.update_stylesheet()
+        self.update_colors()
+        self._update_tooltip_style()
 
     def set_main_window_color(self, color: QColor):
         self._main_window_color = color
-        self.update_stylesheet()
+        self.update_colors()
 
-    def update_stylesheet(self):
-        main_window_color_hex = self._main_window_color.name()
-        
-        # Invert the main window color for the outer handle
+    def set_waveform(self, waveform):
+        self.slider.set_waveform(waveform)
+
+    def set_label_color(self, color):
+        """Overrides the label color (e.g. with a contrast-checked palette color); None resets it."""
+        self._label_color = color
+        self.update_colors()
+
+    def update_colors(self):
+        # Invert the main window color for the outer handle and the labels
         inverted_color = QColor(
             255 - self._main_window_color.red(),
             255 - self._main_window_color.green(),
             255 - self._main_window_color.blue()
         )
-        inverted_color_hex = inverted_color.name()
-
-        self.slider.setStyleSheet(f"""
-            QSlider::groove:horizontal {{
-                height: 4px;
-                background: {main_window_color_hex};
-                margin: 2px 0;
-                border-radius: 2px;
-            }}
-            QSlider::sub-page:horizontal {{
-                background: {self._elapsed_color.name()};
-                height: 4px;
-                border-radius: 2px;
-                margin: 2px 0;
-            }}
-            QSlider::handle:horizontal {{
-                background: {main_window_color_hex};
-                border: 1px solid {inverted_color_hex};
-                width: 12px;
-                height: 12px;
-                margin: -4px 0;
-                border-radius: 6px;
-            }}
-        """)
-        self.current_time_label.setStyleSheet(f"color: {inverted_color.name()};")
-        self.total_time_label.setStyleSheet(f"color: {inverted_color.name()};")
-        
+        # Opaque like the stylesheet colors were (QColor.name() drops the alpha channel)
+        self.slider.set_colors(QColor(self._main_window_color.rgb()), QColor(self._elapsed_color.rgb()), inverted_color)
+
+        label_color = self._label_color or inverted_color
+        for label in (self.current_time_label, self.total_time_label):
+            palette = label.palette()
+            if palette.color(QPalette.ColorRole.WindowText) != label_color:
+                palette.setColor(QPalette.ColorRole.WindowText, label_color)
+                label.setPalette(palette)
+
+    def _update_tooltip_style(self):
+        # Only depends on the elapsed color, so tint animations never re-parse it
         tooltip_bg_color = self._elapsed_color.darker(150)
         self.setStyleSheet(f"""
             QToolTip {{
@@ -115,11 +220,28 @@ class ProgressSlider(QWidget):
     def _format_time(self, ms):
         seconds = int((ms / 1000) % 60)
         minutes = int((ms / (1000 * 60)) % 60)
-        return f"{{minutes:02d}}:{{seconds:02d}}"
+        return f"{minutes:02d}:{seconds:02d}"
 
+    @span("ProgressSlider.update_progress")
     def update_progress(self, time_ms, duration_ms):
-        if not self._is_seeking:
+        if self._is_seeking:
+            return
+
+        if duration_ms != self._shown_duration:
+            self._shown_duration = duration_ms
             self.slider.setRange(0, duration_ms)
-            self.slider.setValue(time_ms)
-            self.current_time_label.setText(self._format_time(time_ms))
-            self.total_time_label.setText(self._format_time(duration_ms))
\ No newline at end of file
+            total_second = duration_ms // 1000
+            if total_second != self._shown_total_second:
+                self._shown_total_second = total_second
+                self.total_time_label.setText(self._format_time(duration_ms))
+
+        # Only move the handle when it would actually move by a pixel
+        if duration_ms > 0:
+            width = max(1, self.slider.width())
+            if time_ms * width // duration_ms != self.slider.value() * width // duration_ms:
+                self.slider.setValue(time_ms)
+
+        second = time_ms // 1000
+        if second != self._shown_second:
+            self._shown_second = second
+            self.current_time_label.setText(self._format_time(time_ms))
\ No newline at end of file
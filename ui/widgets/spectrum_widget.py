@@ -0,0 +1,97 @@
+import statistics
+import time
+from collections import deque
+
+from PySide6.QtCore import Qt, QRectF, QTimer
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtWidgets import QWidget
+from core.tracing import span
+
+
+class SpectrumWidget(QWidget):
+    """
+    Spectrum bars and a level meter for a core.visualizer.AudioTap. The tap's latest
+    frame is polled at most ``fps`` times a second and the widget only repaints when
+    a new frame arrived, so a paused track costs no painting at all.
+    """
+    METER_HEIGHT = 3
+    GAP = 1
+
+    def __init__(self, fps=30, parent=None):
+        super().__init__(parent)
+        self._source = None
+        self._frame = None
+        self._bar_color = QColor(255, 255, 255, 170)
+        self._meter_color = QColor(255, 255, 255, 110)
+        self._peak_color = QColor(255, 255, 255, 230)
+        self._paint_ms = deque(maxlen=300)
+        self._stats = {"shown": 0, "skipped": 0}
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(1, round(1000 / fps)))
+        self._timer.timeout.connect(self._poll)
+
+    def set_source(self, tap):
+        """Shows ``tap``'s frames; None stops polling and clears the widget."""
+        self._source = tap
+        self._frame = None
+        if tap is None:
+            self._timer.stop()
+        else:
+            self._timer.start()
+        self.update()
+
+    def set_color(self, color: QColor):
+        self._bar_color = QColor(color)
+        self._bar_color.setAlpha(170)
+        self._meter_color = QColor(color)
+        self._meter_color.setAlpha(110)
+        self._peak_color = QColor(color).lighter(130)
+        self.update()
+
+    def _poll(self):
+        frame = self._source.latest() if self._source is not None else None
+        if frame is None or (self._frame is not None and frame["seq"] == self._frame["seq"]):
+            return
+        if self._frame is not None:
+            # Frames the analyzer produced in between were never shown
+            self._stats["skipped"] += max(0, frame["seq"] - self._frame["seq"] - 1)
+        self._frame = frame
+        self._stats["shown"] += 1
+        self.update()
+
+    @span("SpectrumWidget.paintEvent")
+    def paintEvent(self, event):
+        frame = self._frame
+        if frame is None:
+            return
+        started = time.perf_counter()
+        painter = QPainter(self)
+        painter.setPen(Qt.PenStyle.NoPen)
+
+        bands = frame["bands"]
+        width = self.width()
+        bars_height = self.height() - self.METER_HEIGHT - 2
+        step = width / len(bands)
+        painter.setBrush(self._bar_color)
+        for i, level in enumerate(bands.tolist()):
+            height = level * bars_height
+            if height >= 0.5:
+                painter.drawRect(QRectF(i * step, bars_height - height, step - self.GAP, height))
+
+        top = self.height() - self.METER_HEIGHT
+        painter.setBrush(self._meter_color)
+        painter.drawRect(QRectF(0, top, frame["rms"] * width, self.METER_HEIGHT))
+        if frame["peak_hold"] > 0:
+            painter.setBrush(self._peak_color)
+            painter.drawRect(QRectF(frame["peak_hold"] * width - 2, top, 2, self.METER_HEIGHT))
+        painter.end()
+        self._paint_ms.append((time.perf_counter() - started) * 1000)
+
+    def stats(self):
+        """Returns frames shown and skipped, and the paint time per frame in milliseconds."""
+        stats = dict(self._stats)
+        paint = sorted(self._paint_ms)
+        if paint:
+            stats["paint_ms"] = {"median": statistics.median(paint), "worst": paint[-1]}
+        return stats